@@ -1,18 +1,183 @@
+import uuid
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import numpy as np
 
-def calcular_margem_percentual(valor_net, custo_total):
+from pipeline import (
+    ArmazemDatasets, CacheLRU, RegistroDatasets, TarefasIngestao, carregar_dataset, consolidar_datasets
+)
+from pipeline.analise import Filtros, agregado_margem, calcular_kpis, selecionar_agregado, tendencia_margem
+from pipeline.consolidacao import chave_consolidado
+from pipeline.cubo import agregar_cubo, construir_cubo
+from pipeline.desempenho import Captura, Medidor, modos_captura, registrar
+from pipeline.filtros import IndiceFiltros
+from pipeline.formatacao import formatar_moeda_br, formatar_porcentagem_br
+from pipeline.graficos import figura_clientes, figura_em_cache, figura_produtos, figura_representantes, figura_tendencia
+from pipeline.incremental import anexar_extrato, chave_extrato, chave_incremental
+from pipeline.ingestao import chave_dataset
+from pipeline.paginacao import (
+    NOMES_COLUNAS_TABELA, TAMANHOS_PAGINA, fatiar_pagina, montar_tabela, posicoes_tabela, total_paginas
+)
+from pipeline.temporal import FREQUENCIAS, NOMES_COMPARACAO, serie_diaria
+from pipeline.xlsx import listar_abas
+
+# Limites do cache de ingestão (compartilhado entre sessões; cubos, índices e ordens da tabela)
+CACHE_MAX_ITENS = 16
+CACHE_MAX_BYTES = 1536 * 1024 ** 2
+
+# =========== CACHE DE INGESTÃO E RELATÓRIOS SALVOS ===========
+@st.cache_resource
+def obter_cache_ingestao():
+    """
+    Cache LRU único do processo com as estruturas derivadas dos datasets.
+    """
+    return CacheLRU(max_itens=CACHE_MAX_ITENS, max_bytes=CACHE_MAX_BYTES)
+
+@st.cache_resource
+def obter_registro():
+    """
+    Datasets abertos no processo, um por conteúdo, compartilhados por todas as sessões: a
+    memória cresce com os arquivos distintos, não com os usuários. Ao despejar um dataset,
+    cubo/índice/ordens derivados dele saem do cache de ingestão.
+    """
+    return RegistroDatasets(ao_despejar=lambda chave: obter_cache_ingestao().remover_relacionados(chave))
+
+@st.cache_resource
+def obter_armazem():
+    """
+    Diretório local com os relatórios já limpos (Feather), reabertos sem novo parse.
+    """
+    return ArmazemDatasets()
+
+# Resultados das seções (KPIs e agregados dos gráficos), separados para não despejar datasets
+CACHE_SECOES_MAX_ITENS = 64
+CACHE_SECOES_MAX_BYTES = 256 * 1024 ** 2
+
+@st.cache_resource
+def obter_cache_secoes():
+    """
+    Resultados por dataset + estado dos filtros: rerun com os mesmos filtros não recalcula.
+    """
+    return CacheLRU(max_itens=CACHE_SECOES_MAX_ITENS, max_bytes=CACHE_SECOES_MAX_BYTES)
+
+def resultado_secao(nome, chave_dataset, chave_filtros, calcular):
+    return obter_cache_secoes().obter_ou_calcular((nome, chave_dataset, chave_filtros), calcular)
+
+# Figuras Plotly prontas, por conteúdo do agregado (filtros diferentes com o mesmo resultado
+# e outras sessões reaproveitam a figura)
+CACHE_FIGURAS_MAX_ITENS = 48
+
+@st.cache_resource
+def obter_cache_figuras():
+    return CacheLRU(max_itens=CACHE_FIGURAS_MAX_ITENS)
+
+def figura_secao(construtor, agregado, *parametros):
+    return figura_em_cache(obter_cache_figuras(), construtor, agregado, *parametros)
+
+@st.cache_resource
+def obter_tarefas():
     """
-    Calcula margem percentual usando a fórmula: (1 - Custo Total/Valor NET) * 100
+    Ingestões em segundo plano do processo (uma por arquivo, acompanhadas por todas as sessões).
     """
-    if valor_net == 0 or pd.isna(valor_net) or pd.isna(custo_total) or custo_total == 0:
-        return 0
-    
-    # ✅ FÓRMULA EXATA: 1 - (Custo Total / Valor NET Total)
-    margem = (1 - (custo_total / valor_net)) * 100
-    return margem  # Sem limitação artificial de min/max
+    return TarefasIngestao()
+
+# Espera antes de mostrar a barra (arquivos pequenos e reaberturas do armazém terminam antes)
+ESPERA_INGESTAO = 0.3
+INTERVALO_PROGRESSO = 0.5
+
+@st.fragment(run_every=INTERVALO_PROGRESSO)
+def painel_ingestao(tarefa):
+    """
+    Barra de progresso da ingestão; quando ela termina, reexecuta a página inteira.
+    """
+    if tarefa.concluida:
+        st.rerun()
+    st.progress(tarefa.progresso.fracao, text=tarefa.progresso.descricao())
+
+def ingerir_em_segundo_plano(chave, ler, bytes_total=0):
+    """
+    Dataset `chave` do registro ou, se ainda não estiver lá, `ler(progresso)` numa thread:
+    retorna o Dataset pronto ou None (com a barra de progresso na página) enquanto lê.
+    O erro de uma leitura é levantado uma vez; a próxima interação tenta de novo.
+    """
+    registro, tarefas = obter_registro(), obter_tarefas()
+    if chave in registro:
+        return registro.obter(chave)
+    tarefa = tarefas.iniciar(chave, ler, bytes_total=bytes_total)
+    if not tarefa.aguardar(ESPERA_INGESTAO):
+        painel_ingestao(tarefa)
+        return None
+    if tarefa.erro is not None:
+        tarefas.descartar(chave)
+    return tarefa.resultado()
+
+def anexar_extrato_salvo(base, arquivo):
+    """
+    Upsert do extrato diário sobre um relatório salvo, feito uma vez por (relatório, extrato):
+    o resultado vai para o cache e o armazém, e o cubo/índice de filtros do relatório
+    (se já estiverem no cache) são atualizados em vez de refeitos.
+    """
+    cache, registro, armazem = obter_cache_ingestao(), obter_registro(), obter_armazem()
+    conteudo = arquivo.getvalue()
+    chave = chave_incremental(base.chave, chave_extrato(conteudo, arquivo.name))
+    if chave in registro:
+        return registro.obter(chave)
+    if armazem.existe(chave):
+        return registro.guardar(chave, armazem.carregar(chave))
+    anexacao = anexar_extrato(
+        base, conteudo, arquivo.name,
+        cubo=cache.obter(('cubo', base.chave)), indice=cache.obter(('filtros', base.chave)), armazem=armazem
+    )
+    dataset = registro.guardar(chave, anexacao.dataset)
+    if anexacao.cubo is not None:
+        cache.guardar(('cubo', chave), anexacao.cubo)
+    if anexacao.indice is not None:
+        cache.guardar(('filtros', chave), anexacao.indice)
+    linhas, substituidas = (f"{n:,}".replace(",", ".") for n in (anexacao.linhas_extrato, anexacao.substituidas))
+    st.success(
+        f"Extrato {arquivo.name} anexado: {linhas} linhas, "
+        f"{substituidas} linhas do relatório substituídas (mesma NF e produto)."
+    )
+    return dataset
+
+# Linhas por página no relatório de qualidade
+TAMANHO_PAGINA_QUALIDADE = 50
+
+@st.fragment
+def secao_qualidade(dataset):
+    """
+    Relatório de qualidade calculado na ingestão (pipeline.qualidade): resumo por
+    verificação e, da verificação escolhida, só uma página de linhas por vez.
+    """
+    qualidade = dataset.qualidade
+    resumo = qualidade.resumo()
+    st.dataframe(pd.DataFrame({
+        'Verificação': resumo['verificacao'],
+        'Linhas': [f"{n:,}".replace(",", ".") for n in resumo['linhas']],
+        '% das linhas': formatar_porcentagem_br(resumo['percentual'].to_numpy()),
+    }), hide_index=True, use_container_width=True)
+
+    escolha = st.selectbox("Ver linhas de:", range(len(resumo)), format_func=lambda i: resumo['verificacao'].iat[i])
+    tipo, nome, total = resumo['tipo'].iat[escolha], resumo['nome'].iat[escolha], resumo['linhas'].iat[escolha]
+    if tipo == 'inconsistencia':
+        posicoes = qualidade.inconsistencias[nome]
+        paginas = total_paginas(len(posicoes), TAMANHO_PAGINA_QUALIDADE)
+        pagina = st.number_input(
+            f"Página (de {paginas:,}):".replace(",", "."), min_value=1, max_value=paginas, value=1, step=1,
+            key=f"pagina_qualidade_{nome}"
+        )
+        st.dataframe(montar_tabela(fatiar_pagina(dataset.df, posicoes, pagina, TAMANHO_PAGINA_QUALIDADE)),
+                     use_container_width=True)
+    else:
+        # As linhas com célula não convertida não estão no dataset (a limpeza as descarta
+        # ou a célula fica vazia): ficam o número da linha e o texto original, até o limite da amostra
+        exemplos = qualidade.exemplos.get(nome, [])
+        st.dataframe(pd.DataFrame(exemplos, columns=['Linha de dados', 'Conteúdo original']), hide_index=True)
+        st.caption(
+            f"{len(exemplos):,} primeiras de {total:,} células. Linha de dados: posição no arquivo "
+            f"contada a partir da linha abaixo do cabeçalho.".replace(",", ".")
+        )
 
 # ============ CSS E VISUAL PREMIUM HEADER E UPLOAD ============
 
@@ -23,6 +188,11 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# =========== INSTRUMENTAÇÃO DO RERUN ===========
+# Cada etapa registra tempo, linhas e memória; ?perf=cprofile,tracemalloc liga a captura completa
+medidor = Medidor()
+captura = Captura(modos_captura(st.query_params.get('perf'))).iniciar()
+
 st.markdown("""
 <style>
 @keyframes pulse {
@@ -67,25 +237,89 @@ uploaded_files = st.file_uploader(
 )
 
 file_selected = None
+opcoes_arquivo = {}
+files_consolidados = []
+relatorio_salvo = None
+extrato_diario = None
 if uploaded_files:
     file_names = [f.name for f in uploaded_files]
-    selected_name = st.selectbox(
-        "Selecione o arquivo que deseja analisar:",
-        file_names,
-        index=0
+    consolidar = len(uploaded_files) > 1 and st.checkbox(
+        "🔗 Analisar os arquivos de forma consolidada (todos os meses juntos)",
+        value=False
     )
-    # Vincula o arquivo selecionado
-    file_selected = next((f for f in uploaded_files if f.name == selected_name), None)
+    if consolidar:
+        selected_names = st.multiselect(
+            "Selecione os arquivos que deseja consolidar:",
+            file_names,
+            default=file_names
+        )
+        files_consolidados = [f for f in uploaded_files if f.name in selected_names]
+    else:
+        selected_name = st.selectbox(
+            "Selecione o arquivo que deseja analisar:",
+            file_names,
+            index=0
+        )
+        # Vincula o arquivo selecionado
+        file_selected = next((f for f in uploaded_files if f.name == selected_name), None)
+        # Planilha com várias abas: por padrão vale a primeira com o cabeçalho do relatório
+        if file_selected is not None and file_selected.name.endswith('.xlsx'):
+            try:
+                abas = listar_abas(file_selected.getvalue())
+            except ValueError:
+                abas = []
+            if len(abas) > 1:
+                aba = st.selectbox(
+                    "Aba da planilha:",
+                    [None, *abas],
+                    format_func=lambda a: "Automática (primeira com o cabeçalho do relatório)" if a is None else a
+                )
+                if aba is not None:
+                    opcoes_arquivo['aba'] = aba
+else:
+    # Sem upload: permite reabrir um relatório já processado (leitura direta do disco)
+    relatorios_salvos = obter_armazem().listar()
+    if relatorios_salvos:
+        opcoes_salvos = {
+            f"{r['nome']} — {r['linhas']:,} linhas (salvo em {r['salvo_em'].replace('T', ' ')})": r
+            for r in relatorios_salvos
+        }
+        # key fixa: a escolha sobrevive à lista ganhar o relatório gerado por um extrato
+        escolha_salvo = st.selectbox(
+            "📂 Ou reabra um relatório carregado anteriormente:",
+            ["—", *opcoes_salvos],
+            index=0,
+            key="relatorio_salvo"
+        )
+        relatorio_salvo = opcoes_salvos.get(escolha_salvo)
+        if relatorio_salvo is not None:
+            # Extrato diário do ERP: linhas novas/corrigidas entram no relatório sem reprocessá-lo
+            extrato_diario = st.file_uploader(
+                "➕ Anexar extrato diário (NF novas ou corrigidas) a este relatório",
+                type=["csv", "xlsx"],
+                key="extrato_diario"
+            ) or None
+
+if files_consolidados:
+    nome_em_analise = f"{len(files_consolidados)} arquivos consolidados"
+elif file_selected is not None:
+    nome_em_analise = file_selected.name
+elif relatorio_salvo is not None:
+    nome_em_analise = relatorio_salvo['nome']
+    if extrato_diario is not None:
+        nome_em_analise += f" + {extrato_diario.name}"
+else:
+    nome_em_analise = None
 
 # =========== FEEDBACK VISUAL PREMIUM: ARQUIVO EM ANÁLISE ===========
-if file_selected is not None:
+if nome_em_analise is not None:
     st.markdown(f"""
         <div style="margin: 1.2em auto 2.2em auto; max-width:560px; padding:16px 32px;
                     background: linear-gradient(98deg, #2e5137 70%, #3AD28A 100%);
                     border-radius: 14px; box-shadow:0 1px 7px -2px #3AD28A55; color:#fff;
                     font-size:1.12em; display:flex; align-items:center; justify-content:center;">
           <span style="font-size:2em; margin-right:10px; animation: bounceIn 1.3s;">✅</span>
-          <span><b>Arquivo <span style='color:#D0FFCE'>{file_selected.name}</span> carregado para análise!</b></span>
+          <span><b>Arquivo <span style='color:#D0FFCE'>{nome_em_analise}</span> carregado para análise!</b></span>
         </div>
     """, unsafe_allow_html=True)
 else:
@@ -100,106 +334,6 @@ else:
         </div>
     """, unsafe_allow_html=True)
 
-# =========== CARREGAMENTO E PRÉ-PROCESSAMENTO DO ARQUIVO ESCOLHIDO ===========
-df = None
-if file_selected is not None:
-    try:
-        file_extension = file_selected.name.split('.')[-1]
-        if file_extension == 'csv':
-            df = pd.read_csv(file_selected, sep=';', decimal=',', encoding='latin1')
-        elif file_extension == 'xlsx':
-            df = pd.read_excel(file_selected)
-        else:
-            st.error("Formato de arquivo não suportado. Por favor, faça o upload de um arquivo CSV ou Excel.")
-            st.stop()
-        # (aqui segue o restante do seu pipeline: normalização, renomeação de colunas, filtros, etc.)
-    except Exception as e:
-        st.error(f"Ocorreu um erro ao processar o arquivo: {e}. Por favor, verifique o formato e o conteúdo do arquivo.")
-        st.stop()
-
-# ============ LAYOUT VISUAL INTEGRADO ============
-
-def apply_integrated_layout(fig, title=""):
-    fig.update_layout(
-        title={
-            'text': title,
-            'y':0.93,
-            'x':0.5,
-            'xanchor': 'center',
-            'yanchor': 'top',
-            'font': {'size': 30, 'color': '#ADD8E6', 'family': 'Segoe UI, sans-serif'}
-        },
-        font=dict(family='Segoe UI, sans-serif', size=18, color='#E0E0E0'),
-        plot_bgcolor='#22232B',
-        paper_bgcolor='#22232B',
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1,
-            font=dict(size=18, color='#ADD8E6')
-        ),
-        margin=dict(l=40, r=40, t=70, b=40),
-        xaxis=dict(
-            title_font=dict(size=20, color='#ADD8E6', family='Segoe UI, sans-serif'),
-            tickfont=dict(size=16, color='#E0E0E0'),
-            gridcolor='rgba(160, 160, 160, 0.15)',
-            showgrid=True,
-            zeroline=False,
-            tickangle=-25
-        ),
-        yaxis=dict(
-            title_font=dict(size=20, color='#ADD8E6', family='Segoe UI, sans-serif'),
-            tickfont=dict(size=16, color='#E0E0E0'),
-            gridcolor='rgba(160, 160, 160, 0.12)',
-            showgrid=True,
-            zeroline=False
-        ),
-        width=1400,
-        height=500
-    )
-    fig.update_traces(
-        marker=dict(
-            color='#6C5B7B',
-            line=dict(width=0),
-            opacity=0.96
-        ),
-        hoverlabel=dict(font_size=18, font_family="Segoe UI, sans-serif", bgcolor='#6C5B7B', font_color='#E0E0E0'),
-        textfont=dict(color='#ADD8E6', size=16)
-    )
-    return fig
-
-# ======= FORMATADOR BR TOOLTIP =======
-def tooltip_fmt_br(valor, tipo="R$"):
-    if pd.isna(valor):
-        return ""
-    if tipo == "R$":
-        return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    elif tipo == "%":
-        return f"{valor:,.2f}%".replace(",", "X").replace(".", ",").replace("X", ".")
-    else:
-        return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-# =========== FUNÇÕES DE FORMATAÇÃO ===========
-def format_currency_br(value):
-    if pd.isna(value):
-        return "R$ 0,00"
-    return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-def format_percentage_br(value):
-    if pd.isna(value):
-        return "0,00%"
-    return f"{value:,.2f}%".replace(",", "X").replace(".", ",").replace("X", ".")
-
-def parse_percentage_string(percentage_str):
-    if pd.isna(percentage_str) or not isinstance(percentage_str, str):
-        return np.nan
-    try:
-        return float(percentage_str.replace('%', '').replace('.', '').replace(',', '.'))
-    except ValueError:
-        return np.nan
-
 # =========== CSS PREMIUM ===========
 
 st.set_page_config(
@@ -320,296 +454,382 @@ st.markdown(
 
 # =========== CARREGAMENTO E PRÉ-PROCESSAMENTO DO ARQUIVO ESCOLHIDO ===========
 
+NOMES_DESCARTE = {
+    'vazias': "vazias",
+    'totais': "totais e subtotais",
+    'sem_valor': "sem valor numérico",
+    'sem_data': "sem data válida",
+}
+
+# Cada sessão usa o DataFrame do registro (compartilhado, não é alterado) e guarda só as
+# posições das linhas que passam nos filtros
+id_sessao = st.session_state.setdefault('id_sessao', uuid.uuid4().hex[:12])
 df = None
-filtered_df = None
-if file_selected is not None:
+linhas_filtradas = None
+if nome_em_analise is None:
+    obter_registro().liberar(id_sessao)
+else:
     try:
-        file_extension = file_selected.name.split('.')[-1]
-        if file_extension == 'csv':
-            df = pd.read_csv(file_selected, sep=';', decimal=',', encoding='latin1')          
-        elif file_extension == 'xlsx':
-            df = pd.read_excel(file_selected)
+        etapa = medidor.iniciar('ingestao')
+        # Uploads são lidos em segundo plano: enquanto isso a página mostra o progresso
+        # (e o dataset anterior da sessão, se ainda estiver no registro)
+        registro, armazem = obter_registro(), obter_armazem()
+        if files_consolidados:
+            arquivos = [(f.getvalue(), f.name) for f in files_consolidados]
+            dataset = ingerir_em_segundo_plano(
+                chave_consolidado([chave_dataset(conteudo, nome) for conteudo, nome in arquivos]),
+                lambda progresso: consolidar_datasets(arquivos, cache=registro, armazem=armazem, progresso=progresso),
+                bytes_total=sum(len(conteudo) for conteudo, _ in arquivos),
+            )
+        elif file_selected is not None:
+            conteudo, nome_arquivo = file_selected.getvalue(), file_selected.name
+            dataset = ingerir_em_segundo_plano(
+                chave_dataset(conteudo, nome_arquivo, **opcoes_arquivo),
+                lambda progresso: carregar_dataset(
+                    conteudo, nome_arquivo, cache=registro, armazem=armazem, progresso=progresso, **opcoes_arquivo
+                ),
+                bytes_total=len(conteudo),
+            )
         else:
-            st.error("Formato de arquivo não suportado. Por favor, faça o upload de um arquivo CSV ou Excel.")
-            st.stop()
-        
-        # =========== CORREÇÃO PARA O PROBLEMA DO ARQUIVO ===========
-
-        # 🔧 CORREÇÃO: Remove linhas que começam com "PDF:"
-        if len(df.columns) > 0 and not df.empty:
-            # Remove a primeira linha se for header incorreto
-            first_col = df.columns[0]
-            if 'PDF:' in str(first_col) or df.iloc[0, 0] == 'PDF:':
-                df = df.iloc[1:].reset_index(drop=True)
-        
-        # 🔧 CORREÇÃO: Limpa linhas vazias ou problemáticas
-        df = df.dropna(how='all')  # Remove linhas completamente vazias
-        
-        # 🔧 CORREÇÃO: Garante que todas as colunas sejam tratadas como string inicialmente
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                df[col] = df[col].astype(str).replace('nan', '')
-
-        # PLUGUE AQUI O CÓDIGO DE DEBUG:
-        for col in ['data', 'valor_bruto', 'custo_total', 'valor_net', 'margem_em_valor', 'margem_em_porcentagem', 'qtd', 'quantidade']:
-            if col in df.columns:
-                if 'data' in col:
-                    # Para datas
-                    problemas = df[pd.to_datetime(df[col], errors='coerce').isna() & df[col].notna()]
-                else:
-                    # Para números
-                    problemas = df[pd.to_numeric(df[col], errors='coerce').isna() & df[col].notna()]
-                if not problemas.empty:
-                    st.write(f"Linhas problemáticas na coluna '{col}':")
-                    st.write(problemas)
-
-        # ======= PATCH: Conversão robusta de campos numéricos =========
-        numeric_columns = [
-            'valor_bruto',
-            'custo_total',
-            'margem_em_valor',
-            'margem_em_porcentagem',
-            'valor_net',
-            'qtd',
-            'custo_unitario'
-        ]
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = (df[col].astype(str)\
-                    .str.replace('%', '', regex=False)\
-                    .str.replace('.', '', regex=False)\
-                    .str.replace(',', '.', regex=False)\
-                    .str.replace(' ', '')\
-                    .replace('', np.nan)
-                    )
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-
-        # Normalização dos nomes das colunas (igual seu padrão)
-        df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_').str.replace('ç', 'c').str.replace('ã', 'a')\
-            .str.replace('á', 'a').str.replace('é', 'e').str.replace('í', 'i').str.replace('ó', 'o').str.replace('ú', 'u')\
-            .str.replace('â', 'a').str.replace('ê', 'e').str.replace('ô', 'o').str.replace('ü', 'u').str.replace('[^a-z0-9_]', '', regex=True)
-        
-        if 'representante' in df.columns:
-            df = df[~df['representante'].astype(str).str.contains('total', case=False, na=False)]
-        if 'cliente' in df.columns:
-            df = df[~df['cliente'].astype(str).str.contains('total', case=False, na=False)]
-        
-        colunas_numericas = [
-        'valor_bruto', 'custo_total', 'valor_net',
-        'margem_em_valor', 'margem_em_porcentagem', 'qtd', 'quantidade'
-        ] 
-        for col in colunas_numericas:
-            if col in df.columns:
-                df = df[pd.to_numeric(df[col], errors='coerce').notnull()]
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-
-        if 'valor_bruto' in df.columns:
-            df = df[df['valor_bruto'].notnull()]
-
-        column_mapping = {
-            'data_venda': 'data', 'data_do_pedido': 'data', 'data_da_venda': 'data',
-            'valor_bruto_da_venda': 'valor_bruto', 'valor_bruto': 'valor_bruto',
-            'custo_total_da_venda': 'custo_total', 'custo_total': 'custo_total',
-            'margem_em_valor': 'margem_em_valor', 'margem_em_porcentagem': 'margem_em_porcentagem',
-            'representante_de_vendas': 'representante', 'nome_do_representante': 'representante',
-            'nome_do_cliente': 'cliente', 'produto': 'descricao', 'descricao_do_produto': 'descricao'
-        }
-        df = df.rename(columns=column_mapping)
-        
-         # 3. ELIMINA LINHAS DE TOTAIS (não só em 'representante', mas em todas relevantes)
-        for col in ['representante', 'cliente', 'descricao']:
-            if col in df.columns:
-                df = df[~df[col].astype(str).str.lower().str.contains('total|geral|totais', na=False)]
-
-        if 'data' in df.columns:
-            df['data'] = pd.to_datetime(df['data'], errors='coerce')
-            df.dropna(subset=['data'], inplace=True)
-
-        # Mapeia percentuais
-        if 'margem_em_porcentagem' in df.columns:
-        # Corrige para garantir tipo float
-           df['margem_em_porcentagem'] = pd.to_numeric(df['margem_em_porcentagem'], errors='coerce')
-        # Se ainda tiver string, tenta converter
-           if df['margem_em_porcentagem'].isnull().any():
-                 df['margem_em_porcentagem'] = df['margem_em_porcentagem'].fillna(
-                   df['margem_em_porcentagem'].astype(str).apply(parse_percentage_string)
+            chave_salva = relatorio_salvo['chave']
+            dataset = registro.obter_ou_calcular(chave_salva, lambda: armazem.carregar(chave_salva))
+            if extrato_diario is not None:
+                dataset = anexar_extrato_salvo(dataset, extrato_diario)
+        if dataset is None and st.session_state.get('chave_em_uso') in registro:
+            dataset = registro.obter(st.session_state['chave_em_uso'])
+            st.info(f"Exibindo {dataset.nome} até o novo arquivo terminar de carregar.")
+        if dataset is not None:
+            dataset = registro.usar(id_sessao, dataset.chave)
+            st.session_state['chave_em_uso'] = dataset.chave
+            df = dataset.df
+        medidor.concluir(etapa, linhas_saida=None if df is None else len(df))
+
+        if dataset is not None:
+            # Resumo das células que não puderam ser convertidas (sem despejar as linhas)
+            if dataset.problemas:
+                resumo = ", ".join(f"'{col}': {qtd}" for col, qtd in dataset.problemas.items())
+                st.warning(f"Células não convertidas por coluna — {resumo}")
+            for aviso in dataset.avisos:
+                st.warning(aviso)
+            # Linhas que a limpeza descartou, por regra (pipeline.ingestao.REGRAS_DESCARTE e afins)
+            if dataset.descartadas:
+                resumo = ", ".join(
+                    f"{NOMES_DESCARTE.get(regra, regra)}: {qtd:,}".replace(",", ".")
+                    for regra, qtd in dataset.descartadas.items()
                 )
-        # Somente faz ajuste se for realmente float
-           try:
-               if (df['margem_em_porcentagem'].dropna().astype(float) < 2).all() and (df['valor_bruto'].mean() > 1000):
-                   df['margem_em_porcentagem'] *= 100
-           except Exception as err:
-                st.warning(f"Erro ao ajustar margem_em_porcentagem: {err}")
-        else:
-            if 'margem_em_valor' in df.columns and 'valor_bruto' in df.columns:
-                df['margem_em_porcentagem'] = (df['margem_em_valor'] / df['valor_bruto'] * 100).replace([np.inf, -np.inf], np.nan).fillna(0)
+                st.caption(f"Linhas descartadas na limpeza — {resumo}")
+            if dataset.qualidade is not None and not dataset.qualidade.vazio():
+                with st.expander("🔎 Qualidade dos dados"):
+                    secao_qualidade(dataset)
+
+            # SIDEBAR DE FILTROS (igual seu padrão!)
+            # `filtros` guarda o estado dos filtros para consultar o cubo
+            filtros = Filtros()
+            # Índice de filtros do dataset (códigos por coluna + datas ordenadas), montado uma vez;
+            # cada filtro só combina máscaras e o df é fatiado uma única vez no final
+            with medidor.etapa('indice_filtros', linhas_entrada=len(df)):
+                indice = obter_cache_ingestao().obter_ou_calcular(('filtros', dataset.chave), lambda: IndiceFiltros(df))
+            etapa = medidor.iniciar('filtros', linhas_entrada=len(df))
+            mascara = indice.tudo()
+            st.sidebar.markdown('<p class="subheader-font">Filtros de Dados</p>', unsafe_allow_html=True)
+            # Filtro por Data
+            if 'data' in df.columns and not df['data'].empty:
+                min_date = pd.Timestamp(indice.datas_ordenadas[0]).date()
+                max_date = pd.Timestamp(indice.datas_ordenadas[-1]).date()
+                date_range = st.sidebar.date_input("Selecione o período:", value=(min_date, max_date), min_value=min_date, max_value=max_date)
+                if len(date_range) == 2:
+                    start_date, end_date = date_range
+                    filtros.periodo = (start_date, end_date)
+                    mascara = indice.mascara_periodo(start_date, end_date)
             else:
-                df['margem_em_porcentagem'] = 0
-
-        required_cols = ['valor_bruto', 'custo_total', 'margem_em_valor', 'margem_em_porcentagem']
-        for col in required_cols:
-            if col not in df.columns:
-                df[col] = 0
-
-        # SIDEBAR DE FILTROS (igual seu padrão!)
-        st.sidebar.markdown('<p class="subheader-font">Filtros de Dados</p>', unsafe_allow_html=True)
-        # Filtro por Data
-        if 'data' in df.columns and not df['data'].empty:
-            min_date = df['data'].min().to_pydatetime().date()
-            max_date = df['data'].max().to_pydatetime().date()
-            date_range = st.sidebar.date_input("Selecione o período:", value=(min_date, max_date), min_value=min_date, max_value=max_date)
-            if len(date_range) == 2:
-                start_date, end_date = date_range
-                filtered_df = df[(df['data'].dt.date >= start_date) & (df['data'].dt.date <= end_date)]
+                st.sidebar.info("Coluna 'data' não encontrada ou vazia para aplicar filtro de data.")
+
+            # Multiselect com todas as opções marcadas não tira nenhuma linha: só entra em
+            # `filtros` quando restringe (sem seleções, o cubo responde pelas marginais)
+            # ✅ NOVO FILTRO: TP MOV
+            if 'tp_mov' in df.columns and mascara.any():
+                all_tp_mov = indice.opcoes('tp_mov', mascara)
+                selected_tp_mov = st.sidebar.multiselect(
+                   "Selecione o Tipo de Movimento:",
+                   options=all_tp_mov,
+                   default=all_tp_mov
+                )
+                if selected_tp_mov and len(selected_tp_mov) < len(all_tp_mov):
+                   mascara &= indice.mascara_valores('tp_mov', selected_tp_mov)
+                   filtros.selecoes['tp_mov'] = selected_tp_mov
             else:
-                filtered_df = df.copy()
-        else:
-            filtered_df = df.copy()
-            st.sidebar.info("Coluna 'data' não encontrada ou vazia para aplicar filtro de data.")
-
-        # ✅ NOVO FILTRO: TP MOV
-        if 'tp_mov' in filtered_df.columns and not filtered_df['tp_mov'].empty:
-            all_tp_mov = sorted(filtered_df['tp_mov'].unique().tolist())
-            selected_tp_mov = st.sidebar.multiselect(
-               "Selecione o Tipo de Movimento:",
-               options=all_tp_mov,
-               default=all_tp_mov
-            )
-            if selected_tp_mov:
-               filtered_df = filtered_df[filtered_df['tp_mov'].isin(selected_tp_mov)]
-        else:
-            st.sidebar.info("Coluna 'tp_mov' não encontrada ou vazia para aplicar filtro.")
-
-        # Filtro por Representante (multi)
-        if 'representante' in filtered_df.columns and not filtered_df['representante'].empty:
-            all_representantes = sorted(filtered_df['representante'].unique().tolist())
-            selected_representantes = st.sidebar.multiselect(
-                "Selecione o(s) Representante(s):",
-                options=all_representantes,
-                default=all_representantes
-            )
-            if selected_representantes:
-                filtered_df = filtered_df[filtered_df['representante'].isin(selected_representantes)]
-        else:
-            st.sidebar.info("Coluna 'representante' não encontrada ou vazia para aplicar filtro.")
-
-        # Filtro por Cliente (multi)
-        if 'cliente' in filtered_df.columns and not filtered_df['cliente'].empty:
-            all_clientes = sorted(filtered_df['cliente'].unique().tolist())
-            selected_clientes = st.sidebar.multiselect(
-                "Selecione o(s) Cliente(s):",
-                options=all_clientes,
-                default=all_clientes
-            )
-            if selected_clientes:
-                filtered_df = filtered_df[filtered_df['cliente'].isin(selected_clientes)]
-        else:
-            st.sidebar.info("Coluna 'cliente' não encontrada ou vazia para aplicar filtro.")
-
-        # Filtro por Produto (multi)
-        if 'descricao' in filtered_df.columns and not filtered_df['descricao'].empty:
-            all_produtos = sorted(filtered_df['descricao'].unique().tolist())
-            selected_produtos = st.sidebar.multiselect(
-                "Selecione o(s) Produto(s):",
-                options=all_produtos,
-                default=all_produtos
-            )
-            if selected_produtos:
-                filtered_df = filtered_df[filtered_df['descricao'].isin(selected_produtos)]
-        else:
-            st.sidebar.info("Coluna 'descricao' não encontrada ou vazia para aplicar filtro.")
+                st.sidebar.info("Coluna 'tp_mov' não encontrada ou vazia para aplicar filtro.")
+
+            # Filtro por Representante (multi)
+            if 'representante' in df.columns and mascara.any():
+                all_representantes = indice.opcoes('representante', mascara)
+                selected_representantes = st.sidebar.multiselect(
+                    "Selecione o(s) Representante(s):",
+                    options=all_representantes,
+                    default=all_representantes
+                )
+                if selected_representantes and len(selected_representantes) < len(all_representantes):
+                    mascara &= indice.mascara_valores('representante', selected_representantes)
+                    filtros.selecoes['representante'] = selected_representantes
+            else:
+                st.sidebar.info("Coluna 'representante' não encontrada ou vazia para aplicar filtro.")
+
+            # Filtro por Cliente (multi)
+            if 'cliente' in df.columns and mascara.any():
+                all_clientes = indice.opcoes('cliente', mascara)
+                selected_clientes = st.sidebar.multiselect(
+                    "Selecione o(s) Cliente(s):",
+                    options=all_clientes,
+                    default=all_clientes
+                )
+                if selected_clientes and len(selected_clientes) < len(all_clientes):
+                    mascara &= indice.mascara_valores('cliente', selected_clientes)
+                    filtros.selecoes['cliente'] = selected_clientes
+            else:
+                st.sidebar.info("Coluna 'cliente' não encontrada ou vazia para aplicar filtro.")
+
+            # Filtro por Produto (multi)
+            if 'descricao' in df.columns and mascara.any():
+                all_produtos = indice.opcoes('descricao', mascara)
+                selected_produtos = st.sidebar.multiselect(
+                    "Selecione o(s) Produto(s):",
+                    options=all_produtos,
+                    default=all_produtos
+                )
+                if selected_produtos and len(selected_produtos) < len(all_produtos):
+                    mascara &= indice.mascara_valores('descricao', selected_produtos)
+                    filtros.selecoes['descricao'] = selected_produtos
+            else:
+                st.sidebar.info("Coluna 'descricao' não encontrada ou vazia para aplicar filtro.")
+
+            linhas_filtradas = np.flatnonzero(mascara)
+            medidor.concluir(etapa, linhas_saida=len(linhas_filtradas))
+
+            # Cubo pré-agregado do dataset (montado uma vez) sob os filtros atuais
+            with medidor.etapa('cubo', linhas_entrada=len(df)) as etapa:
+                cubo = obter_cache_ingestao().obter_ou_calcular(('cubo', dataset.chave), lambda: construir_cubo(df))
+                etapa.linhas_saida = len(cubo)
+            # Resultados das seções ficam em cache pelo estado dos filtros
+            chave_filtros = filtros.chave()
+            with medidor.etapa('cubo_filtrado', linhas_entrada=len(cubo)) as etapa:
+                cubo_filtrado = resultado_secao(
+                    'cubo_filtrado', dataset.chave, chave_filtros, lambda: filtros.aplicar_cubo(cubo, df, indice)
+                )
+                etapa.linhas_saida = len(cubo_filtrado)
 
-        st.divider()
+            st.divider()
     except Exception as e:
         st.error(f"Ocorreu um erro ao processar o arquivo: {e}. Por favor, verifique o formato e o conteúdo do arquivo.")
         st.stop()
 
 
-    #=========== EXIBIÇÃO DA TABELA ===========
+    #=========== SEÇÕES QUE REEXECUTAM SOZINHAS ===========
 
-if file_selected is not None and 'filtered_df' in locals() and not filtered_df.empty:
-    st.markdown('<p class="subheader-font">Dados Filtrados</p>', unsafe_allow_html=True)
-    df_display = filtered_df.copy()
-    # Dicionário de nomes amigáveis para todas as colunas (incluindo as novas)
-    display_column_names = {
-        'tp_mov': 'TP Mov',
-        'nf': 'NF',
-        'data': 'Data da Venda',
-        'cliente': 'Cliente',
-        'segmentacao': 'Segmentação',
-        'representante': 'Representante',
-        'cod_produto': 'Cód. Produto',
-        'descricao': 'Descrição do Produto',
-        'valor_bruto': 'Faturamento Bruto',
-        'valor_net': 'Valor Net',
-        'qtd': 'Quantidade',
-        'custo_unitario': 'Custo Unitário',
-        'custo_total': 'Custo Total',
-        'margem_em_valor': 'Margem em Valor',
-        'margem_em_porcentagem': 'Margem (%)'
-    }
-    # Renomeia apenas colunas existentes no DataFrame
-    df_display = df_display.rename(columns={k: v for k, v in display_column_names.items() if k in df_display.columns})
+# Seções com widgets próprios são fragmentos: mexer na busca/página da tabela ou no slider
+# de produtos reexecuta só a seção, sem refazer KPIs nem os outros gráficos
 
-    # Alinha Quantidade para inteiro à direita
-    if 'Quantidade' in df_display.columns:
-        df_display['Quantidade'] = (
-            df_display['Quantidade']
-            .fillna(0)
-            .astype(float)
-            .round(0)
-            .astype(int)
+def medidor_secao(medidor_rerun):
+    """
+    Medidor do rerun completo ou, se só o fragmento reexecutou (rerun já registrado), um novo.
+    """
+    return Medidor() if medidor_rerun.encerrado else medidor_rerun
+
+def registrar_secao(medidor, medidor_rerun, secao, arquivo):
+    """
+    Registra no log as etapas de um fragmento que reexecutou sozinho.
+    """
+    if medidor is medidor_rerun:
+        return
+    try:
+        registrar(medidor.registro(sessao=st.session_state.get('id_sessao'), arquivo=arquivo, secao=secao))
+    except OSError:
+        pass
+
+@st.fragment
+def secao_tabela(df, linhas_filtradas, chave_dataset, chave_filtros, medidor_rerun, arquivo):
+    medidor = medidor_secao(medidor_rerun)
+    st.markdown('<p class="subheader-font">Dados Filtrados</p>', unsafe_allow_html=True)
+    # Paginação no servidor: só a página visível é formatada e enviada ao navegador
+    col_busca, col_ordem, col_sentido, col_tamanho = st.columns([3, 2, 1, 1])
+    busca = col_busca.text_input("🔎 Buscar (cliente, representante, produto, NF...):")
+    colunas_ordem = {v: k for k, v in NOMES_COLUNAS_TABELA.items() if k in df.columns}
+    coluna_ordem = col_ordem.selectbox("Ordenar por:", ["(ordem original)"] + list(colunas_ordem))
+    sentido = col_sentido.selectbox("Ordem:", ["Crescente", "Decrescente"])
+    tamanho_pagina = col_tamanho.selectbox("Linhas por página:", TAMANHOS_PAGINA, index=1)
+
+    # Ordem/busca ficam em cache por dataset + filtros: trocar de página não reordena
+    etapa = medidor.iniciar('tabela', linhas_entrada=len(linhas_filtradas))
+    posicoes = obter_cache_ingestao().obter_ou_calcular(
+        ('tabela', chave_dataset, chave_filtros, busca.strip().lower(), coluna_ordem, sentido),
+        lambda: posicoes_tabela(
+            df, busca, colunas_ordem.get(coluna_ordem), crescente=(sentido == "Crescente"), linhas=linhas_filtradas
         )
+    )
+    paginas = total_paginas(len(posicoes), tamanho_pagina)
+    pagina = st.number_input(f"Página (de {paginas:,}):".replace(",", "."), min_value=1, max_value=paginas, value=1, step=1)
+    df_display = montar_tabela(fatiar_pagina(df, posicoes, pagina, tamanho_pagina))
 
-    format_dict = {
-        'Faturamento Bruto': lambda x: format_currency_br(x) if pd.notna(x) else "R$ 0,00",
-        'Valor Net': lambda x: format_currency_br(x) if pd.notna(x) else "R$ 0,00",
-        'Custo Total': lambda x: format_currency_br(x) if pd.notna(x) else "R$ 0,00",
-        'Custo Unitário': lambda x: format_currency_br(x) if pd.notna(x) else "R$ 0,00",
-        'Margem em Valor': lambda x: format_currency_br(x) if pd.notna(x) else "R$ 0,00",
-        'Margem (%)': lambda x: format_percentage_br(x) if pd.notna(x) else "0,00%"
-    }
-    final_format_dict = {col: fmt for col, fmt in format_dict.items() if col in df_display.columns}
-
-    # Ajustes NF e Data
-    if 'NF' in df_display.columns:
-        try:
-            df_display['NF'] = df_display['NF'].astype(float).astype(pd.Int64Dtype()).astype(str)
-        except:
-            pass
-    if 'Data da Venda' in df_display.columns:
-        try:
-            df_display['Data da Venda'] = pd.to_datetime(df_display['Data da Venda'], errors='coerce').dt.strftime('%d/%m/%Y')
-        except:
-            pass
     # EXIBIÇÃO COM ALINHAMENTO: Números sempre à direita
-    styler = df_display.style.format(final_format_dict)
+    styler = df_display.style
     if 'Quantidade' in df_display.columns:
         styler = styler.set_properties(subset=['Quantidade'], **{'text-align': 'right'})
     st.dataframe(styler, use_container_width=True)
+    medidor.concluir(etapa, linhas_saida=len(df_display))
+    inicio_pagina = (pagina - 1) * tamanho_pagina
+    st.caption(
+        f"Linhas {inicio_pagina + min(1, len(df_display)):,}–{inicio_pagina + len(df_display):,} "
+        f"de {len(posicoes):,} encontradas ({len(linhas_filtradas):,} linhas filtradas)".replace(",", ".")
+    )
+    registrar_secao(medidor, medidor_rerun, 'tabela', arquivo)
+
+@st.fragment
+def secao_produtos(cubo_filtrado, chave_dataset, chave_filtros, medidor_rerun, arquivo):
+    medidor = medidor_secao(medidor_rerun)
+    # ✨ CSS LIMPO E FUNCIONAL
+    st.markdown("""
+    <style>
+    /* Estilização do slider */
+    div[data-testid="stSlider"] {
+        background: linear-gradient(135deg, rgba(108, 91, 123, 0.1) 0%, rgba(173, 216, 230, 0.05) 100%);
+        border: 1px solid rgba(173, 216, 230, 0.2);
+        border-radius: 15px;
+        padding: 20px;
+        margin: 15px 0;
+        box-shadow: 0 4px 15px rgba(0,0,0,0.1);
+    }
+
+    /* Track do slider */
+    div[data-testid="stSlider"] .stSlider > div > div > div > div {
+        background: linear-gradient(90deg, #6C5B7B 0%, #ADD8E6 100%) !important;
+        height: 10px !important;
+        border-radius: 10px !important;
+    }
+
+    /* Thumb do slider */
+    div[data-testid="stSlider"] .stSlider > div > div > div > div > div {
+        background: linear-gradient(135deg, #ADD8E6 0%, #6C5B7B 100%) !important;
+        border: 3px solid #ffffff !important;
+        width: 24px !important;
+        height: 24px !important;
+        border-radius: 50% !important;
+        box-shadow: 0 4px 12px rgba(108, 91, 123, 0.4) !important;
+        transition: all 0.3s ease !important;
+    }
+
+    /* Hover effect */
+    div[data-testid="stSlider"] .stSlider > div > div > div > div > div:hover {
+        transform: scale(1.2) !important;
+        box-shadow: 0 6px 16px rgba(108, 91, 123, 0.6) !important;
+    }
+
+    /* Label do slider */
+    div[data-testid="stSlider"] .stSlider > label {
+        color: #ADD8E6 !important;
+        font-weight: 600 !important;
+        font-size: 1.2em !important;
+        text-align: center !important;
+        display: block !important;
+        margin-bottom: 15px !important;
+    }
+    </style>
+    """, unsafe_allow_html=True)
+
+    # APENAS UM SLIDER SIMPLES
+    num_products = st.slider(
+        "🎚️ Selecione a Quantidade de Produtos",
+        min_value=2,
+        max_value=30,
+        value=10,
+        step=1,
+        help="Deslize para escolher quantos produtos mostrar no gráfico"
+    )
+
+    coluna_ordem, coluna_outros = st.columns(2)
+    menores = coluna_ordem.radio(
+        "Ordenar por", ["Maiores margens", "Menores margens"], horizontal=True,
+        help="Menores margens mostra os produtos de pior resultado (inclusive margem negativa)"
+    ) == "Menores margens"
+    outros = coluna_outros.checkbox(
+        "Somar os demais produtos em \"Outros\"", value=False,
+        help="Acrescenta uma barra com o total dos produtos que ficaram fora do gráfico"
+    )
+
+    # N maiores/menores produtos por margem em valor: o rollup por produto fica em cache por
+    # filtro, e cada movimento do slider só seleciona os N (argpartition) e formata esses N
+    etapa = medidor.iniciar('grafico_produtos', linhas_entrada=len(cubo_filtrado))
+    rollup_produtos = resultado_secao(
+        ('rollup', 'descricao'), chave_dataset, chave_filtros, lambda: agregar_cubo(cubo_filtrado, 'descricao')
+    )
+    df_prod_margem = resultado_secao(
+        ('agregado', 'descricao', num_products, menores, outros), chave_dataset, chave_filtros,
+        lambda: selecionar_agregado(rollup_produtos, 'descricao', num_products, menores, outros)
+    )
+    fig_prod_margem = figura_secao(figura_produtos, df_prod_margem, num_products, menores)
+    st.plotly_chart(fig_prod_margem, use_container_width=True)
+    medidor.concluir(etapa, linhas_saida=len(df_prod_margem))
+    registrar_secao(medidor, medidor_rerun, 'produtos', arquivo)
+
+@st.fragment
+def secao_tendencia(df, linhas_filtradas, chave_dataset, filtros, medidor_rerun, arquivo):
+    medidor = medidor_secao(medidor_rerun)
+    col_frequencia, col_comparacao = st.columns(2)
+    frequencia = col_frequencia.radio(
+        "Agrupar por", list(FREQUENCIAS), index=list(FREQUENCIAS).index('M'), format_func=FREQUENCIAS.get,
+        horizontal=True
+    )
+    # Rótulos fixos: a escolha continua valendo quando a frequência muda
+    opcoes_comparacao = {None: "Sem comparação", 'anterior': "Período anterior", 'ano_anterior': "Mesmo período do ano anterior"}
+    comparacao = col_comparacao.selectbox(
+        "Comparar com", list(opcoes_comparacao), format_func=opcoes_comparacao.get, key='comparacao_tendencia'
+    )
+
+    # Série diária do dataset (o cubo é mensal), montada uma vez e fatiada pelo período; só
+    # seleções nas dimensões pedem somar as linhas filtradas. Agrupar e comparar custam O(dias)
+    etapa = medidor.iniciar('grafico_tendencia', linhas_entrada=len(linhas_filtradas))
+    chave_filtros = filtros.chave()
+    serie = resultado_secao(
+        'serie_diaria', chave_dataset, chave_filtros,
+        lambda: filtros.aplicar_serie(
+            obter_cache_ingestao().obter_ou_calcular(('serie', chave_dataset), lambda: serie_diaria(df)),
+            df, linhas_filtradas
+        )
+    )
+    df_tendencia = resultado_secao(
+        ('tendencia', frequencia, comparacao), chave_dataset, chave_filtros,
+        lambda: tendencia_margem(serie, frequencia, comparacao)
+    )
+    st.plotly_chart(figura_secao(figura_tendencia, df_tendencia, frequencia, comparacao), use_container_width=True)
+    if comparacao is not None and len(df_tendencia) and not np.isnan(df_tendencia['variacao'].iat[-1]):
+        ultimo = df_tendencia.iloc[-1]
+        st.caption(
+            f"{FREQUENCIAS[frequencia]} {ultimo['periodo']}: margem {ultimo['margem_valor_fmt']}, "
+            f"{ultimo['variacao_perc_fmt'] or 'sem base'} contra {NOMES_COMPARACAO[comparacao][frequencia].lower()} "
+            f"({ultimo['variacao_fmt']}). O primeiro e o último período podem estar incompletos."
+        )
+    medidor.concluir(etapa, linhas_saida=len(df_tendencia))
+    registrar_secao(medidor, medidor_rerun, 'tendencia', arquivo)
+
+    #=========== EXIBIÇÃO DA TABELA ===========
+
+if nome_em_analise is not None and linhas_filtradas is not None and len(linhas_filtradas):
+    secao_tabela(df, linhas_filtradas, dataset.chave, chave_filtros, medidor, nome_em_analise)
     st.divider()
 
     # =========== MÉTRICAS CHAVE VISUAL PREMIUM ===========
 
-if file_selected is not None and filtered_df is not None:
+if nome_em_analise is not None and linhas_filtradas is not None:
     st.markdown('<p class="subheader-font">Métricas Chave</p>', unsafe_allow_html=True)
 
-    total_valor_bruto = filtered_df['valor_bruto'].sum() if 'valor_bruto' in filtered_df.columns else 0
-    total_custo_total = filtered_df['custo_total'].sum() if 'custo_total' in filtered_df.columns else 0
-    total_valor_net = filtered_df['valor_net'].sum() if 'valor_net' in filtered_df.columns else 0
-    total_margem_valor = filtered_df['margem_em_valor'].sum() if 'margem_em_valor' in filtered_df.columns else 0
-
-    # NOVO CÁLCULO DA MARGEM MÉDIA (%) – cálculo correto, conforme book de melhores práticas
-    if total_valor_net > 0:
-        nova_margem_media = (total_valor_net - total_custo_total) / total_valor_net * 100
-    else:
-        nova_margem_media = 0
+    # KPIs = rollup do cubo filtrado (independe do número de linhas de NF)
+    with medidor.etapa('kpis', linhas_entrada=len(cubo_filtrado)):
+        kpis = resultado_secao('kpis', dataset.chave, chave_filtros, lambda: calcular_kpis(cubo_filtrado))
+        kpis_fmt = formatar_moeda_br([kpis.valor_bruto, kpis.custo_total, kpis.valor_net, kpis.margem_em_valor])
 
     st.markdown(f"""
     <div class="kpi-metric-box">
         <div class="kpi-topline">
             <span class="kpi-prefix">R$</span>
-            <span class="kpi-value">{format_currency_br(total_valor_bruto)[3:]}</span>
+            <span class="kpi-value">{kpis_fmt[0][3:]}</span>
         </div>
         <div class="kpi-label">Faturamento Bruto</div>
         <div class="kpi-icon">💸</div>
@@ -617,7 +837,7 @@ if file_selected is not None and filtered_df is not None:
     <div class="kpi-metric-box">
         <div class="kpi-topline">
             <span class="kpi-prefix">R$</span>
-            <span class="kpi-value">{format_currency_br(total_custo_total)[3:]}</span>
+            <span class="kpi-value">{kpis_fmt[1][3:]}</span>
         </div>
         <div class="kpi-label">Custo Total</div>
         <div class="kpi-icon">🧾</div>
@@ -625,7 +845,7 @@ if file_selected is not None and filtered_df is not None:
     <div class="kpi-metric-box">
         <div class="kpi-topline">
             <span class="kpi-prefix">R$</span>
-            <span class="kpi-value">{format_currency_br(total_valor_net)[3:]}</span>
+            <span class="kpi-value">{kpis_fmt[2][3:]}</span>
         </div>
         <div class="kpi-label">Valor NET Total</div>
         <div class="kpi-icon">💳</div>
@@ -633,14 +853,14 @@ if file_selected is not None and filtered_df is not None:
     <div class="kpi-metric-box">
         <div class="kpi-topline">
             <span class="kpi-prefix">R$</span>
-            <span class="kpi-value">{format_currency_br(total_margem_valor)[3:]}</span>
+            <span class="kpi-value">{kpis_fmt[3][3:]}</span>
         </div>
         <div class="kpi-label">Margem em Valor</div>
         <div class="kpi-icon">📈</div>
     </div>
     <div class="kpi-metric-box">
         <div class="kpi-topline">
-            <span class="kpi-value">{format_percentage_br(nova_margem_media)}</span>
+            <span class="kpi-value">{formatar_porcentagem_br([kpis.margem_media])[0]}</span>
         </div>
         <div class="kpi-label">Margem Média (%)</div>
         <div class="kpi-icon">💹</div>
@@ -651,287 +871,94 @@ if file_selected is not None and filtered_df is not None:
 
 # =========== GRÁFICOS COM TOOLTIPS FORMATADOS BR ===========
 
-if file_selected is not None and filtered_df is not None:
+if nome_em_analise is not None and linhas_filtradas is not None:
     st.markdown('<p class="subheader-font">Análise Gráfica</p>', unsafe_allow_html=True)
+    # Agregados ficam em cache pelo estado dos filtros (pipeline.analise.Filtros.chave)
+    def agregado_secao(dimensao, top=None):
+        return resultado_secao(
+            ('agregado', dimensao, top), dataset.chave, chave_filtros,
+            lambda: agregado_margem(cubo_filtrado, dimensao, top=top)
+        )
+
     # Margem por Representante
     st.markdown("#### Margem por Representante")
-    if 'representante' in filtered_df.columns and 'margem_em_valor' in filtered_df.columns and 'valor_net' in filtered_df.columns and 'custo_total' in filtered_df.columns:
-        df_rep_margem = filtered_df.groupby('representante').agg(
-           valor_net=('valor_net', 'sum'),
-           custo_total=('custo_total', 'sum'),
-           margem_em_valor=('margem_em_valor', 'sum')
-        ).reset_index()
-    
-        # ✅ NOVA FÓRMULA DA MARGEM %
-        df_rep_margem['margem_em_porcentagem'] = df_rep_margem.apply(
-            lambda row: calcular_margem_percentual(row['valor_net'], row['custo_total']), axis=1
-        )
-    
-        df_rep_margem = df_rep_margem.sort_values('margem_em_valor', ascending=False)
-    
-        # ✅ FORMATAÇÃO DOS NOVOS CAMPOS
-        df_rep_margem['valor_net_fmt'] = df_rep_margem['valor_net'].apply(tooltip_fmt_br)
-        df_rep_margem['custo_total_fmt'] = df_rep_margem['custo_total'].apply(tooltip_fmt_br)
-        df_rep_margem['margem_valor_fmt'] = df_rep_margem['margem_em_valor'].apply(tooltip_fmt_br)
-        df_rep_margem['margem_perc_fmt'] = df_rep_margem['margem_em_porcentagem'].apply(lambda x: f"{x:.2f}%")
-
-    
-        fig_rep_margem = px.bar(
-            df_rep_margem,
-            x='representante',
-            y='margem_em_valor',
-            text_auto='.2s',
-            labels={'margem_em_valor': 'Margem em Valor (R$)', 'representante': 'Representante'},
-            custom_data=['valor_net_fmt', 'custo_total_fmt', 'margem_valor_fmt', 'margem_perc_fmt']
-        )
-    
-        # ✅ NOVO TEMPLATE DO TOOLTIP
-        fig_rep_margem.update_traces(
-            hovertemplate=
-            "<b>Representante:</b> %{x}<br>" +
-            "<b>Valor NET Total (R$):</b> %{customdata[0]}<br>" +
-            "<b>Custo Total (R$):</b> %{customdata[1]}<br>" +
-            "<b>Margem em Valor (R$):</b> %{customdata[2]}<br>" +
-            "<b>Margem (%):</b> %{customdata[3]}<extra></extra>"
-        )
-    
-        fig_rep_margem = apply_integrated_layout(fig_rep_margem, title='Margem por Representante')
+    if 'representante' in df.columns and 'margem_em_valor' in df.columns and 'valor_net' in df.columns and 'custo_total' in df.columns:
+        # Margem por representante: rollup do cubo + margem % + tooltips (pipeline.analise)
+        etapa = medidor.iniciar('grafico_representante', linhas_entrada=len(cubo_filtrado))
+        df_rep_margem = agregado_secao('representante')
+        fig_rep_margem = figura_secao(figura_representantes, df_rep_margem)
         st.plotly_chart(fig_rep_margem, use_container_width=True)
+        medidor.concluir(etapa, linhas_saida=len(df_rep_margem))
     else:
         st.info("Colunas necessárias não encontradas para o gráfico de Representantes.")
 
     # Margem por Cliente (Top 10)
     st.markdown("#### Margem por Cliente")
-    if 'cliente' in filtered_df.columns and 'margem_em_valor' in filtered_df.columns and 'valor_net' in filtered_df.columns and 'custo_total' in filtered_df.columns:
-        df_cliente_margem = filtered_df.groupby('cliente').agg(
-            valor_net=('valor_net', 'sum'),
-            custo_total=('custo_total', 'sum'),
-            margem_em_valor=('margem_em_valor', 'sum')
-        ).reset_index()
-    
-        # ✅ NOVA FÓRMULA DA MARGEM %
-        df_cliente_margem['margem_em_porcentagem'] = df_cliente_margem.apply(
-            lambda row: calcular_margem_percentual(row['valor_net'], row['custo_total']), axis=1
-        )
-    
-        df_cliente_margem = df_cliente_margem.sort_values('margem_em_valor', ascending=False).head(10)
-    
-        # ✅ FORMATAÇÃO DOS NOVOS CAMPOS
-        df_cliente_margem['valor_net_fmt'] = df_cliente_margem['valor_net'].apply(tooltip_fmt_br)
-        df_cliente_margem['custo_total_fmt'] = df_cliente_margem['custo_total'].apply(tooltip_fmt_br)
-        df_cliente_margem['margem_valor_fmt'] = df_cliente_margem['margem_em_valor'].apply(tooltip_fmt_br)
-        df_cliente_margem['margem_perc_fmt'] = df_cliente_margem['margem_em_porcentagem'].apply(lambda x: f"{x:.2f}%")
-    
-        # ✅ TRUNCAR NOMES DOS CLIENTES PARA MELHOR VISUALIZAÇÃO
-        df_cliente_margem['cliente_display'] = df_cliente_margem['cliente'].apply(
-            lambda x: x[:50] + '...' if len(x) > 50 else x
-        )
-    
-        fig_cliente_margem = px.bar(
-            df_cliente_margem,
-            x='cliente_display',
-            y='margem_em_valor',
-            text_auto='.2s',
-            labels={
-                'margem_em_valor': 'Margem em Valor (R$)', 
-                'cliente_display': 'Cliente'
-            },
-            custom_data=['valor_net_fmt', 'custo_total_fmt', 'margem_valor_fmt', 'margem_perc_fmt']
-        )
-    
-        # ✅ NOVO TEMPLATE DO TOOLTIP
-        fig_cliente_margem.update_traces(
-            hovertemplate=
-            "<b>Cliente:</b> %{x}<br>" +
-            "<b>Valor NET Total (R$):</b> %{customdata[0]}<br>" +
-            "<b>Custo Total (R$):</b> %{customdata[1]}<br>" +
-            "<b>Margem em Valor (R$):</b> %{customdata[2]}<br>" +
-            "<b>Margem (%):</b> %{customdata[3]}<extra></extra>"
-        )
-    
-        # ✅ APLICAR LAYOUT PADRÃO (igual aos outros gráficos)
-        fig_cliente_margem = apply_integrated_layout(fig_cliente_margem, title='Top 10 Clientes por Margem Total')
-    
-        # ✅ APENAS CONFIGURAÇÕES MÍNIMAS ESPECÍFICAS PARA CLIENTES
-        fig_cliente_margem.update_layout(
-            height=600,  # Manter altura maior por causa dos nomes longos
-            margin=dict(l=80, r=50, t=80, b=150),  # Margem embaixo para os nomes
-        )
-    
-        # ✅ EIXOS COM TAMANHOS PADRÃO (mesmos dos outros gráficos)
-        fig_cliente_margem.update_xaxes(
-            tickangle=-45,
-            # ✅ SEM override de font - usar padrão do apply_integrated_layout
-        )
-    
+    if 'cliente' in df.columns and 'margem_em_valor' in df.columns and 'valor_net' in df.columns and 'custo_total' in df.columns:
+        # Top 10 clientes por margem em valor
+        etapa = medidor.iniciar('grafico_clientes', linhas_entrada=len(cubo_filtrado))
+        df_cliente_margem = agregado_secao('cliente', top=10)
+        fig_cliente_margem = figura_secao(figura_clientes, df_cliente_margem)
         st.plotly_chart(fig_cliente_margem, use_container_width=True)
+        medidor.concluir(etapa, linhas_saida=len(df_cliente_margem))
     else:
         st.info("Colunas necessárias não encontradas para o gráfico de Clientes.")
 
-    # Margem Total Mensal
-    st.markdown("#### Margem Total Mensal")
-    if 'data' in filtered_df.columns and 'margem_em_valor' in filtered_df.columns and 'valor_net' in filtered_df.columns and 'custo_total' in filtered_df.columns:
-        # Criar coluna de mês-ano
-        filtered_df['mes_ano'] = filtered_df['data'].dt.to_period('M').astype(str)
-    
-        df_mensal_margem = filtered_df.groupby('mes_ano').agg(
-            valor_net=('valor_net', 'sum'),
-            custo_total=('custo_total', 'sum'),
-            margem_em_valor=('margem_em_valor', 'sum')
-        ).reset_index()
-    
-        # ✅ NOVA FÓRMULA DA MARGEM %
-        df_mensal_margem['margem_em_porcentagem'] = df_mensal_margem.apply(
-            lambda row: calcular_margem_percentual(row['valor_net'], row['custo_total']), axis=1
-        )
-    
-        # Ordenar por data
-        df_mensal_margem = df_mensal_margem.sort_values('mes_ano')
-    
-        # ✅ FORMATAÇÃO DOS NOVOS CAMPOS
-        df_mensal_margem['valor_net_fmt'] = df_mensal_margem['valor_net'].apply(tooltip_fmt_br)
-        df_mensal_margem['custo_total_fmt'] = df_mensal_margem['custo_total'].apply(tooltip_fmt_br)
-        df_mensal_margem['margem_valor_fmt'] = df_mensal_margem['margem_em_valor'].apply(tooltip_fmt_br)
-        df_mensal_margem['margem_perc_fmt'] = df_mensal_margem['margem_em_porcentagem'].apply(lambda x: f"{x:.2f}%")
-    
-        fig_mensal_margem = px.line(
-            df_mensal_margem,
-            x='mes_ano',
-            y='margem_em_valor',
-            markers=True,
-            labels={'margem_em_valor': 'Margem em Valor (R$)', 'mes_ano': 'Mês/Ano'},
-            custom_data=['valor_net_fmt', 'custo_total_fmt', 'margem_valor_fmt', 'margem_perc_fmt']
-        )
-    
-        # ✅ NOVO TEMPLATE DO TOOLTIP
-        fig_mensal_margem.update_traces(
-            hovertemplate=
-            "<b>Mês/Ano:</b> %{x}<br>" +
-            "<b>Valor NET Total (R$):</b> %{customdata[0]}<br>" +
-            "<b>Custo Total (R$):</b> %{customdata[1]}<br>" +
-            "<b>Margem em Valor (R$):</b> %{customdata[2]}<br>" +
-            "<b>Margem (%):</b> %{customdata[3]}<extra></extra>",
-            line=dict(width=3),
-            marker=dict(size=8)
-        )
-    
-        fig_mensal_margem = apply_integrated_layout(fig_mensal_margem, title='Evolução da Margem Total Mensal')
-        fig_mensal_margem.update_xaxes(tickangle=-45)
-        st.plotly_chart(fig_mensal_margem, use_container_width=True)
+    # Evolução da margem (dia/semana/mês/trimestre; os controles reexecutam só esta seção)
+    st.markdown("#### Evolução da Margem Total")
+    if 'data' in df.columns and 'margem_em_valor' in df.columns and 'valor_net' in df.columns and 'custo_total' in df.columns:
+        secao_tendencia(df, linhas_filtradas, dataset.chave, filtros, medidor, nome_em_analise)
     else:
-        st.info("Colunas necessárias não encontradas para o gráfico mensal.")
+        st.info("Colunas necessárias não encontradas para o gráfico de evolução da margem.")
 
-    # Margem por Produto
+    # Margem por Produto (o slider reexecuta só esta seção)
     st.markdown("### Margem por Produto")
-    if 'descricao' in filtered_df.columns and 'margem_em_valor' in filtered_df.columns and 'valor_bruto' in filtered_df.columns:
-        
-        # ✨ CSS LIMPO E FUNCIONAL
-        st.markdown("""
-        <style>
-        /* Estilização do slider */
-        div[data-testid="stSlider"] {
-            background: linear-gradient(135deg, rgba(108, 91, 123, 0.1) 0%, rgba(173, 216, 230, 0.05) 100%);
-            border: 1px solid rgba(173, 216, 230, 0.2);
-            border-radius: 15px;
-            padding: 20px;
-            margin: 15px 0;
-            box-shadow: 0 4px 15px rgba(0,0,0,0.1);
-        }
-
-        /* Track do slider */
-        div[data-testid="stSlider"] .stSlider > div > div > div > div {
-            background: linear-gradient(90deg, #6C5B7B 0%, #ADD8E6 100%) !important;
-            height: 10px !important;
-            border-radius: 10px !important;
-        }
-
-        /* Thumb do slider */
-        div[data-testid="stSlider"] .stSlider > div > div > div > div > div {
-            background: linear-gradient(135deg, #ADD8E6 0%, #6C5B7B 100%) !important;
-            border: 3px solid #ffffff !important;
-            width: 24px !important;
-            height: 24px !important;
-            border-radius: 50% !important;
-            box-shadow: 0 4px 12px rgba(108, 91, 123, 0.4) !important;
-            transition: all 0.3s ease !important;
-        }
-
-        /* Hover effect */
-        div[data-testid="stSlider"] .stSlider > div > div > div > div > div:hover {
-            transform: scale(1.2) !important;
-            box-shadow: 0 6px 16px rgba(108, 91, 123, 0.6) !important;
-        }
-
-        /* Label do slider */
-        div[data-testid="stSlider"] .stSlider > label {
-            color: #ADD8E6 !important;
-            font-weight: 600 !important;
-            font-size: 1.2em !important;
-            text-align: center !important;
-            display: block !important;
-            margin-bottom: 15px !important;
-        }
-        </style>
-        """, unsafe_allow_html=True)
-
-        # APENAS UM SLIDER SIMPLES
-        num_products = st.slider(
-            "🎚️ Selecione a Quantidade de Produtos",
-            min_value=2,
-            max_value=30,
-            value=10,
-            step=1,
-            help="Deslize para escolher quantos produtos mostrar no gráfico"
-        )
-
-        df_prod_margem = filtered_df.groupby('descricao').agg(
-            valor_net=('valor_net', 'sum'),
-            custo_total=('custo_total', 'sum'),
-            margem_em_valor=('margem_em_valor', 'sum')
-        ).reset_index()
-
-        # ✅ NOVA FÓRMULA DA MARGEM %
-        df_prod_margem['margem_em_porcentagem'] = df_prod_margem.apply(
-            lambda row: calcular_margem_percentual(row['valor_net'], row['custo_total']), axis=1
-        )
-
-        df_prod_margem = df_prod_margem.sort_values('margem_em_valor', ascending=False).head(num_products)
-
-        # ✅ FORMATAÇÃO DOS NOVOS CAMPOS
-        df_prod_margem['valor_net_fmt'] = df_prod_margem['valor_net'].apply(tooltip_fmt_br)
-        df_prod_margem['custo_total_fmt'] = df_prod_margem['custo_total'].apply(tooltip_fmt_br)
-        df_prod_margem['margem_valor_fmt'] = df_prod_margem['margem_em_valor'].apply(tooltip_fmt_br)
-        df_prod_margem['margem_perc_fmt'] = df_prod_margem['margem_em_porcentagem'].apply(lambda x: f"{x:.2f}%")
-
-        fig_prod_margem = px.bar(
-            df_prod_margem,
-            x='descricao',
-            y='margem_em_valor',
-            text_auto='.2s',
-            labels={'margem_em_valor': 'Margem em Valor (R$)', 'descricao': 'Produto'},
-            custom_data=['valor_net_fmt', 'custo_total_fmt', 'margem_valor_fmt', 'margem_perc_fmt']
-        )
-
-        # ✅ NOVO TEMPLATE DO TOOLTIP
-        fig_prod_margem.update_traces(
-            hovertemplate=
-            "<b>Produto:</b> %{x}<br>" +
-            "<b>Valor NET Total (R$):</b> %{customdata[0]}<br>" +
-            "<b>Custo Total (R$):</b> %{customdata[1]}<br>" +
-            "<b>Margem em Valor (R$):</b> %{customdata[2]}<br>" +
-            "<b>Margem (%):</b> %{customdata[3]}<extra></extra>"
-        )
-
-        fig_prod_margem = apply_integrated_layout(fig_prod_margem, title=f'Top {num_products} Produtos por Margem Total')
-        if num_products > 15:
-            fig_prod_margem.update_xaxes(tickangle=-35, rangeslider_visible=True)
-        st.plotly_chart(fig_prod_margem, use_container_width=True)
+    if 'descricao' in df.columns and 'margem_em_valor' in df.columns and 'valor_bruto' in df.columns:
+        secao_produtos(cubo_filtrado, dataset.chave, chave_filtros, medidor, nome_em_analise)
     else:
         st.info("Colunas necessárias não encontradas para o gráfico de Produtos.")
 
 st.markdown("---")
 st.markdown("Desenvolvido com Streamlit.")
 
+# =========== PAINEL DE PERFORMANCE + LOG DO RERUN ===========
+relatorios_captura = captura.finalizar()
+registro_rerun = medidor.registro(
+    sessao=id_sessao,
+    arquivo=nome_em_analise,
+    captura=sorted(captura.modos),
+)
+try:
+    registrar(registro_rerun)
+except OSError as e:
+    registro_rerun['erro_log'] = str(e)
+# Daqui em diante, fragmentos que reexecutarem sozinhos registram o próprio rerun
+medidor.encerrado = True
+
+with st.sidebar.expander("⏱️ Performance", expanded=bool(relatorios_captura)):
+    st.caption(f"Rerun em {registro_rerun['total_segundos'] * 1000:,.0f} ms".replace(",", "."))
+    if medidor.etapas:
+        st.dataframe(pd.DataFrame(medidor.tabela()), hide_index=True, use_container_width=True)
+    if df is not None:
+        # Pegada do dataset em memória: uma cópia por arquivo, compartilhada entre as sessões
+        pegada = obter_cache_ingestao().obter_ou_calcular(('memoria', dataset.chave), dataset.pegada_memoria)
+        total = int(pegada['bytes'].sum())
+        tamanho = f"{total / 1024 ** 2:.1f} MiB".replace(".", ",") if total >= 1024 ** 2 else f"{total / 1024:.0f} KiB"
+        st.caption(f"Dataset em memória: {tamanho} ({total // max(len(df), 1)} bytes/linha)")
+        st.dataframe(pegada, hide_index=True, use_container_width=True)
+    uso_registro = obter_registro().resumo()
+    st.caption(
+        f"Datasets no servidor: {uso_registro['datasets']} ({uso_registro['em_uso']} em uso, "
+        f"{uso_registro['bytes'] / 1024 ** 2:.1f} MiB) para {uso_registro['sessoes']} sessão(ões)".replace(".", ",")
+    )
+    if 'erro_log' in registro_rerun:
+        st.caption(f"Log de performance indisponível: {registro_rerun['erro_log']}")
+    for modo, texto in relatorios_captura.items():
+        st.markdown(f"**{modo}**")
+        st.code(texto, language=None)
+    if not relatorios_captura:
+        st.caption("Captura detalhada: adicione ?perf=cprofile, ?perf=tracemalloc ou ?perf=tudo à URL.")
+
 
 
 
@@ -0,0 +1,84 @@
+"""
+Benchmark (e conferência) dos cálculos simultâneos no cache de ingestão e no registro.
+
+Várias sessões (threads) pedem a mesma chave ao mesmo tempo, como duas abas subindo o
+mesmo arquivo: confere que o cálculo roda uma única vez e que todas recebem o mesmo
+objeto, que uma falha não trava quem esperava e que um cálculo aninhado da mesma chave
+não espera por si mesmo. Compara o tempo com o de um cálculo só.
+
+Uso: python benchmarks/bench_cache.py [sessoes] [segundos por cálculo]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.cache import CacheLRU  # noqa: E402
+from pipeline.registro import RegistroDatasets  # noqa: E402
+
+
+def em_paralelo(sessoes, funcao):
+    resultados, erros = [None] * sessoes, []
+    barreira = threading.Barrier(sessoes)
+
+    def sessao(i):
+        barreira.wait()
+        try:
+            resultados[i] = funcao()
+        except Exception as erro:
+            erros.append(erro)
+
+    threads = [threading.Thread(target=sessao, args=(i,)) for i in range(sessoes)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultados, erros, time.perf_counter() - inicio
+
+
+def conferir(nome, cache, sessoes, segundos):
+    calculos = []
+
+    def calcular():
+        calculos.append(threading.get_ident())
+        time.sleep(segundos)
+        return object()
+
+    resultados, erros, decorrido = em_paralelo(sessoes, lambda: cache.obter_ou_calcular('arquivo', calcular))
+    assert not erros and len(calculos) == 1, f"{len(calculos)} cálculos para a mesma chave"
+    assert all(resultado is resultados[0] for resultado in resultados)
+
+    # O primeiro cálculo falha: ele recebe o erro e outra sessão calcula
+    falhas = []
+
+    def falhar_uma_vez():
+        time.sleep(segundos)
+        if not falhas:
+            falhas.append(threading.get_ident())
+            raise RuntimeError("arquivo corrompido")
+        return object()
+
+    resultados, erros, _ = em_paralelo(sessoes, lambda: cache.obter_ou_calcular('outro', falhar_uma_vez))
+    assert len(erros) == 1 and sum(resultado is not None for resultado in resultados) == sessoes - 1
+
+    # Cálculo que pede a própria chave (aninhado) não trava
+    assert cache.obter_ou_calcular('aninhado', lambda: cache.obter_ou_calcular('aninhado', object)) is not None
+
+    print(f"  {nome:<18} {sessoes} sessões na mesma chave: 1 cálculo, {decorrido:.2f}s "
+          f"(em série seriam {sessoes * segundos:.2f}s)")
+
+
+def main(sessoes, segundos):
+    print("Cálculos simultâneos da mesma chave")
+    conferir("CacheLRU", CacheLRU(), sessoes, segundos)
+    conferir("RegistroDatasets", RegistroDatasets(), sessoes, segundos)
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 8,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.2,
+    )
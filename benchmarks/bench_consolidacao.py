@@ -0,0 +1,59 @@
+"""
+Benchmark (e conferência) da remoção de linhas repetidas entre arquivos consolidados.
+
+Confere que pipeline.consolidacao.remover_sobrepostas reconhece a mesma (NF, COD PRODUTO)
+quando um arquivo trouxe a NF numérica e outro como texto com zeros à esquerda ou ".0",
+e mede a remoção com as colunas no mesmo tipo e em tipos misturados.
+
+Uso: python benchmarks/bench_consolidacao.py [linhas]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.consolidacao import concatenar, remover_sobrepostas  # noqa: E402
+
+
+def conferir_chaves():
+    numerico = pd.DataFrame({
+        'nf': np.array([11466, 11467, 11468, 0], dtype='int64'),
+        'cod_produto': pd.Categorical(['10', '20', '30', '40']),
+    })
+    texto = pd.DataFrame({
+        'nf': pd.Categorical(['0011466', '11467.0', '99', '0000000']),
+        'cod_produto': pd.Categorical(['10', '020', '30', '40']),
+    })
+    df, removidas = remover_sobrepostas(concatenar([numerico, texto]), np.repeat([0, 1], 4))
+    assert removidas == 3 and df['nf'].astype(str).tolist() == ['11466', '11467', '11468', '0', '99'], df
+    print("  NF 11466 / \"0011466\", 11467 / \"11467.0\" e 0 / \"0000000\" reconhecidas como a mesma linha")
+
+
+def main(linhas):
+    print("Linhas repetidas entre arquivos")
+    conferir_chaves()
+
+    rng = np.random.default_rng(0)
+    primeiro = pd.DataFrame({
+        'nf': rng.integers(0, linhas // 3, linhas),
+        'cod_produto': pd.Categorical(rng.integers(0, 5000, linhas).astype(str)),
+    })
+    # Segundo arquivo repete metade das linhas do primeiro
+    repetido = primeiro.iloc[: linhas // 2]
+    como_texto = repetido.assign(nf=pd.Categorical(repetido['nf'].astype(str).str.zfill(7)))
+    origem = np.repeat([0, 1], [linhas, linhas // 2])
+    for nome, segundo in (("NF numérica nos dois", repetido), ("NF texto com zeros no segundo", como_texto)):
+        df = concatenar([primeiro, segundo])
+        inicio = time.perf_counter()
+        _, removidas = remover_sobrepostas(df, origem)
+        decorrido = time.perf_counter() - inicio
+        assert removidas == len(segundo), f"{removidas:,} removidas, esperado {len(segundo):,}"
+        print(f"  {nome:<30} {len(df):>10,} linhas  {removidas:>9,} removidas  {decorrido:7.3f}s")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
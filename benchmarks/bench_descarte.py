@@ -0,0 +1,77 @@
+"""
+Benchmark (e conferência) do descarte das linhas de totais na limpeza.
+
+Confere que pipeline.ingestao.classificar_linhas marca exatamente as mesmas linhas que a
+sequência antiga de filtros (str.contains por coluna, um DataFrame filtrado por passada),
+incluindo as linhas "TOTAIS" e as variações de maiúsculas, e compara os tempos.
+
+Uso: python benchmarks/bench_descarte.py [linhas]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.ingestao import classificar_linhas  # noqa: E402
+
+# Valores que o relatório usa nas linhas de totalização, misturados aos nomes comuns
+TOTALIZACOES = ['TOTAIS', 'Totais do Representante', 'TOTAL GERAL', 'Subtotal', 'geral', 'TOTAL']
+
+
+def dimensoes_sinteticas(linhas):
+    rng = np.random.default_rng(0)
+
+    def coluna(prefixo, distintos):
+        valores = np.array([f"{prefixo} {i}" for i in range(distintos)] + TOTALIZACOES + [''], dtype=object)
+        extras = len(TOTALIZACOES) + 1
+        pesos = np.r_[np.full(distintos, 0.97 / distintos), np.full(extras, 0.03 / extras)]
+        return valores[rng.choice(len(valores), linhas, p=pesos)]
+
+    return pd.DataFrame({
+        'representante': coluna('REPRESENTANTE', 40),
+        'cliente': coluna('CLIENTE', 5000),
+        'descricao': coluna('PRODUTO', 800),
+    })
+
+
+def descarte_antigo(df):
+    """
+    Máscara das linhas que a limpeza antiga tirava por serem de totais.
+    """
+    mascara = np.zeros(len(df), dtype=bool)
+    for col in ['representante', 'cliente']:
+        mascara |= df[col].astype(str).str.contains('total', case=False, na=False).to_numpy()
+    for col in ['representante', 'cliente', 'descricao']:
+        mascara |= df[col].astype(str).str.lower().str.contains('total|geral|totais', na=False).to_numpy()
+    return mascara
+
+
+def main(linhas):
+    df = dimensoes_sinteticas(linhas)
+
+    inicio = time.perf_counter()
+    antigo = descarte_antigo(df)
+    t_antigo = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    novo = classificar_linhas(df)['totais']
+    t_novo = time.perf_counter() - inicio
+
+    assert np.array_equal(antigo, novo), f"{int((antigo != novo).sum())} linhas classificadas de outro jeito"
+    totais = np.zeros(len(df), dtype=bool)
+    for col in df.columns:
+        totais |= (df[col] == 'TOTAIS').to_numpy()
+    assert totais.any() and novo[totais].all(), "linhas TOTAIS não descartadas"
+
+    print(f"{linhas:,} linhas: {int(novo.sum()):,} de totais ({int(totais.sum()):,} \"TOTAIS\") — "
+          "mesmas linhas da versão antiga")
+    print(f"  str.contains por coluna: {t_antigo:.3f}s   classificar_linhas: {t_novo:.3f}s   "
+          f"({t_antigo / t_novo:.1f}x)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,55 @@
+"""
+Benchmark (e conferência) da formatação pt-BR de moeda/porcentagem.
+
+Confere que pipeline.formatacao.formatar_br gera exatamente o mesmo texto que a
+f-string com troca de separadores aplicada célula a célula (incluindo NaN, negativos,
+zeros negativos, empates de meio centavo e valores enormes) e compara os tempos.
+
+Uso: python benchmarks/bench_formatacao.py [linhas]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.formatacao import formatar_escalar_br, formatar_moeda_br  # noqa: E402
+
+
+def coluna_sintetica(linhas):
+    rng = np.random.default_rng(0)
+    valores = rng.normal(5000, 40000, linhas).round(2)
+    n = max(linhas // 20, 1)
+    bordas = np.concatenate([
+        [np.nan, 0.0, -0.0, -0.001, 0.005, 0.015, 0.125, 1.005, 2.675, 999.995, 999_999.995],
+        [1e12 - 0.001, 1e15, -1e18, 123456789012.345],
+        rng.integers(0, 10**6, n // 10) + 0.005,
+        -(rng.integers(0, 10**9, n // 10) + 0.5),
+    ])
+    valores[:len(bordas)] = bordas[:linhas]
+    valores[rng.choice(linhas, n, replace=False)] = np.nan
+    return pd.Series(valores)
+
+
+def main(linhas):
+    serie = coluna_sintetica(linhas)
+
+    inicio = time.perf_counter()
+    escalar = serie.map(lambda x: formatar_escalar_br(x, "R$ ") if pd.notna(x) else "R$ 0,00").to_numpy(dtype=object)
+    t_escalar = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    vetorizada = formatar_moeda_br(serie.to_numpy())
+    t_vetorizada = time.perf_counter() - inicio
+
+    divergentes = np.flatnonzero(escalar != vetorizada)
+    assert not len(divergentes), f"textos divergentes: {[(serie[i], escalar[i], vetorizada[i]) for i in divergentes[:5]]}"
+    print(f"{linhas:,} valores — textos idênticos")
+    print(f"  f-string por célula: {t_escalar:8.4f}s   formatar_moeda_br: {t_vetorizada:8.4f}s   ({t_escalar / t_vetorizada:,.1f}x)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
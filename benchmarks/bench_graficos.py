@@ -0,0 +1,94 @@
+"""
+Benchmark das figuras Plotly dos gráficos de margem.
+
+Sobre agregados sintéticos (representantes, top 10 clientes, meses e top N produtos),
+compara o caminho antigo (plotly.express + update_layout/update_traces do tema em cada
+figura) com pipeline.graficos (template único e traços de arrays prontos) e com o acerto
+no cache de figuras (figura_em_cache). Todos os tempos incluem o fig.to_json() que o
+st.plotly_chart faz a cada render.
+
+Uso: python benchmarks/bench_graficos.py [produtos]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.cache import CacheLRU  # noqa: E402
+from pipeline.formatacao import adicionar_tooltips  # noqa: E402
+from pipeline.graficos import CUSTOM_DATA, FIGURAS, figura_em_cache, tooltip_margem  # noqa: E402
+from pipeline.margem import adicionar_margem_percentual  # noqa: E402
+
+REPETICOES = 20
+ROTULOS = {'representante': "Representante", 'cliente': "Cliente", 'mes_ano': "Mês/Ano", 'descricao': "Produto"}
+
+
+def agregado_sintetico(dimensao, valores, rng):
+    valor_net = rng.gamma(2.0, 50_000.0, len(valores)).round(2)
+    custo_total = (valor_net * rng.uniform(0.3, 0.9, len(valores))).round(2)
+    agregado = pd.DataFrame({
+        dimensao: valores, 'valor_net': valor_net, 'custo_total': custo_total,
+        'margem_em_valor': valor_net - custo_total,
+    })
+    return adicionar_tooltips(adicionar_margem_percentual(agregado))
+
+
+def figura_antiga(dimensao, agregado):
+    """
+    Como as figuras eram montadas antes do template: express e o tema aplicado por figura.
+    """
+    grafico = px.line if dimensao == 'mes_ano' else px.bar
+    fig = grafico(agregado, x=dimensao, y='margem_em_valor', custom_data=CUSTOM_DATA,
+                  labels={'margem_em_valor': 'Margem em Valor (R$)', dimensao: ROTULOS[dimensao]})
+    fig.update_traces(hovertemplate=tooltip_margem(ROTULOS[dimensao]))
+    fig.update_layout(
+        title={'text': ROTULOS[dimensao], 'y': 0.93, 'x': 0.5, 'xanchor': 'center', 'yanchor': 'top',
+               'font': {'size': 30, 'color': '#ADD8E6', 'family': 'Segoe UI, sans-serif'}},
+        font=dict(family='Segoe UI, sans-serif', size=18, color='#E0E0E0'),
+        plot_bgcolor='#22232B', paper_bgcolor='#22232B', margin=dict(l=40, r=40, t=70, b=40),
+        xaxis=dict(tickfont=dict(size=16, color='#E0E0E0'), gridcolor='rgba(160, 160, 160, 0.15)', tickangle=-25),
+        yaxis=dict(tickfont=dict(size=16, color='#E0E0E0'), gridcolor='rgba(160, 160, 160, 0.12)'),
+        width=1400, height=500,
+    )
+    fig.update_traces(
+        marker=dict(color='#6C5B7B', line=dict(width=0), opacity=0.96),
+        hoverlabel=dict(font_size=18, font_family="Segoe UI, sans-serif", bgcolor='#6C5B7B', font_color='#E0E0E0'),
+    )
+    return fig
+
+
+def cronometrar(funcao):
+    inicio = time.perf_counter()
+    for _ in range(REPETICOES):
+        resultado = funcao()
+    return resultado, (time.perf_counter() - inicio) / REPETICOES
+
+
+def main(produtos):
+    rng = np.random.default_rng(0)
+    agregados = {
+        'representante': agregado_sintetico('representante', [f"REPRESENTANTE {i}" for i in range(30)], rng),
+        'cliente': agregado_sintetico('cliente', [f"CLIENTE {i:05d} COMERCIO LTDA" for i in range(10)], rng),
+        'mes_ano': agregado_sintetico('mes_ano', [f"2025-{m:02d}" for m in range(1, 13)], rng),
+        'descricao': agregado_sintetico('descricao', [f"PRODUTO {i:06d}" for i in range(produtos)], rng),
+    }
+    print(f"Figuras de margem (top {produtos} produtos); tempos com to_json")
+    for dimensao, agregado in agregados.items():
+        construtor = FIGURAS[dimensao]
+        parametros = (produtos,) if dimensao == 'descricao' else ()
+        json_antigo, t_antigo = cronometrar(lambda: figura_antiga(dimensao, agregado).to_json())
+        json_novo, t_novo = cronometrar(lambda: construtor(agregado, *parametros).to_json())
+        cache = CacheLRU()
+        figura_em_cache(cache, construtor, agregado, *parametros)
+        _, t_cache = cronometrar(lambda: figura_em_cache(cache, construtor, agregado, *parametros).to_json())
+        print(f"  {dimensao:<14} express: {t_antigo * 1000:7.1f}ms {len(json_antigo) / 1024:6.1f}KB   "
+              f"template: {t_novo * 1000:7.1f}ms {len(json_novo) / 1024:6.1f}KB   cache: {t_cache * 1000:6.1f}ms")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,146 @@
+"""
+Benchmark (e conferência) da anexação incremental de um extrato diário.
+
+Gera (ou reaproveita) um histórico sintético, monta o extrato do dia com linhas novas e
+algumas correções de (NF, COD PRODUTO) já existentes, e mede pipeline.incremental contra
+reprocessar tudo. Confere que o cubo e o índice de filtros atualizados são iguais aos
+reconstruídos do zero sobre o dataset resultante, e que extratos anexados em cadeia não
+acumulam relatórios salvos.
+
+Uso: python benchmarks/bench_incremental.py [linhas_historico] [linhas_extrato] [--correcoes N]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gerar_relatorio import COLUNAS, bloco_sintetico, caminho_padrao, cadastros, gerar_relatorio  # noqa: E402
+from pipeline.armazenamento import ArmazemDatasets  # noqa: E402
+from pipeline.cubo import DIMENSOES_CUBO, construir_cubo  # noqa: E402
+from pipeline.filtros import IndiceFiltros  # noqa: E402
+from pipeline.incremental import anexar_extrato  # noqa: E402
+from pipeline.ingestao import carregar_dataset  # noqa: E402
+
+SAIDA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saida')
+
+
+def extrato_sintetico(historico, linhas_historico, linhas, correcoes, semente=1):
+    """
+    CSV do extrato: continua a numeração de NF do histórico e repete `correcoes`
+    chaves (NF, COD PRODUTO) já existentes, com valores novos.
+    """
+    rng = np.random.default_rng(semente)
+    cad = cadastros(linhas_historico, np.random.default_rng(0))
+    bloco, _ = bloco_sintetico(linhas_historico, linhas, cad, rng)
+    sorteadas = historico.iloc[rng.choice(len(historico), correcoes, replace=False)]
+    bloco.loc[:correcoes - 1, 'NF'] = [str(nf).removesuffix('.0').zfill(7) for nf in sorteadas['nf']]
+    bloco.loc[:correcoes - 1, 'COD PRODUTO'] = sorteadas['cod_produto'].astype(str).to_numpy()
+    saida = io.StringIO()
+    saida.write(';'.join(COLUNAS) + '\r\n')
+    bloco.to_csv(saida, sep=';', header=False, index=False, lineterminator='\r\n')
+    return saida.getvalue().encode('latin1')
+
+
+def conferir_tabela(nome, atualizada, reconstruida):
+    dimensoes = [c for c in reconstruida.columns if c in DIMENSOES_CUBO or c == 'mes']
+    texto = {c: object for c in dimensoes if c != 'mes'}
+    a = atualizada.astype(texto).sort_values(dimensoes).reset_index(drop=True)
+    b = reconstruida.astype(texto).sort_values(dimensoes).reset_index(drop=True)
+    assert len(a) == len(b), f"{nome} com {len(a)} células, esperado {len(b)}"
+    for col in dimensoes:
+        assert (a[col].to_numpy() == b[col].to_numpy()).all(), f"{nome}: dimensão {col} divergente"
+    for col in [c for c in b.columns if c not in dimensoes]:
+        assert np.allclose(a[col].to_numpy(dtype=float), b[col].to_numpy(dtype=float)), f"{nome}: medida {col} divergente"
+
+
+def conferir_cubo(atualizado, reconstruido):
+    conferir_tabela("cubo", atualizado.celulas, reconstruido.celulas)
+    assert set(atualizado.marginais) == set(reconstruido.marginais)
+    for dimensao, tabela in reconstruido.marginais.items():
+        conferir_tabela(f"marginal {dimensao}", atualizado.marginais[dimensao], tabela)
+
+
+def conferir_indice(atualizado, reconstruido):
+    assert atualizado.linhas == reconstruido.linhas
+    for col in reconstruido.codigos:
+        assert atualizado.valores[col] == reconstruido.valores[col], f"valores de {col} divergentes"
+        assert (atualizado.codigos[col] == reconstruido.codigos[col]).all(), f"códigos de {col} divergentes"
+    assert (atualizado.ordem_datas == reconstruido.ordem_datas).all()
+    assert (atualizado.datas_ordenadas == reconstruido.datas_ordenadas).all()
+
+
+def conferir_poda(base, extratos):
+    """
+    Cada extrato anexado ao relatório salvo pelo anterior: ficam o original e os dois
+    últimos incrementais (o mais novo e a base dele).
+    """
+    with tempfile.TemporaryDirectory() as diretorio:
+        armazem = ArmazemDatasets(diretorio)
+        armazem.salvar(base)
+        cadeia = [base]
+        for i, extrato in enumerate(extratos):
+            cadeia.append(anexar_extrato(cadeia[-1], extrato, f"extrato_{i}.csv", armazem=armazem).dataset)
+        salvos = sorted(meta['chave'] for meta in armazem.listar())
+        assert salvos == sorted(d.chave for d in [base, *cadeia[-2:]]), f"{len(salvos)} relatórios salvos"
+        assert len(os.listdir(diretorio)) == 3 * len(salvos), "arquivos de relatórios podados ficaram"
+    print(f"  {len(extratos)} extratos em cadeia: {len(salvos)} relatórios salvos (original + 2 últimos)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('linhas_historico', type=int, nargs='?', default=2_000_000)
+    parser.add_argument('linhas_extrato', type=int, nargs='?', default=2_000)
+    parser.add_argument('--correcoes', type=int, default=200, help="chaves do histórico repetidas no extrato")
+    args = parser.parse_args()
+
+    os.makedirs(SAIDA, exist_ok=True)
+    caminho = caminho_padrao(SAIDA, args.linhas_historico)
+    if not os.path.exists(caminho):
+        gerar_relatorio(caminho, args.linhas_historico)
+    with open(caminho, 'rb') as arquivo:
+        conteudo = arquivo.read()
+
+    inicio = time.perf_counter()
+    base = carregar_dataset(conteudo, os.path.basename(caminho))
+    cubo = construir_cubo(base.df)
+    indice = IndiceFiltros(base.df)
+    t_base = time.perf_counter() - inicio
+    extrato = extrato_sintetico(base.df, args.linhas_historico, args.linhas_extrato, args.correcoes)
+
+    inicio = time.perf_counter()
+    anexacao = anexar_extrato(base, extrato, 'extrato_diario.csv', cubo=cubo, indice=indice)
+    t_anexar = time.perf_counter() - inicio
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        inicio = time.perf_counter()
+        ArmazemDatasets(diretorio).salvar(anexacao.dataset)
+        t_salvar = time.perf_counter() - inicio
+
+    df = anexacao.dataset.df
+    assert len(df) == len(base.df) - anexacao.substituidas + anexacao.linhas_extrato
+    assert anexacao.substituidas >= args.correcoes
+    conferir_cubo(anexacao.cubo, construir_cubo(df))
+    conferir_indice(anexacao.indice, IndiceFiltros(df))
+
+    print(f"histórico {len(base.df):,} linhas + extrato {anexacao.linhas_extrato:,} linhas "
+          f"({anexacao.substituidas:,} substituídas) — cubo e índice idênticos à reconstrução")
+    print(f"  reprocessar histórico (parse + cubo + índice): {t_base:8.3f}s")
+    print(f"  anexar extrato (parse + upsert + cubo + índice): {t_anexar:8.3f}s   ({t_base / t_anexar:,.0f}x)")
+    print(f"  persistir o resultado (Feather): {t_salvar:8.3f}s")
+
+    pequeno = replace(base, df=base.df.head(20_000))
+    conferir_poda(pequeno, [
+        extrato_sintetico(pequeno.df, args.linhas_historico, 500, 50, semente=semente) for semente in range(2, 7)
+    ])
+
+
+if __name__ == '__main__':
+    main()
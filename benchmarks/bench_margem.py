@@ -0,0 +1,39 @@
+"""
+Benchmark (e conferência) do cálculo de margem percentual.
+
+Compara os tempos de calcular_margem_percentual aplicada linha a linha com
+pipeline.margem.margem_percentual, sobre os dados de benchmarks/conferir_margem.py, e
+reaproveita a conferência de lá (zero, NaN e negativos) antes de mostrar os tempos.
+
+Uso: python benchmarks/bench_margem.py [linhas]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conferir_margem import agregado_sintetico, conferir, margem_linha_a_linha  # noqa: E402
+from pipeline.margem import margem_percentual  # noqa: E402
+
+
+def main(linhas):
+    df = agregado_sintetico(linhas)
+
+    inicio = time.perf_counter()
+    escalar = margem_linha_a_linha(df)
+    t_escalar = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    margem_percentual(df['valor_net'].to_numpy(), df['custo_total'].to_numpy())
+    t_vetorizada = time.perf_counter() - inicio
+
+    divergentes = conferir(df, escalar)
+    if len(divergentes):
+        sys.exit(f"{len(divergentes):,} margens divergentes")
+    print(f"{len(df):,} grupos — resultados idênticos")
+    print(f"  apply(axis=1): {t_escalar:8.4f}s   margem_percentual: {t_vetorizada:8.4f}s   ({t_escalar / t_vetorizada:,.0f}x)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 80_000)
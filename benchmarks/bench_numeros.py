@@ -0,0 +1,63 @@
+"""
+Micro-benchmark do parser de números BR.
+
+Compara a cadeia antiga de .str.replace + pd.to_numeric com pipeline.numeros.parse_numero_br
+e a leitura do CSV com/sem thousands='.'.
+
+Uso: python benchmarks/bench_numeros.py [linhas]
+"""
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.numeros import parse_numero_br  # noqa: E402
+
+
+def cadeia_antiga(serie):
+    serie = (serie.astype(str)
+        .str.replace('%', '', regex=False)
+        .str.replace('.', '', regex=False)
+        .str.replace(',', '.', regex=False)
+        .str.replace(' ', '')
+        .replace('', np.nan)
+        )
+    return pd.to_numeric(serie, errors='coerce')
+
+
+def formatar_br(valores):
+    return [f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") for v in valores]
+
+
+def cronometrar(func, *args):
+    inicio = time.perf_counter()
+    resultado = func(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def main(linhas):
+    rng = np.random.default_rng(0)
+    valores = rng.normal(0, 1e5, linhas).round(2)
+    coluna = pd.Series(formatar_br(valores), dtype=object)
+    porcentagens = pd.Series([f"{int(v)}%" for v in rng.integers(-300, 100, linhas)], dtype=object)
+
+    print(f"{linhas:,} linhas")
+    for nome, serie in (('valores', coluna), ('porcentagens', porcentagens)):
+        t_antigo, antigo = cronometrar(cadeia_antiga, serie)
+        t_novo, (novo, _) = cronometrar(parse_numero_br, serie)
+        assert np.array_equal(antigo.to_numpy(), novo, equal_nan=True)
+        print(f"  {nome:<13} str.replace: {t_antigo:7.3f}s   parse_numero_br: {t_novo:7.3f}s   ({t_antigo / t_novo:4.1f}x)")
+
+    csv = ("VALOR\n" + "\n".join(coluna)).encode('latin1')
+    t_antigo, _ = cronometrar(lambda: cadeia_antiga(pd.read_csv(io.BytesIO(csv), sep=';', decimal=',')['VALOR']))
+    t_novo, _ = cronometrar(lambda: parse_numero_br(pd.read_csv(io.BytesIO(csv), sep=';', decimal=',', thousands='.')['VALOR']))
+    print(f"  {'csv + parse':<13} str.replace: {t_antigo:7.3f}s   thousands='.':   {t_novo:7.3f}s   ({t_antigo / t_novo:4.1f}x)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,88 @@
+"""
+Benchmark (e conferência) do registro de datasets compartilhado entre sessões.
+
+Confere, com um relógio simulado, que um dataset maior que o limite de bytes dos ociosos
+sobrevive entre o guardar (ingestão, às vezes numa thread) e o usar da sessão, e que sai
+pelo limite quando a reserva vence ou a sessão o solta. Depois mede obter+usar com muitas
+sessões alternando entre datasets.
+
+Uso: python benchmarks/bench_registro.py [sessoes] [datasets]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.ingestao import Dataset  # noqa: E402
+from pipeline.registro import RegistroDatasets  # noqa: E402
+
+REPETICOES = 20
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def dataset_sintetico(chave, linhas):
+    df = pd.DataFrame({'valor_net': np.ones(linhas), 'custo_total': np.ones(linhas)})
+    return Dataset(chave=chave, nome=f"{chave}.csv", df=df)
+
+
+def conferir_limite():
+    relogio = Relogio()
+    despejadas = []
+    registro = RegistroDatasets(max_bytes_ociosos=100_000, reserva_segundos=60,
+                                ao_despejar=despejadas.append, relogio=relogio)
+    grande = dataset_sintetico('grande', 100_000)  # ~1,6 MB, 16x o limite
+
+    # Ingestão registra, outra sessão mexe no registro (expirar) antes do usar
+    assert registro.guardar('grande', grande) is grande
+    registro.liberar('outra')
+    relogio.agora += 30
+    registro.expirar()
+    assert registro.usar('sessao', 'grande') is grande, "despejado entre guardar e usar"
+
+    # Solto pela sessão, volta a contar no limite e sai
+    registro.liberar('sessao')
+    assert 'grande' not in registro and despejadas == ['grande']
+
+    # Registrado e nunca usado: sai quando a reserva vence
+    registro.guardar('grande', grande)
+    relogio.agora += 61
+    registro.expirar()
+    assert 'grande' not in registro
+
+    print("  dataset 16x maior que o limite de ociosos sobrevive de guardar a usar; sai ao vencer a reserva")
+
+
+def main(sessoes, datasets):
+    print("Registro de datasets")
+    conferir_limite()
+
+    registro = RegistroDatasets()
+    chaves = [f"dataset-{i}" for i in range(datasets)]
+    for chave in chaves:
+        registro.guardar(chave, dataset_sintetico(chave, 1_000))
+    inicio = time.perf_counter()
+    for rodada in range(REPETICOES):
+        for sessao in range(sessoes):
+            chave = chaves[(sessao + rodada) % datasets]
+            registro.usar(sessao, registro.obter(chave).chave)
+    por_acesso = (time.perf_counter() - inicio) / (REPETICOES * sessoes)
+    assert registro.resumo()['sessoes'] == sessoes
+    print(f"  {sessoes:,} sessões, {datasets} datasets: obter+usar {por_acesso * 1e6:8.1f}µs por rerun")
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 8,
+    )
@@ -0,0 +1,83 @@
+"""
+Benchmark (e conferência) da série temporal da margem.
+
+Sobre linhas de NF sintéticas cobrindo vários anos, compara o agrupamento antigo (to_period
++ texto + groupby sobre as linhas, refeito a cada rerun) com a série diária de
+pipeline.temporal: um bincount por medida sobre as linhas, e cada agrupamento (semana, mês,
+trimestre) e comparação (período anterior, ano anterior) custa O(dias). Confere que os totais mensais
+são os mesmos e que a fatia da série pelo período (o que o dashboard faz a cada mudança de
+período) é igual à série montada só das linhas do período.
+
+Uso: python benchmarks/bench_temporal.py [linhas] [anos]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.analise import tendencia_margem  # noqa: E402
+from pipeline.temporal import FREQUENCIAS, fatiar_serie, reamostrar, serie_diaria, tabela_periodos  # noqa: E402
+
+REPETICOES = 5
+
+
+def linhas_sinteticas(linhas, anos):
+    rng = np.random.default_rng(0)
+    valor_net = rng.gamma(2.0, 800.0, linhas).round(2)
+    custo_total = (valor_net * rng.uniform(0.1, 1.1, linhas)).round(2)
+    return pd.DataFrame({
+        'representante': pd.Categorical(rng.integers(0, 20, linhas).astype(str)),
+        'cliente': pd.Categorical(rng.integers(0, 3000, linhas).astype(str)),
+        'data': pd.Timestamp('2021-01-01') + pd.to_timedelta(rng.integers(0, 365 * anos, linhas), unit='D'),
+        'valor_bruto': (valor_net * 1.3).round(2),
+        'valor_net': valor_net,
+        'custo_total': custo_total,
+        'margem_em_valor': valor_net - custo_total,
+    })
+
+
+def cronometrar(funcao):
+    inicio = time.perf_counter()
+    for _ in range(REPETICOES):
+        resultado = funcao()
+    return resultado, (time.perf_counter() - inicio) / REPETICOES
+
+
+def main(linhas, anos):
+    df = linhas_sinteticas(linhas, anos)
+
+    antigo, t_antigo = cronometrar(
+        lambda: df.groupby(df['data'].dt.to_period('M').astype(str))['margem_em_valor'].sum()
+    )
+    serie, t_serie = cronometrar(lambda: serie_diaria(df))
+    mensal = tabela_periodos(reamostrar(serie, 'M'))
+    assert np.allclose(antigo.to_numpy(), mensal['margem_em_valor'].to_numpy(), rtol=1e-9)
+    assert antigo.index.tolist() == mensal['periodo'].tolist()
+
+    print(f"{linhas:,} linhas, {anos} anos ({serie.num_dias:,} dias) — totais mensais idênticos")
+    print(f"  groupby por mês nas linhas: {t_antigo * 1000:8.1f}ms   série diária: {t_serie * 1000:8.1f}ms")
+
+    inicio, fim = pd.Timestamp('2022-03-15').date(), pd.Timestamp('2023-08-10').date()
+    posicoes = np.flatnonzero(((df['data'].dt.date >= inicio) & (df['data'].dt.date <= fim)).to_numpy())
+    linhas_periodo, t_linhas = cronometrar(lambda: serie_diaria(df.take(posicoes)))
+    fatia, t_fatia = cronometrar(lambda: fatiar_serie(serie, inicio, fim))
+    assert fatia.inicio == linhas_periodo.inicio and fatia.num_dias == linhas_periodo.num_dias
+    for col, valores in linhas_periodo.medidas.items():
+        assert np.allclose(fatia.medidas[col], valores, rtol=1e-9), f"{col} divergente na fatia"
+    print(f"  período {inicio} a {fim}: série das linhas {t_linhas * 1000:8.1f}ms   "
+          f"fatia da série: {t_fatia * 1000:8.3f}ms")
+    for frequencia in FREQUENCIAS:
+        for comparacao in (None, 'anterior', 'ano_anterior'):
+            tabela, t = cronometrar(lambda: tendencia_margem(serie, frequencia, comparacao))
+            print(f"  {FREQUENCIAS[frequencia]:<9} {comparacao or '-':<13} {len(tabela):>6,} períodos {t * 1000:8.2f}ms")
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5,
+    )
@@ -0,0 +1,72 @@
+"""
+Benchmark (e conferência) da seleção Top N do gráfico de produtos.
+
+Compara, sobre um rollup sintético com muitos produtos, o caminho antigo (margem % e
+tooltips de todos os produtos, sort_values e head) com selecionar_agregado (argpartition
+e derivados só dos N escolhidos), confere que o resultado é o mesmo e mede também os
+N piores e o balde "Outros".
+
+Uso: python benchmarks/bench_topn.py [produtos] [n]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.analise import selecionar_agregado  # noqa: E402
+from pipeline.formatacao import adicionar_tooltips  # noqa: E402
+from pipeline.margem import adicionar_margem_percentual  # noqa: E402
+
+REPETICOES = 20
+
+
+def rollup_sintetico(produtos):
+    rng = np.random.default_rng(0)
+    valor_net = rng.gamma(2.0, 5000.0, produtos).round(2)
+    custo_total = (valor_net * rng.uniform(0.5, 1.1, produtos)).round(2)
+    return pd.DataFrame({
+        'descricao': pd.Categorical([f"PRODUTO {i:06d}" for i in range(produtos)]),
+        'valor_net': valor_net,
+        'custo_total': custo_total,
+        'margem_em_valor': valor_net - custo_total,
+    })
+
+
+def antigo(rollup, n):
+    agregado = adicionar_margem_percentual(rollup.copy()).sort_values('margem_em_valor', ascending=False)
+    return adicionar_tooltips(agregado.head(n).copy())
+
+
+def cronometrar(funcao):
+    inicio = time.perf_counter()
+    for _ in range(REPETICOES):
+        resultado = funcao()
+    return resultado, (time.perf_counter() - inicio) / REPETICOES
+
+
+def main(produtos, n):
+    rollup = rollup_sintetico(produtos)
+
+    esperado, t_antigo = cronometrar(lambda: antigo(rollup, n))
+    obtido, t_novo = cronometrar(lambda: selecionar_agregado(rollup, 'descricao', n))
+    pd.testing.assert_frame_equal(esperado.reset_index(drop=True), obtido)
+    print(f"{produtos:,} produtos, top {n} — resultados idênticos")
+    print(f"  sort_values+head: {t_antigo * 1000:8.2f}ms   argpartition: {t_novo * 1000:8.2f}ms"
+          f"   ({t_antigo / t_novo:,.1f}x)")
+
+    piores, t_piores = cronometrar(lambda: selecionar_agregado(rollup, 'descricao', n, menores=True))
+    assert piores['margem_em_valor'].is_monotonic_increasing
+    com_outros, t_outros = cronometrar(lambda: selecionar_agregado(rollup, 'descricao', n, outros=True))
+    assert np.isclose(com_outros['margem_em_valor'].sum(), rollup['margem_em_valor'].sum())
+    print(f"  piores {n}: {t_piores * 1000:8.2f}ms   top {n} + Outros: {t_outros * 1000:8.2f}ms")
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 80_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 10,
+    )
@@ -0,0 +1,118 @@
+"""
+Benchmark (e conferência) da leitura de relatórios em Excel.
+
+Gera (ou reaproveita) um xlsx sintético no formato exportado pelo ERP — preâmbulo "PDF:"
+acima do cabeçalho, uma aba de resumo antes da aba de dados, números e datas como células
+tipadas e colunas que o dashboard não usa — e compara pd.read_excel (openpyxl padrão)
+com o leitor read-only de pipeline.ingestao. Confere que os dois dão o mesmo dataset limpo
+e mede a reabertura pelo armazém (Feather), que é o que os uploads seguintes do mesmo
+arquivo pagam.
+
+Uso: python benchmarks/bench_xlsx.py [linhas] [--sem-pandas]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gerar_relatorio import COLUNAS, bloco_sintetico, cadastros  # noqa: E402
+from pipeline.armazenamento import ArmazemDatasets  # noqa: E402
+from pipeline.ingestao import carregar_dataset, ler_xlsx, limpar_dataframe  # noqa: E402
+from pipeline.numeros import parse_numero_br  # noqa: E402
+
+SAIDA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saida')
+# Colunas que o ERP exporta e o dashboard ignora
+COLUNAS_EXTRAS = ['CFOP', 'OBSERVACAO']
+
+
+def gerar_xlsx(caminho, linhas, semente=0):
+    """
+    Escreve o xlsx sintético com `linhas` linhas de NF (escrita em streaming, write_only).
+    """
+    rng = np.random.default_rng(semente)
+    bloco, _ = bloco_sintetico(0, linhas, cadastros(linhas, rng), rng)
+    for col in COLUNAS[6:]:
+        bloco[col], _ = parse_numero_br(bloco[col])
+    bloco['NF'] = bloco['NF'].astype(int)
+    bloco['DATA'] = pd.to_datetime(bloco['DATA'], dayfirst=True).dt.to_pydatetime()
+    bloco['CFOP'] = 5102
+    bloco['OBSERVACAO'] = 'VENDA'
+
+    planilha = openpyxl.Workbook(write_only=True)
+    resumo = planilha.create_sheet('Resumo')
+    resumo.append(['Relatório de margem sintético', None])
+    resumo.append(['Linhas', linhas])
+    dados = planilha.create_sheet('Margem')
+    dados.append(['PDF:', 'Relatorio_de_margem.pdf'])
+    dados.append([])
+    dados.append([*COLUNAS, *COLUNAS_EXTRAS])
+    for linha in bloco[[*COLUNAS, *COLUNAS_EXTRAS]].itertuples(index=False, name=None):
+        dados.append(linha)
+    dados.append([None, None, None, 'TOTAL GERAL', None, None, None, *bloco[COLUNAS[7:]].sum().tolist()])
+    planilha.save(caminho)
+    return os.path.getsize(caminho)
+
+
+def conferir(a, b):
+    assert len(a) == len(b), f"{len(a)} linhas, esperado {len(b)}"
+    for col in ['valor_bruto', 'custo_total', 'valor_net', 'margem_em_valor']:
+        assert np.isclose(a[col].sum(), b[col].sum()), f"soma de {col} divergente"
+    for col in ['cliente', 'representante', 'descricao', 'cod_produto']:
+        assert (a[col].astype(str).to_numpy() == b[col].astype(str).to_numpy()).all(), f"{col} divergente"
+    assert (pd.to_datetime(a['data']).to_numpy() == pd.to_datetime(b['data']).to_numpy()).all(), "datas divergentes"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('linhas', type=int, nargs='?', default=200_000)
+    parser.add_argument('--sem-pandas', action='store_true', help="não mede o pd.read_excel (lento)")
+    args = parser.parse_args()
+
+    os.makedirs(SAIDA, exist_ok=True)
+    caminho = os.path.join(SAIDA, f"Relatorio_de_margem_sintetico_{args.linhas}.xlsx")
+    if not os.path.exists(caminho):
+        inicio = time.perf_counter()
+        tamanho = gerar_xlsx(caminho, args.linhas)
+        print(f"{caminho}: {tamanho / 1024 ** 2:,.1f} MiB gerados em {time.perf_counter() - inicio:.1f}s")
+    with open(caminho, 'rb') as arquivo:
+        conteudo = arquivo.read()
+
+    inicio = time.perf_counter()
+    bruto = ler_xlsx(conteudo)
+    t_leitura = time.perf_counter() - inicio
+    # Tipos lidos antes da limpeza (que renomeia as colunas do df bruto)
+    tipos = ", ".join(f"{col}={bruto[col].dtype}" for col in ['DATA', 'VALOR BRUTO', 'CLIENTE'])
+    lidas = len(bruto.columns)
+    df, problemas, _, _ = limpar_dataframe(bruto)
+    t_rapido = time.perf_counter() - inicio
+    assert not problemas, problemas
+    print(f"{len(df):,} linhas limpas; {lidas} colunas lidas ({tipos})")
+    print(f"  leitor read-only: {t_leitura:8.3f}s leitura, {t_rapido:8.3f}s com limpeza")
+
+    if not args.sem_pandas:
+        inicio = time.perf_counter()
+        referencia = pd.read_excel(caminho, sheet_name='Margem', skiprows=2)
+        t_pandas = time.perf_counter() - inicio
+        referencia, _, _, _ = limpar_dataframe(referencia)
+        conferir(df, referencia)
+        print(f"  pd.read_excel:    {t_pandas:8.3f}s leitura   ({t_pandas / t_leitura:,.1f}x) — mesmo dataset limpo")
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        armazem = ArmazemDatasets(diretorio)
+        carregar_dataset(conteudo, os.path.basename(caminho), armazem=armazem)
+        inicio = time.perf_counter()
+        reaberto = carregar_dataset(conteudo, os.path.basename(caminho), armazem=armazem)
+        t_armazem = time.perf_counter() - inicio
+        conferir(reaberto.df, df)
+    print(f"  reabrir do armazém (Feather): {t_armazem:8.3f}s")
+
+
+if __name__ == '__main__':
+    main()
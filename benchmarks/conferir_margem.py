@@ -0,0 +1,77 @@
+"""
+Conferência da margem percentual vetorizada, sem cronometragem.
+
+Confere que pipeline.margem.margem_percentual dá exatamente o mesmo resultado que
+calcular_margem_percentual aplicada linha a linha, incluindo os casos de zero, NaN e
+valores negativos. Sai com código 1 se houver divergência, para rodar em CI:
+
+    python benchmarks/conferir_margem.py [linhas]
+
+O benchmark (benchmarks/bench_margem.py) reaproveita os mesmos dados e a mesma conferência.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.margem import calcular_margem_percentual, margem_percentual  # noqa: E402
+
+# Casos de borda fixos: (valor_net, custo_total)
+CASOS_BORDA = [
+    (0.0, 0.0), (0.0, 100.0), (100.0, 0.0),
+    (np.nan, 100.0), (100.0, np.nan), (np.nan, np.nan), (0.0, np.nan), (np.nan, 0.0),
+    (-100.0, 50.0), (100.0, -50.0), (-100.0, -50.0), (-100.0, 0.0), (0.0, -50.0),
+    (-0.0, 10.0), (10.0, -0.0), (0.01, 1e9), (-1e9, 0.01), (1.0, 1.0),
+]
+
+
+def agregado_sintetico(linhas):
+    rng = np.random.default_rng(0)
+    # Normais centradas perto de zero: parte dos valores sai negativa
+    df = pd.DataFrame({
+        'valor_net': rng.normal(5000, 4000, linhas).round(2),
+        'custo_total': rng.normal(1500, 2000, linhas).round(2),
+    })
+    # Casos de borda da versão escalar
+    n = max(linhas // 10, 1)
+    df.loc[df.sample(n, random_state=1).index, 'valor_net'] = 0
+    df.loc[df.sample(n, random_state=2).index, 'custo_total'] = 0
+    df.loc[df.sample(n, random_state=3).index, 'valor_net'] = np.nan
+    df.loc[df.sample(n, random_state=4).index, 'custo_total'] = np.nan
+    bordas = pd.DataFrame(CASOS_BORDA, columns=['valor_net', 'custo_total'])
+    return pd.concat([bordas, df], ignore_index=True)
+
+
+def margem_linha_a_linha(df):
+    return df.apply(lambda row: calcular_margem_percentual(row['valor_net'], row['custo_total']), axis=1)
+
+
+def conferir(df, escalar=None):
+    """
+    Devolve as linhas em que a versão vetorizada diverge da escalar (vazio = idênticas).
+    """
+    if escalar is None:
+        escalar = margem_linha_a_linha(df)
+    escalar = escalar.to_numpy(dtype='float64')
+    vetorizada = margem_percentual(df['valor_net'].to_numpy(), df['custo_total'].to_numpy())
+    if np.array_equal(escalar, vetorizada):
+        return df.iloc[:0]
+    return df.assign(escalar=escalar, vetorizada=vetorizada)[escalar != vetorizada]
+
+
+def main(linhas):
+    df = agregado_sintetico(linhas)
+    divergentes = conferir(df)
+    if len(divergentes):
+        print(f"{len(divergentes):,} de {len(df):,} linhas com margens divergentes:")
+        print(divergentes.head(20).to_string())
+        return 1
+    print(f"{len(df):,} linhas ({len(CASOS_BORDA)} casos de borda) — resultados idênticos")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000))
@@ -0,0 +1,235 @@
+"""
+Suíte de benchmark do pipeline, sem subir o servidor do Streamlit.
+
+Para cada tamanho, gera (ou reaproveita) um relatório sintético com
+benchmarks/gerar_relatorio.py e cronometra as mesmas etapas que o app executa:
+
+    leitura, limpeza, leitura_em_blocos, indice_filtros, filtro, cubo, agregacao,
+    agregacao_periodo, tabela, formatacao, graficos, graficos_cache
+
+O JSON traz também as células do cubo (grão mensal e marginais por dimensão) e a redução
+em relação às linhas limpas. `graficos` monta as figuras de pipeline.graficos num cache vazio
+e `graficos_cache` as pede de novo (acerto no cache); as duas serializam com to_json, como o
+st.plotly_chart faz a cada render.
+
+Por padrão roda 10 mil, 100 mil e 1 milhão de linhas. 10 milhões fica de fora do padrão
+porque só a geração e a leitura do CSV levam vários minutos (e alguns GB de memória); peça
+explicitamente quando quiser o ponto de escala:
+
+    python benchmarks/executar_suite.py --linhas 10000 100000 1000000 10000000
+
+Cada etapa roda `--repeticoes` vezes e fica o menor tempo. O resultado sai em JSON
+(com commit, versões das bibliotecas e tamanho dos dados) para comparar versões:
+
+    python benchmarks/executar_suite.py --saida antes.json
+    ... mudança ...
+    python benchmarks/executar_suite.py --comparar antes.json
+
+Uso: python benchmarks/executar_suite.py [--linhas N ...] [--repeticoes R] [--dados DIR]
+                                         [--saida ARQ.json] [--comparar BASE.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import plotly
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gerar_relatorio import caminho_padrao, gerar_relatorio  # noqa: E402
+from pipeline import ler_arquivo, ler_csv_em_blocos, limpar_dataframe  # noqa: E402
+from pipeline.analise import GRAFICOS, Filtros, agregado_margem  # noqa: E402
+from pipeline.cache import CacheLRU  # noqa: E402
+from pipeline.cubo import construir_cubo, totais_cubo  # noqa: E402
+from pipeline.filtros import COLUNAS_FILTRO, IndiceFiltros  # noqa: E402
+from pipeline.formatacao import formatar_colunas, formatar_moeda_br  # noqa: E402
+from pipeline.graficos import FIGURAS, figura_em_cache  # noqa: E402
+from pipeline.margem import margem_media  # noqa: E402
+from pipeline.paginacao import fatiar_pagina, posicoes_tabela  # noqa: E402
+
+# 10_000_000 é opt-in via --linhas (ver docstring)
+TAMANHOS = [10_000, 100_000, 1_000_000]
+TAMANHO_PAGINA = 100
+
+
+def versao_codigo():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def etapa_filtro(df, indice):
+    """
+    Mesma cascata da sidebar: metade do período e metade dos representantes (os outros
+    filtros ficam com tudo marcado, que não restringe e não entra nas seleções).
+    """
+    inicio = pd.Timestamp(indice.datas_ordenadas[0])
+    fim = pd.Timestamp(indice.datas_ordenadas[-1])
+    periodo = (inicio + (fim - inicio) / 4, fim - (fim - inicio) / 4)
+    mascara = indice.mascara_periodo(*periodo)
+    selecoes = {}
+    for col in COLUNAS_FILTRO:
+        if col in indice.codigos and mascara.any():
+            opcoes = indice.opcoes(col, mascara)
+            if col == 'representante' and len(opcoes) > 1:
+                selecoes[col] = opcoes[: len(opcoes) // 2]
+                mascara &= indice.mascara_valores(col, selecoes[col])
+    return df[mascara], periodo, selecoes
+
+
+def etapa_agregacao(cubo, df, indice, periodo, selecoes):
+    cubo_filtrado = Filtros(periodo, selecoes).aplicar_cubo(cubo, df, indice)
+    totais = totais_cubo(cubo_filtrado)
+    # Mesmos agregados dos gráficos do app: rollup do cubo e seleção por argpartition
+    return totais, {dimensao: agregado_margem(cubo_filtrado, dimensao, top) for dimensao, top in GRAFICOS.items()}
+
+
+def etapa_tabela(filtrado):
+    posicoes = posicoes_tabela(filtrado, "", 'valor_net', crescente=False)
+    pagina = fatiar_pagina(filtrado, posicoes, 1, TAMANHO_PAGINA)
+    return formatar_colunas(
+        pagina,
+        moeda=['valor_bruto', 'valor_net', 'custo_total', 'custo_unitario', 'margem_em_valor'],
+        porcentagem=['margem_em_porcentagem']
+    )
+
+
+def etapa_formatacao(totais):
+    # Os tooltips dos agregados já saem de agregado_margem; aqui só os KPIs
+    kpis = formatar_moeda_br([totais.get(col, 0) for col in ('valor_bruto', 'custo_total', 'valor_net', 'margem_em_valor')])
+    return kpis, margem_media(totais.get('valor_net', 0), totais.get('custo_total', 0))
+
+
+def etapa_graficos(agregados, cache):
+    """
+    Figuras dos agregados como o app as pede (figura_em_cache sobre FIGURAS), serializadas
+    como o st.plotly_chart faz. Retorna o tamanho total do JSON.
+    """
+    tamanho = 0
+    for dimensao, agregado in agregados.items():
+        tamanho += len(figura_em_cache(cache, FIGURAS[dimensao], agregado).to_json())
+    return tamanho
+
+
+def medir(tempos, etapa, func, *args):
+    inicio = time.perf_counter()
+    resultado = func(*args)
+    decorrido = time.perf_counter() - inicio
+    tempos[etapa] = min(tempos.get(etapa, decorrido), decorrido)
+    return resultado
+
+
+def executar(caminho, repeticoes):
+    with open(caminho, 'rb') as arquivo:
+        conteudo = arquivo.read()
+    nome = os.path.basename(caminho)
+    tempos = {}
+    for _ in range(repeticoes):
+        bruto = medir(tempos, 'leitura', ler_arquivo, conteudo, nome)
+        df, problemas, _avisos, descartadas = medir(tempos, 'limpeza', limpar_dataframe, bruto)
+        del bruto
+        medir(tempos, 'leitura_em_blocos', ler_csv_em_blocos, conteudo)
+        indice = medir(tempos, 'indice_filtros', IndiceFiltros, df)
+        filtrado, periodo, selecoes = medir(tempos, 'filtro', etapa_filtro, df, indice)
+        cubo = medir(tempos, 'cubo', construir_cubo, df)
+        totais, agregados = medir(tempos, 'agregacao', etapa_agregacao, cubo, df, indice, periodo, selecoes)
+        # Estado inicial da sidebar: só o período filtra e as marginais respondem
+        medir(tempos, 'agregacao_periodo', etapa_agregacao, cubo, df, indice, periodo, {})
+        medir(tempos, 'tabela', etapa_tabela, filtrado)
+        medir(tempos, 'formatacao', etapa_formatacao, totais)
+        cache = CacheLRU()
+        bytes_figuras = medir(tempos, 'graficos', etapa_graficos, agregados, cache)
+        medir(tempos, 'graficos_cache', etapa_graficos, agregados, cache)
+    return {
+        'arquivo': nome,
+        'bytes_arquivo': len(conteudo),
+        'linhas_limpas': len(df),
+        'linhas_filtradas': len(filtrado),
+        'celulas_cubo': len(cubo.celulas),
+        'celulas_marginais': {dimensao: len(tabela) for dimensao, tabela in cubo.marginais.items()},
+        'reducao_cubo': round(len(df) / max(len(cubo.celulas), 1), 2),
+        'reducao_marginais': round(len(df) / max(sum(len(t) for t in cubo.marginais.values()), 1), 2),
+        'memoria_df_bytes': int(df.memory_usage(deep=True).sum()),
+        'bytes_figuras': bytes_figuras,
+        'celulas_nao_convertidas': int(sum(problemas.values())),
+        'linhas_descartadas': descartadas,
+        'etapas_s': {etapa: round(segundos, 6) for etapa, segundos in tempos.items()},
+        'total_s': round(sum(tempos.values()), 6),
+    }
+
+
+def comparar(atual, base):
+    """
+    Razão atual/base por etapa para os tamanhos presentes nos dois resultados.
+    """
+    anteriores = {r['linhas']: r for r in base['resultados']}
+    for resultado in atual['resultados']:
+        anterior = anteriores.get(resultado['linhas'])
+        if anterior is None:
+            continue
+        print(f"\n{resultado['linhas']:,} linhas: {base.get('commit')} -> {atual.get('commit')}", file=sys.stderr)
+        for etapa, segundos in resultado['etapas_s'].items():
+            antes = anterior['etapas_s'].get(etapa)
+            if antes:
+                print(f"  {etapa:<18} {antes:9.4f}s -> {segundos:9.4f}s  ({segundos / antes:5.2f}x)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--linhas', type=int, nargs='+', default=TAMANHOS, help="tamanhos (ex.: 10000 100000 1000000 10000000)")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--dados', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saida'))
+    parser.add_argument('--saida', help="grava o JSON neste arquivo (padrão: stdout)")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    os.makedirs(args.dados, exist_ok=True)
+    resultados = []
+    for linhas in args.linhas:
+        caminho = caminho_padrao(args.dados, linhas)
+        if not os.path.exists(caminho):
+            print(f"gerando {caminho}...", file=sys.stderr)
+            gerar_relatorio(caminho, linhas)
+        resultado = {'linhas': linhas, **executar(caminho, args.repeticoes)}
+        resultados.append(resultado)
+        etapas = "  ".join(f"{etapa}={segundos:.3f}" for etapa, segundos in resultado['etapas_s'].items())
+        print(f"{linhas:>10,} linhas  total={resultado['total_s']:.3f}s  {etapas}", file=sys.stderr)
+        print(f"{'':>10}  cubo: {resultado['celulas_cubo']:,} células ({resultado['reducao_cubo']}x menor), "
+              f"marginais: {resultado['celulas_marginais']} ({resultado['reducao_marginais']}x)", file=sys.stderr)
+
+    saida = {
+        'commit': versao_codigo(),
+        'executado_em': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'plotly': plotly.__version__,
+        'cpus': os.cpu_count(),
+        'repeticoes': args.repeticoes,
+        'resultados': resultados,
+    }
+    texto = json.dumps(saida, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto + '\n')
+    else:
+        print(texto)
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            comparar(saida, json.load(arquivo))
+
+
+if __name__ == '__main__':
+    main()
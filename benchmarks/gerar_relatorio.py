@@ -0,0 +1,165 @@
+"""
+Gerador de relatórios de margem sintéticos (mesmo formato do Relatorio_de_margem_*.csv).
+
+Escreve as colunas reais do ERP (NF, DATA, CLIENTE, REPRESENTANTE, COD PRODUTO,
+DESCRICAO, QTD, VALOR BRUTO, VALOR NET, CUSTO UNITARIO, CUSTO TOTAL, MARGEM EM VALOR,
+MARGEM EM PORCENTAGEM) em latin1, separadas por ';', com números no formato BR
+("6.273,60", "-5.920,70", "82%"), a linha "PDF:" logo abaixo do cabeçalho, subtotais
+"TOTAL REPRESENTANTE" espalhados e o "TOTAL GERAL" no fim. Opcionalmente, uma fração de
+células inválidas ("#N/D") nas colunas de valor.
+
+O arquivo é escrito em blocos, então 10M de linhas não precisam caber em memória.
+
+Uso: python benchmarks/gerar_relatorio.py linhas [linhas ...] [--destino DIR] [--invalidas FRACAO]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.formatacao import formatar_br  # noqa: E402
+
+COLUNAS = [
+    'NF', 'DATA', 'CLIENTE', 'REPRESENTANTE', 'COD PRODUTO', 'DESCRICAO', 'QTD', 'VALOR BRUTO',
+    'VALOR NET', 'CUSTO UNITARIO', 'CUSTO TOTAL', 'MARGEM EM VALOR', 'MARGEM EM PORCENTAGEM'
+]
+COLUNAS_VALOR = ['VALOR BRUTO', 'VALOR NET', 'CUSTO TOTAL', 'MARGEM EM VALOR']
+BLOCO = 500_000
+# Uma linha "TOTAL REPRESENTANTE" a cada N linhas de NF
+INTERVALO_SUBTOTAL = 5_000
+
+SABORES = [
+    'MARACUJA', 'MORANGO', 'UVA', 'BANANA', 'MUSSARELA', 'MAIONESE', 'ACAI', 'GUARANA', 'BAUNILHA',
+    'CHOCOLATE', 'COCO', 'LIMAO', 'LARANJA', 'ABACAXI', 'MENTA', 'CANELA', 'CAFE', 'MANGA',
+]
+TIPOS_PRODUTO = ['AROMA IDENTICO AO NATURAL DE', 'AROMA NATURAL DE', 'MISTURA SABOR', 'EXTRATO DE']
+SUFIXOS_CLIENTE = ['LTDA', 'LTDA EPP', 'EIRELI', 'S.A.', 'INDUSTRIA E COMERCIO LTDA', 'ALIMENTOS LTDA']
+
+
+def cadastros(linhas, rng):
+    """
+    Clientes, representantes e produtos sintéticos (quantidades crescem com o arquivo).
+    """
+    n_clientes = int(np.clip(linhas // 25, 50, 50_000))
+    n_produtos = int(np.clip(linhas // 150, 30, 8_000))
+    n_representantes = int(np.clip(linhas // 5_000, 8, 60))
+    clientes = np.array([
+        f"CLIENTE {i:05d} {SUFIXOS_CLIENTE[i % len(SUFIXOS_CLIENTE)]}" for i in range(n_clientes)
+    ], dtype=object)
+    representantes = np.array([f"REPRESENTANTE {i:02d}" for i in range(n_representantes)], dtype=object)
+    codigos = np.array([
+        f"{c:06d}SD" if c % 17 == 0 else f"{c:06d}"
+        for c in rng.choice(1_000_000, n_produtos, replace=False)
+    ], dtype=object)
+    descricoes = np.array([
+        f"{TIPOS_PRODUTO[i % len(TIPOS_PRODUTO)]} {SABORES[i % len(SABORES)]} {i:04d}" for i in range(n_produtos)
+    ], dtype=object)
+    return clientes, representantes, codigos, descricoes
+
+
+def bloco_sintetico(inicio, linhas, cad, rng, invalidas=0.0, inicio_periodo='2025-01-01', dias=365):
+    """
+    `linhas` linhas de NF já como texto, a partir da linha `inicio` do arquivo.
+    Retorna também os valores numéricos (bruto, net, custo, margem) para os totais.
+    """
+    clientes, representantes, codigos, descricoes = cad
+    # ~2,5 produtos por NF: a NF avança em média a cada 2,5 linhas
+    nf = 10_000 + (np.arange(inicio, inicio + linhas) * 2) // 5
+    dia = (nf * 7919) % dias
+    datas = (pd.Timestamp(inicio_periodo) + pd.to_timedelta(np.arange(dias), unit='D')).strftime('%d/%m/%Y')
+    cliente = clientes[(nf * 104729) % len(clientes)]
+    representante = representantes[(nf * 31) % len(representantes)]
+    produto = rng.integers(0, len(codigos), linhas)
+
+    qtd = rng.choice([1, 2, 4, 5, 8, 10, 20, 25, 60, 80, 100, 1005], linhas).astype('float64')
+    custo_unitario = rng.lognormal(2.8, 0.7, linhas).round(2)
+    custo_total = (qtd * custo_unitario).round(2)
+    margem_alvo = rng.normal(0.72, 0.25, linhas)
+    valor_net = (custo_total / np.clip(1 - margem_alvo, 0.05, 3)).round(2)
+    valor_bruto = (valor_net / 0.744).round(2)
+    margem_valor = (valor_net - custo_total).round(2)
+    margem_perc = np.round(margem_valor / valor_net * 100).astype(np.int64)
+
+    bloco = pd.DataFrame({
+        'NF': np.char.zfill(nf.astype(str), 7),
+        'DATA': np.asarray(datas, dtype=object)[dia],
+        'CLIENTE': cliente,
+        'REPRESENTANTE': representante,
+        'COD PRODUTO': codigos[produto],
+        'DESCRICAO': descricoes[produto],
+        'QTD': formatar_br(qtd),
+        'VALOR BRUTO': formatar_br(valor_bruto),
+        'VALOR NET': formatar_br(valor_net),
+        'CUSTO UNITARIO': formatar_br(custo_unitario),
+        'CUSTO TOTAL': formatar_br(custo_total),
+        'MARGEM EM VALOR': formatar_br(margem_valor),
+        'MARGEM EM PORCENTAGEM': margem_perc.astype(str).astype(object) + '%',
+    })
+    if invalidas:
+        for col in COLUNAS_VALOR:
+            sorteio = rng.random(linhas) < invalidas
+            bloco.loc[sorteio, col] = '#N/D'
+    return bloco, np.column_stack([valor_bruto, valor_net, custo_total, margem_valor])
+
+
+def linha_total(rotulo, totais):
+    valor_bruto, valor_net, custo_total, margem_valor = totais
+    valores = formatar_br([valor_bruto, valor_net, custo_total, margem_valor])
+    perc = f"{round(margem_valor / valor_net * 100) if valor_net else 0}%"
+    return pd.DataFrame([[
+        '', '', '', rotulo, '', '', '', valores[0], valores[1], '', valores[2], valores[3], perc
+    ]], columns=COLUNAS)
+
+
+def gerar_relatorio(caminho, linhas, semente=0, invalidas=0.0, bloco=BLOCO):
+    """
+    Escreve um relatório sintético de `linhas` linhas de NF em `caminho`.
+    Retorna o tamanho do arquivo em bytes.
+    """
+    rng = np.random.default_rng(semente)
+    cad = cadastros(linhas, rng)
+    geral = np.zeros(4)
+    with open(caminho, 'w', encoding='latin1', newline='') as arquivo:
+        arquivo.write(';'.join(COLUNAS) + '\r\n')
+        arquivo.write('PDF:' + ';' * (len(COLUNAS) - 1) + '\r\n')
+        for inicio in range(0, linhas, bloco):
+            n = min(bloco, linhas - inicio)
+            df, valores = bloco_sintetico(inicio, n, cad, rng, invalidas=invalidas)
+            geral += valores.sum(axis=0)
+            # Subtotais intercalados, como no relatório exportado por representante
+            partes = []
+            for pos in range(0, n, INTERVALO_SUBTOTAL):
+                partes.append(df.iloc[pos:pos + INTERVALO_SUBTOTAL])
+                if pos + INTERVALO_SUBTOTAL < n:
+                    partes.append(linha_total('TOTAL REPRESENTANTE', valores[pos:pos + INTERVALO_SUBTOTAL].sum(axis=0)))
+            pd.concat(partes).to_csv(arquivo, sep=';', header=False, index=False, lineterminator='\r\n')
+        linha_total('TOTAL GERAL', geral).to_csv(arquivo, sep=';', header=False, index=False, lineterminator='\r\n')
+    return os.path.getsize(caminho)
+
+
+def caminho_padrao(destino, linhas, invalidas=0.0):
+    sufixo = f"_inv{invalidas:g}" if invalidas else ""
+    return os.path.join(destino, f"Relatorio_de_margem_sintetico_{linhas}{sufixo}.csv")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('linhas', type=int, nargs='+')
+    parser.add_argument('--destino', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saida'))
+    parser.add_argument('--invalidas', type=float, default=0.0, help="fração de células '#N/D' nas colunas de valor")
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.destino, exist_ok=True)
+    for linhas in args.linhas:
+        caminho = caminho_padrao(args.destino, linhas, args.invalidas)
+        tamanho = gerar_relatorio(caminho, linhas, semente=args.semente, invalidas=args.invalidas)
+        print(f"{caminho}: {linhas:,} linhas, {tamanho / 1024 ** 2:,.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
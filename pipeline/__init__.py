@@ -0,0 +1,42 @@
+"""
+Processamento dos relatórios de margem, independente do Streamlit.
+"""
+from .analise import Analise, Filtros, Kpis, analisar, analisar_arquivo, analisar_em_lote
+from .armazenamento import ArmazemDatasets
+from .cache import CacheLRU
+from .consolidacao import consolidar_datasets
+from .incremental import Anexacao, anexar_extrato
+from .ingestao import (
+    Dataset, RegraDescarte, carregar_dataset, hash_conteudo, ler_arquivo, ler_csv_em_blocos, ler_xlsx, limpar_dataframe
+)
+from .qualidade import Qualidade
+from .registro import RegistroDatasets
+from .segundo_plano import Progresso, TarefasIngestao
+from .xlsx import listar_abas
+
+__all__ = [
+    'Analise',
+    'Anexacao',
+    'ArmazemDatasets',
+    'CacheLRU',
+    'Dataset',
+    'Filtros',
+    'Kpis',
+    'Progresso',
+    'Qualidade',
+    'RegraDescarte',
+    'RegistroDatasets',
+    'TarefasIngestao',
+    'analisar',
+    'analisar_arquivo',
+    'analisar_em_lote',
+    'anexar_extrato',
+    'carregar_dataset',
+    'consolidar_datasets',
+    'hash_conteudo',
+    'ler_arquivo',
+    'ler_csv_em_blocos',
+    'ler_xlsx',
+    'limpar_dataframe',
+    'listar_abas',
+]
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from .cubo import (
+    Cubo, agregar_cubo, construir_cubo, cubo_linhas, dividir_periodo, filtrar_cubo, juntar_cubos, totais_cubo
+)
+from .filtros import COLUNAS_FILTRO, IndiceFiltros
+from .formatacao import adicionar_tooltips, formatar_tooltip_br
+from .ingestao import Dataset, carregar_dataset
+from .margem import adicionar_margem_percentual, margem_media
+from .temporal import (
+    COMPARACOES, MEDIDAS_SERIE, SerieDiaria, defasar, fatiar_serie, reamostrar, serie_diaria, tabela_periodos
+)
+
+# Gráficos do dashboard: dimensão -> quantos itens mostrar (None = todos)
+GRAFICOS = {'representante': None, 'cliente': 10, 'mes_ano': None, 'descricao': 10}
+
+
+@dataclass
+class Filtros:
+    """
+    Estado dos filtros da sidebar: período (inclusivo) e valores aceitos por coluna.
+    Coluna ausente em `selecoes` (ou lista vazia) não filtra.
+    """
+    periodo: tuple[date, date] | None = None
+    selecoes: dict[str, list] = field(default_factory=dict)
+
+    def mascara(self, indice: IndiceFiltros) -> np.ndarray:
+        """
+        Máscara booleana das linhas do dataset que passam nos filtros.
+        """
+        mascara = indice.tudo() if self.periodo is None else indice.mascara_periodo(*self.periodo)
+        for col in COLUNAS_FILTRO:
+            if self.selecoes.get(col) and col in indice.codigos:
+                mascara &= indice.mascara_valores(col, self.selecoes[col])
+        return mascara
+
+    def aplicar_cubo(self, cubo: Cubo, df: pd.DataFrame, indice: IndiceFiltros) -> Cubo:
+        """
+        Cubo sob os filtros: os meses inteiros do período saem do cubo; num mês que o período
+        corta, somam-se as linhas dos dias dentro dele ou, se forem menos, o mês inteiro sai
+        do cubo e descontam-se as linhas dos dias fora (achadas pelo índice, sem varrer o dataset).
+        """
+        if self.periodo is None or indice.ordem_datas is None or not indice.linhas:
+            return filtrar_cubo(cubo, None, self.selecoes)
+        (primeiro, ultimo), bordas = dividir_periodo(
+            self.periodo, indice.datas_ordenadas[0], indice.datas_ordenadas[-1]
+        )
+        dia = pd.Timedelta(days=1)
+        somar, descontar = [], []
+        for inicio, fim in bordas:
+            mes = inicio.replace(day=1)
+            dentro = self._selecionar(indice, indice.posicoes_periodo(inicio, fim))
+            fora = self._selecionar(indice, np.concatenate([
+                indice.posicoes_periodo(mes, inicio - dia),
+                indice.posicoes_periodo(fim + dia, mes + pd.offsets.MonthEnd(0)),
+            ]))
+            if len(fora) < len(dentro):
+                descontar.append(fora)
+                primeiro, ultimo = min(primeiro, mes), max(ultimo, mes)
+            else:
+                somar.append(dentro)
+        partes = [filtrar_cubo(cubo, (primeiro, ultimo), self.selecoes)]
+        for posicoes, sinal in ((somar, 1), (descontar, -1)):
+            posicoes = np.concatenate(posicoes) if posicoes else []
+            if len(posicoes):
+                partes.append(cubo_linhas(df, np.sort(posicoes), sinal))
+        return partes[0] if len(partes) == 1 else juntar_cubos(partes)
+
+    def aplicar_serie(self, serie: SerieDiaria | None, df: pd.DataFrame, linhas: np.ndarray) -> SerieDiaria | None:
+        """
+        Série diária sob os filtros. Só com período (o estado inicial da sidebar), é uma fatia
+        da `serie` do dataset inteiro, montada uma vez ao lado do cubo; com seleções, é somada
+        das `linhas` filtradas.
+        """
+        if not any(self.selecoes.values()):
+            return serie if self.periodo is None else fatiar_serie(serie, *self.periodo)
+        return serie_diaria(df[[col for col in ['data', *MEDIDAS_SERIE] if col in df.columns]].take(linhas))
+
+    def _selecionar(self, indice: IndiceFiltros, posicoes: np.ndarray) -> np.ndarray:
+        for col in COLUNAS_FILTRO:
+            if self.selecoes.get(col) and col in indice.codigos:
+                posicoes = posicoes[indice.mascara_valores(col, self.selecoes[col], posicoes)]
+        return posicoes
+
+    def chave(self) -> str:
+        """
+        Resumo curto do estado dos filtros, para chavear caches de resultados.
+        A ordem dos valores selecionados não muda a chave.
+        """
+        partes = [repr(self.periodo)]
+        for col in sorted(self.selecoes):
+            if self.selecoes[col]:
+                partes.append(f"{col}={sorted(map(str, self.selecoes[col]))!r}")
+        return hashlib.blake2b("\x1f".join(partes).encode(), digest_size=16).hexdigest()
+
+
+@dataclass
+class Kpis:
+    """
+    Métricas Chave do dashboard.
+    """
+    valor_bruto: float = 0.0
+    custo_total: float = 0.0
+    valor_net: float = 0.0
+    margem_em_valor: float = 0.0
+    margem_media: float = 0.0
+
+
+@dataclass
+class Analise:
+    """
+    Resultado de uma análise: KPIs e agregados prontos para os gráficos.
+    """
+    nome: str
+    filtros: Filtros
+    linhas: int
+    kpis: Kpis
+    agregados: dict[str, pd.DataFrame]
+
+
+def calcular_kpis(cubo_filtrado: Cubo) -> Kpis:
+    """
+    KPIs como rollup do cubo filtrado (independe do número de linhas de NF).
+    """
+    totais = totais_cubo(cubo_filtrado)
+    kpis = Kpis(**{campo: totais.get(campo, 0.0) for campo in ('valor_bruto', 'custo_total', 'valor_net', 'margem_em_valor')})
+    kpis.margem_media = margem_media(kpis.valor_net, kpis.custo_total)
+    return kpis
+
+
+def posicoes_extremos(valores: np.ndarray, n: int, menores: bool = False) -> np.ndarray:
+    """
+    Posições dos `n` maiores (ou menores) valores, já ordenadas, sem ordenar o array todo:
+    argpartition separa os `n` em O(len) e só eles são ordenados. Empates ficam na ordem
+    original; NaN fica por último.
+    """
+    chaves = np.asarray(valores, dtype='float64')
+    chaves = np.where(np.isnan(chaves), np.inf, chaves if menores else -chaves)
+    n = max(min(n, len(chaves)), 0)
+    if n < len(chaves):
+        candidatas = np.argpartition(chaves, n - 1)[:n] if n else np.empty(0, dtype=np.intp)
+    else:
+        candidatas = np.arange(len(chaves))
+    return candidatas[np.lexsort((candidatas, chaves[candidatas]))]
+
+
+def selecionar_agregado(rollup: pd.DataFrame, dimensao: str, top: int | None = None,
+                        menores: bool = False, outros: bool = False) -> pd.DataFrame:
+    """
+    Gráfico de margem a partir do rollup (agregar_cubo) da dimensão: ordenação (por mês em
+    'mes_ano', senão pela margem em valor, decrescente ou crescente com `menores`), corte dos
+    `top` e, com `outros`, uma última linha somando o restante. Margem % e tooltips só são
+    calculados para as linhas que vão ao gráfico.
+    """
+    if dimensao == 'mes_ano':
+        posicoes = np.argsort(rollup['mes_ano'].to_numpy(dtype=object), kind='stable')[:top]
+    else:
+        posicoes = posicoes_extremos(
+            rollup['margem_em_valor'].to_numpy(), len(rollup) if top is None else top, menores
+        )
+    agregado = rollup.take(posicoes).reset_index(drop=True)
+    restantes = len(rollup) - len(posicoes)
+    if outros and restantes > 0:
+        fora = np.ones(len(rollup), dtype=bool)
+        fora[posicoes] = False
+        rotulo = f"Outros ({restantes:,})".replace(",", ".")
+        agregado = pd.DataFrame({
+            col: np.append(agregado[col].to_numpy(dtype=object), rotulo) if col == dimensao
+            else np.append(agregado[col].to_numpy(), rollup[col].to_numpy()[fora].sum())
+            for col in rollup.columns
+        })
+    return adicionar_tooltips(adicionar_margem_percentual(agregado))
+
+
+def agregado_margem(cubo_filtrado: Cubo, dimensao: str, top: int | None = None,
+                    menores: bool = False, outros: bool = False) -> pd.DataFrame:
+    """
+    Agregado de um gráfico de margem: soma por `dimensao` no cubo e seleção/ordenação
+    de selecionar_agregado.
+    """
+    return selecionar_agregado(agregar_cubo(cubo_filtrado, dimensao), dimensao, top, menores, outros)
+
+
+def tendencia_margem(serie: SerieDiaria | None, frequencia: str = 'M', comparacao: str | None = None) -> pd.DataFrame:
+    """
+    Evolução da margem por dia/semana/mês/trimestre a partir da série diária (O(dias)),
+    com tooltips. Com `comparacao` ('anterior' ou 'ano_anterior', ver pipeline.temporal),
+    acrescenta a margem do período de comparação e a variação (em R$ e %).
+    """
+    if serie is None:
+        tabela = pd.DataFrame(
+            {'periodo': [], 'inicio': pd.to_datetime([]), 'valor_net': [], 'custo_total': [], 'margem_em_valor': []}
+        )
+        margens = np.empty(0)
+    else:
+        periodos = reamostrar(serie, frequencia)
+        tabela = tabela_periodos(periodos)
+        margens = periodos.medidas['margem_em_valor']
+    tabela = adicionar_tooltips(adicionar_margem_percentual(tabela))
+    if comparacao is not None:
+        anterior = defasar(margens, COMPARACOES[comparacao][frequencia])
+        atual = tabela['margem_em_valor'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentual = np.where(anterior != 0, (atual - anterior) / np.abs(anterior) * 100, np.nan)
+        tabela['margem_anterior'] = anterior
+        tabela['variacao'] = atual - anterior
+        tabela['variacao_perc'] = percentual
+        tabela['margem_anterior_fmt'] = formatar_tooltip_br(anterior)
+        tabela['variacao_fmt'] = formatar_tooltip_br(atual - anterior)
+        tabela['variacao_perc_fmt'] = formatar_tooltip_br(percentual, tipo="%")
+    return tabela
+
+
+def analisar(dataset: Dataset, filtros: Filtros | None = None, cubo: Cubo | None = None,
+             indice: IndiceFiltros | None = None, graficos: dict[str, int | None] = GRAFICOS) -> Analise:
+    """
+    Executa filtros, KPIs e agregados de um dataset. `cubo` e `indice` podem vir de um cache.
+    """
+    filtros = filtros or Filtros()
+    df = dataset.df
+    indice = indice if indice is not None else IndiceFiltros(df)
+    cubo = cubo if cubo is not None else construir_cubo(df)
+    cubo_filtrado = filtros.aplicar_cubo(cubo, df, indice)
+    agregados = {
+        dimensao: agregado_margem(cubo_filtrado, dimensao, top)
+        for dimensao, top in graficos.items()
+        if (dimensao == 'mes_ano' and 'data' in df.columns) or dimensao in cubo.marginais
+    }
+    return Analise(
+        nome=dataset.nome,
+        filtros=filtros,
+        linhas=int(filtros.mascara(indice).sum()),
+        kpis=calcular_kpis(cubo_filtrado),
+        agregados=agregados,
+    )
+
+
+def analisar_arquivo(caminho: str | os.PathLike, filtros: Filtros | None = None) -> Analise:
+    """
+    Lê, limpa e analisa um relatório do disco (função de topo: serve de tarefa de processo).
+    """
+    with open(caminho, 'rb') as arquivo:
+        conteudo = arquivo.read()
+    return analisar(carregar_dataset(conteudo, os.path.basename(caminho)), filtros)
+
+
+def analisar_em_lote(caminhos: list[str | os.PathLike], filtros: Filtros | None = None,
+                     max_workers: int | None = None) -> list[Analise]:
+    """
+    Analisa vários relatórios com os mesmos filtros num pool de processos, na ordem recebida.
+    """
+    max_workers = max_workers or min(len(caminhos), os.cpu_count() or 1) or 1
+    if max_workers == 1 or len(caminhos) < 2:
+        return [analisar_arquivo(caminho, filtros) for caminho in caminhos]
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=contexto) as executor:
+        return list(executor.map(analisar_arquivo, caminhos, [filtros] * len(caminhos)))
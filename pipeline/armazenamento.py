@@ -0,0 +1,141 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+from .ingestao import Dataset, aplicar_esquema
+from .qualidade import Qualidade, avaliar_qualidade
+
+# Diretório local dos relatórios já limpos (um .feather + um .json por hash de conteúdo)
+DIRETORIO_DADOS = os.environ.get('DASHBOARD_DADOS', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dados'))
+
+
+class ArmazemDatasets:
+    """
+    Guarda cada upload limpo em Feather (Arrow IPC sem compressão), chaveado pelo hash do conteúdo.
+    Reabrir um relatório é uma leitura mapeada em memória, sem novo parse do CSV/xlsx.
+    As linhas do relatório de qualidade vão num .qualidade.npz ao lado.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_DADOS):
+        self.diretorio = diretorio
+        self._lock = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _caminho(self, chave, extensao):
+        return os.path.join(self.diretorio, f"{chave}.{extensao}")
+
+    def existe(self, chave):
+        return os.path.exists(self._caminho(chave, 'feather')) and os.path.exists(self._caminho(chave, 'json'))
+
+    def salvar(self, dataset, base=None):
+        """
+        Persiste o dataset (escrita atômica: arquivo temporário + os.replace).
+        `base` é a chave do relatório salvo de que ele deriva (extrato anexado), ver podar.
+        """
+        if self.existe(dataset.chave):
+            return
+        metadados = {
+            'chave': dataset.chave,
+            'nome': dataset.nome,
+            'linhas': len(dataset.df),
+            'colunas': list(map(str, dataset.df.columns)),
+            'salvo_em': datetime.now().isoformat(timespec='seconds'),
+            'problemas': dataset.problemas,
+            'avisos': dataset.avisos,
+            'descartadas': dataset.descartadas,
+        }
+        if base is not None:
+            metadados['base'] = base
+        qualidade = dataset.qualidade
+        if qualidade is not None:
+            metadados['exemplos_qualidade'] = qualidade.exemplos
+        with self._lock:
+            destino = self._caminho(dataset.chave, 'feather')
+            feather.write_feather(dataset.df.reset_index(drop=True), destino + '.tmp', compression='uncompressed')
+            os.replace(destino + '.tmp', destino)
+            if qualidade is not None:
+                destino = self._caminho(dataset.chave, 'qualidade.npz')
+                with open(destino + '.tmp', 'wb') as f:
+                    np.savez(f, **{f"i:{nome}": p for nome, p in qualidade.inconsistencias.items()},
+                             **{f"f:{coluna}": p for coluna, p in qualidade.falhas.items()})
+                os.replace(destino + '.tmp', destino)
+            destino = self._caminho(dataset.chave, 'json')
+            with open(destino + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(metadados, f, ensure_ascii=False)
+            os.replace(destino + '.tmp', destino)
+
+    def metadados(self, chave):
+        with open(self._caminho(chave, 'json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    def carregar(self, chave):
+        meta = self.metadados(chave)
+        tabela = feather.read_table(self._caminho(chave, 'feather'), memory_map=True)
+        # split_blocks evita consolidar as colunas (menos cópias sobre o mmap)
+        df = tabela.to_pandas(split_blocks=True)
+        # Relatórios salvos antes do esquema compacto ganham categorias/NF inteira ao reabrir
+        df = aplicar_esquema(df)
+        return Dataset(
+            chave=chave, nome=meta['nome'], df=df, problemas=meta['problemas'], avisos=meta['avisos'],
+            descartadas=meta.get('descartadas', {}), qualidade=self._carregar_qualidade(chave, df, meta)
+        )
+
+    def _carregar_qualidade(self, chave, df, meta):
+        # Relatórios salvos antes do relatório de qualidade: as verificações são refeitas
+        # sobre o df (as linhas das células não convertidas não existem mais)
+        try:
+            with np.load(self._caminho(chave, 'qualidade.npz')) as arrays:
+                partes = {nome: arrays[nome] for nome in arrays.files}
+        except FileNotFoundError:
+            return avaliar_qualidade(df)
+        return Qualidade(
+            linhas=len(df),
+            inconsistencias={nome[2:]: p for nome, p in partes.items() if nome.startswith('i:')},
+            falhas={nome[2:]: p for nome, p in partes.items() if nome.startswith('f:')},
+            exemplos={coluna: [tuple(e) for e in exemplos] for coluna, exemplos in meta.get('exemplos_qualidade', {}).items()},
+        )
+
+    def listar(self):
+        """
+        Metadados de todos os relatórios salvos, do mais recente para o mais antigo.
+        """
+        relatorios = []
+        for arquivo in os.listdir(self.diretorio):
+            chave, extensao = os.path.splitext(arquivo)
+            if extensao == '.json' and self.existe(chave):
+                try:
+                    relatorios.append(self.metadados(chave))
+                except (OSError, ValueError):
+                    continue
+        return sorted(relatorios, key=lambda r: r['salvo_em'], reverse=True)
+
+    def podar(self):
+        """
+        Remove os relatórios incrementais superados: anexar um extrato a um relatório
+        incremental gera outro com tudo o que ele tinha. A base do mais novo fica (pode ser
+        a escolhida na sessão que anexou), o nível anterior sai; relatórios originais
+        (sem `base`) nunca saem. Arquivo que não pode ser apagado agora (aberto em outro
+        processo no Windows) sai numa próxima poda. Retorna as chaves removidas.
+        """
+        bases = {meta['chave']: meta['base'] for meta in self.listar() if meta.get('base')}
+        superados = {bases[base] for base in bases.values() if base in bases} & bases.keys()
+        removidos = []
+        for chave in superados:
+            try:
+                self.remover(chave)
+            except OSError:
+                continue
+            removidos.append(chave)
+        return removidos
+
+    def remover(self, chave):
+        for extensao in ('feather', 'json', 'qualidade.npz'):
+            try:
+                os.remove(self._caminho(chave, extensao))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,151 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def estimar_bytes(valor):
+    """
+    Estima a memória ocupada por um item do cache (DataFrames medidos em profundidade).
+    """
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    medir = getattr(valor, 'memoria_bytes', None)
+    if callable(medir):
+        return int(medir())
+    return sys.getsizeof(valor)
+
+
+class _Calculo:
+    def __init__(self):
+        self.pronto = threading.Event()
+        self.thread = threading.get_ident()
+        self.concluido = False
+        self.valor = None
+
+
+class CalculosEmAndamento:
+    """
+    Um cálculo por chave de cada vez entre as threads: quem pede uma chave que outra thread
+    já está calculando espera por ela e recebe o mesmo valor, sem calcular de novo. Se o
+    cálculo falha, o erro sai só para quem calculava e os que esperavam tentam por conta própria.
+    """
+
+    def __init__(self):
+        self._andamento = {}
+        self._lock = threading.Lock()
+
+    def calcular(self, chave, calcular):
+        while True:
+            with self._lock:
+                calculo = self._andamento.get(chave)
+                if calculo is None:
+                    calculo = self._andamento[chave] = _Calculo()
+                    break
+            # A própria thread pedindo a chave de novo (cálculo aninhado) não pode esperar por si
+            if calculo.thread == threading.get_ident():
+                return calcular()
+            calculo.pronto.wait()
+            if calculo.concluido:
+                return calculo.valor
+        try:
+            calculo.valor = calcular()
+            calculo.concluido = True
+            return calculo.valor
+        finally:
+            with self._lock:
+                del self._andamento[chave]
+            calculo.pronto.set()
+
+
+class CacheLRU:
+    """
+    Cache com despejo LRU limitado por quantidade de itens e por memória total.
+    Seguro para uso entre as sessões (threads) do servidor Streamlit.
+    """
+
+    def __init__(self, max_itens=8, max_bytes=1024 ** 3, medir=estimar_bytes):
+        self.max_itens = max_itens
+        self.max_bytes = max_bytes
+        self._medir = medir
+        self._itens = OrderedDict()
+        self._tamanhos = {}
+        self._lock = threading.RLock()
+        self._calculos = CalculosEmAndamento()
+
+    def __contains__(self, chave):
+        with self._lock:
+            return chave in self._itens
+
+    def __len__(self):
+        with self._lock:
+            return len(self._itens)
+
+    @property
+    def bytes_usados(self):
+        with self._lock:
+            return sum(self._tamanhos.values())
+
+    def obter(self, chave, padrao=None):
+        with self._lock:
+            if chave not in self._itens:
+                return padrao
+            self._itens.move_to_end(chave)
+            return self._itens[chave]
+
+    def guardar(self, chave, valor):
+        tamanho = self._medir(valor)
+        with self._lock:
+            self.remover(chave)
+            # Item maior que o limite inteiro não entra (evita esvaziar o cache à toa)
+            if tamanho > self.max_bytes:
+                return valor
+            self._itens[chave] = valor
+            self._tamanhos[chave] = tamanho
+            self._despejar()
+        return valor
+
+    def obter_ou_calcular(self, chave, calcular):
+        """
+        Devolve o item em cache ou calcula, guarda e devolve. Pedidos simultâneos da mesma
+        chave (duas sessões subindo o mesmo arquivo) esperam um único cálculo.
+        """
+        with self._lock:
+            if chave in self._itens:
+                return self.obter(chave)
+
+        def _calcular():
+            # Quem esperava e chega depois do guardar de outra thread já acha o item
+            with self._lock:
+                if chave in self._itens:
+                    return self.obter(chave)
+            return self.guardar(chave, calcular())
+
+        return self._calculos.calcular(chave, _calcular)
+
+    def remover(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+            self._tamanhos.pop(chave, None)
+
+    def remover_relacionados(self, chave):
+        """
+        Remove o item `chave` e os derivados dele (chaves em tupla que contêm `chave`).
+        """
+        with self._lock:
+            for item in [c for c in self._itens if c == chave or (isinstance(c, tuple) and chave in c)]:
+                self.remover(item)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._tamanhos.clear()
+
+    def _despejar(self):
+        # Remove os itens menos usados até respeitar os dois limites
+        while self._itens and (
+            len(self._itens) > self.max_itens or sum(self._tamanhos.values()) > self.max_bytes
+        ):
+            chave, _ = self._itens.popitem(last=False)
+            self._tamanhos.pop(chave, None)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class ColunaCompartilhada:
+    """
+    Onde está uma coluna na memória compartilhada (picklable, vai para os workers).
+    Colunas de texto viajam como códigos + lista de categorias.
+    """
+    nome: str
+    bloco: str | None
+    dtype: str
+    linhas: int
+    categorias: list | None = None
+
+
+class DataFrameCompartilhado:
+    """
+    Publica as colunas de um DataFrame limpo em blocos de memória compartilhada, uma vez,
+    para que vários processos leiam o mesmo dataset sem reprocessar nem copiar via pickle.
+
+    No processo que publica:
+
+        with DataFrameCompartilhado(df) as compartilhado:
+            executor = ProcessPoolExecutor(initializer=..., initargs=(compartilhado.colunas,))
+
+    Nos workers: df, blocos = anexar(colunas) (manter `blocos` vivos enquanto usar o df).
+    """
+
+    def __init__(self, df):
+        self.colunas = []
+        self._blocos = []
+        for nome in df.columns:
+            serie = df[nome]
+            categorias = None
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                categorias = list(serie.cat.categories)
+                valores = serie.cat.codes.to_numpy(dtype=np.int32)
+            elif pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_datetime64_dtype(serie):
+                valores = serie.to_numpy()
+            else:
+                codigos, unicos = pd.factorize(serie.astype(object))
+                categorias = list(unicos)
+                valores = codigos.astype(np.int32)
+            self.colunas.append(self._publicar(nome, np.ascontiguousarray(valores), categorias))
+
+    def _publicar(self, nome, valores, categorias):
+        if valores.nbytes == 0:
+            return ColunaCompartilhada(nome, None, valores.dtype.str, len(valores), categorias)
+        bloco = shared_memory.SharedMemory(create=True, size=valores.nbytes)
+        self._blocos.append(bloco)
+        np.ndarray(valores.shape, dtype=valores.dtype, buffer=bloco.buf)[:] = valores
+        return ColunaCompartilhada(nome, bloco.name, valores.dtype.str, len(valores), categorias)
+
+    def liberar(self):
+        for bloco in self._blocos:
+            bloco.close()
+            bloco.unlink()
+        self._blocos = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.liberar()
+
+
+def anexar(colunas):
+    """
+    Remonta o DataFrame a partir das colunas publicadas, sem copiar os valores.
+    Retorna (df, blocos): os blocos precisam continuar abertos enquanto o df for usado.
+    """
+    dados = {}
+    blocos = []
+    for coluna in colunas:
+        dtype = np.dtype(coluna.dtype)
+        if coluna.bloco is None:
+            valores = np.empty(0, dtype=dtype)
+        else:
+            bloco = shared_memory.SharedMemory(name=coluna.bloco)
+            blocos.append(bloco)
+            valores = np.ndarray((coluna.linhas,), dtype=dtype, buffer=bloco.buf)
+            valores.flags.writeable = False
+        if coluna.categorias is not None:
+            dados[coluna.nome] = pd.Categorical.from_codes(valores, categories=coluna.categorias)
+        else:
+            dados[coluna.nome] = valores
+    return pd.DataFrame(dados, copy=False), blocos
@@ -0,0 +1,190 @@
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .ingestao import Dataset, carregar_dataset, chave_dataset, informar, somar_contagens
+from .qualidade import avaliar_qualidade, juntar_falhas
+
+# Chave que identifica a mesma linha de NF em exportações sobrepostas
+CHAVE_LINHA = ['nf', 'cod_produto']
+
+
+def unir_categoricas(partes):
+    """
+    Junta colunas categóricas mantendo as categorias da primeira parte na mesma posição:
+    os códigos dela são reaproveitados e só as categorias das demais partes são traduzidas
+    (acrescentar poucas linhas a uma coluna grande não recodifica a coluna inteira).
+    """
+    categorias = partes[0].cat.categories
+    codigos = [partes[0].cat.codes.to_numpy()]
+    for parte in partes[1:]:
+        posicoes = categorias.get_indexer(parte.cat.categories)
+        novas = posicoes == -1
+        if novas.any():
+            posicoes[novas] = np.arange(len(categorias), len(categorias) + novas.sum())
+            categorias = categorias.append(parte.cat.categories[novas])
+        traducao = np.append(posicoes, -1)  # código -1 (ausente) continua ausente
+        codigos.append(traducao[parte.cat.codes.to_numpy()])
+    codigos = np.concatenate(codigos)
+    # Sem categorias novas o dtype da primeira parte serve (evita revalidar as categorias)
+    tipo = partes[0].dtype if categorias is partes[0].cat.categories else pd.CategoricalDtype(categorias)
+    return pd.Series(pd.Categorical.from_codes(codigos, dtype=tipo))
+
+
+def concatenar(frames):
+    """
+    Concatena DataFrames limpos mantendo as colunas de texto categóricas (união das categorias).
+    """
+    frames = [f.reset_index(drop=True) for f in frames]
+    colunas = list(dict.fromkeys(col for f in frames for col in f.columns))
+    resultado = {}
+    for col in colunas:
+        partes = [f[col] if col in f.columns else pd.Series(np.nan, index=f.index) for f in frames]
+        if any(isinstance(p.dtype, pd.CategoricalDtype) for p in partes):
+            partes = [p if isinstance(p.dtype, pd.CategoricalDtype) else p.astype(str).astype('category') for p in partes]
+            resultado[col] = unir_categoricas(partes)
+        else:
+            resultado[col] = pd.concat(partes, ignore_index=True)
+    return pd.DataFrame(resultado, copy=False)
+
+
+def texto_chave(serie):
+    """
+    Chave como texto canônico: sem ".0" e sem zeros à esquerda, para que a NF "0011466"
+    case com 11466.0 (arquivo em que a coluna veio numérica, ou texto "11466.0" quando o
+    read_csv tipou pedaços da coluna de formas diferentes).
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        try:
+            serie = serie.astype('Int64')
+        except (TypeError, ValueError):
+            pass
+    texto = serie.astype(str).str.strip().str.removesuffix('.0')
+    sem_zeros = texto.str.lstrip('0')
+    # Só zeros ("0000000") é a NF 0, como a coluna numérica daria
+    return sem_zeros.mask((sem_zeros == '') & (texto != ''), '0')
+
+
+def _codigos_chave(serie):
+    # Inteiros que identificam a chave canônica: das categóricas, só as categorias viram
+    # texto; colunas numéricas já são canônicas (11466 == 11466.0)
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        canonicas, _ = pd.factorize(texto_chave(pd.Series(serie.cat.categories)))
+        return np.append(canonicas, -1)[serie.cat.codes.to_numpy()]
+    if pd.api.types.is_numeric_dtype(serie):
+        return pd.factorize(serie)[0]
+    return pd.factorize(texto_chave(serie))[0]
+
+
+def remover_sobrepostas(df, origem):
+    """
+    Linhas (NF, COD PRODUTO) presentes em mais de um arquivo ficam só no primeiro que as trouxe.
+    As chaves são comparadas na forma canônica (NF 11466, "11466.0" e "0011466" são a mesma).
+    Repetições dentro de um mesmo arquivo são lançamentos legítimos e são mantidas.
+    """
+    chave = [col for col in CHAVE_LINHA if col in df.columns]
+    if not chave or df.empty:
+        return df, 0
+    primeira_origem = pd.Series(origem, index=df.index).groupby(
+        [_codigos_chave(df[col]) for col in chave], sort=False
+    ).transform('min')
+    manter = origem == primeira_origem.to_numpy()
+    return df[manter].reset_index(drop=True), int((~manter).sum())
+
+
+def _ingerir(arquivo):
+    # Executado no processo filho: sem cache/armazém, só lê e limpa
+    conteudo, nome_arquivo = arquivo
+    return carregar_dataset(conteudo, nome_arquivo)
+
+
+def ingerir_em_paralelo(arquivos, cache=None, armazem=None, max_workers=None, progresso=None):
+    """
+    Ingere vários arquivos em paralelo. Os que já estão no cache/armazém são reaproveitados;
+    os demais vão para um pool de processos (parse e limpeza sem disputar o GIL).
+    Com uma só CPU, ou um só arquivo novo, usa threads no próprio processo.
+    O `progresso` avança arquivo a arquivo (bytes e linhas dos arquivos já prontos).
+    """
+    chaves = [chave_dataset(conteudo, nome) for conteudo, nome in arquivos]
+    prontos = {}
+    for i, chave in enumerate(chaves):
+        if cache is not None and chave in cache:
+            prontos[i] = cache.obter(chave)
+        elif armazem is not None and armazem.existe(chave):
+            prontos[i] = armazem.carregar(chave)
+    pendentes = [i for i in range(len(arquivos)) if i not in prontos]
+    informar(progresso, etapa='leitura', bytes_total=sum(len(conteudo) for conteudo, _ in arquivos))
+
+    def avancar():
+        informar(
+            progresso,
+            bytes_lidos=sum(len(arquivos[i][0]) for i in prontos),
+            linhas_limpas=sum(len(dataset.df) for dataset in prontos.values()),
+        )
+
+    avancar()
+
+    max_workers = max_workers or min(len(pendentes), os.cpu_count() or 1) or 1
+    if max_workers > 1 and len(pendentes) > 1:
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=contexto) as executor:
+            for i, novo in zip(pendentes, executor.map(_ingerir, [arquivos[i] for i in pendentes])):
+                prontos[i] = novo
+                avancar()
+    else:
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            for i, novo in zip(pendentes, executor.map(_ingerir, [arquivos[i] for i in pendentes])):
+                prontos[i] = novo
+                avancar()
+
+    datasets = [prontos[i] for i in range(len(arquivos))]
+    if pendentes and armazem is not None:
+        informar(progresso, etapa='armazem')
+    for i in pendentes:
+        if cache is not None:
+            cache.guardar(datasets[i].chave, datasets[i])
+        if armazem is not None:
+            armazem.salvar(datasets[i])
+    return datasets
+
+
+def chave_consolidado(chaves):
+    """
+    Chave do Dataset consolidado a partir das chaves dos arquivos (na ordem de prioridade).
+    """
+    h = hashlib.blake2b(digest_size=20)
+    for chave in chaves:
+        h.update(chave.encode())
+    return 'consolidado-' + h.hexdigest()
+
+
+def consolidar_datasets(arquivos, cache=None, armazem=None, max_workers=None, progresso=None):
+    """
+    Ingere vários arquivos em paralelo e junta tudo em um único Dataset tipado.
+    `arquivos` é uma lista de (conteudo, nome_arquivo) na ordem de prioridade.
+    """
+    datasets = ingerir_em_paralelo(arquivos, cache=cache, armazem=armazem, max_workers=max_workers, progresso=progresso)
+    chave = chave_consolidado([dataset.chave for dataset in datasets])
+
+    def _consolidar():
+        informar(progresso, etapa='consolidacao')
+        df = concatenar([d.df for d in datasets])
+        origem = np.repeat(np.arange(len(datasets)), [len(d.df) for d in datasets])
+        df, removidas = remover_sobrepostas(df, origem)
+        avisos = [f"{d.nome}: {aviso}" for d in datasets for aviso in d.avisos]
+        if removidas:
+            avisos.append(f"{removidas} linhas repetidas entre arquivos (mesma NF e produto) foram ignoradas.")
+        return Dataset(
+            chave=chave, nome=f"{len(datasets)} arquivos consolidados", df=df,
+            problemas=somar_contagens(d.problemas for d in datasets), avisos=avisos,
+            descartadas=somar_contagens(d.descartadas for d in datasets),
+            qualidade=avaliar_qualidade(df, *juntar_falhas(datasets)),
+        )
+
+    if cache is None:
+        return _consolidar()
+    return cache.obter_ou_calcular(chave, _consolidar)
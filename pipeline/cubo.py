@@ -0,0 +1,254 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .cache import estimar_bytes
+from .consolidacao import concatenar
+
+# Grão do cubo: dimensões dos filtros/gráficos + mês ('mes' = primeiro dia do mês). O filtro
+# de período é diário: os dias dos meses que ele corta vêm das linhas (ver dividir_periodo)
+DIMENSOES_CUBO = ['tp_mov', 'representante', 'cliente', 'descricao']
+# Só medidas aditivas: qualquer rollup do cubo é uma soma
+MEDIDAS_CUBO = ['valor_bruto', 'valor_net', 'custo_total', 'margem_em_valor', 'qtd']
+
+
+@dataclass
+class Cubo:
+    """
+    Pré-agregados de um dataset no grão mensal, com as medidas e 'linhas' somadas:
+
+    - `celulas`: (tp_mov, representante, cliente, descricao, mes), responde a qualquer
+      combinação de filtros;
+    - `marginais`: uma tabela (dimensão, mes) por dimensão, bem menor, que responde KPIs e
+      gráficos quando só o período filtra (o estado inicial da sidebar).
+
+    O cubo filtrado só por período fica sem `celulas` (None).
+    """
+    celulas: pd.DataFrame | None
+    marginais: dict = field(default_factory=dict)
+
+    def __len__(self):
+        return sum(len(tabela) for tabela in self.tabelas())
+
+    def tabelas(self):
+        return [tabela for tabela in [self.celulas, *self.marginais.values()] if tabela is not None]
+
+    def tabela(self, dimensao=None):
+        """
+        Menor tabela com a `dimensao` (sem dimensão, a menor de todas: totais e meses).
+        """
+        candidatas = [tabela for tabela in self.tabelas() if dimensao is None or dimensao in tabela.columns]
+        return min(candidatas, key=len)
+
+    def memoria_bytes(self):
+        return sum(estimar_bytes(tabela) for tabela in self.tabelas())
+
+
+def _somas(tabela):
+    return [col for col in tabela.columns if col in MEDIDAS_CUBO or col == 'linhas']
+
+
+def _marginais(tabela):
+    # (dimensão, mes) por dimensão, somado das células ou direto das linhas
+    tempo = ['mes'] if 'mes' in tabela.columns else []
+    somas = _somas(tabela)
+    return {
+        dimensao: tabela.groupby([dimensao, *tempo], observed=True, dropna=False, sort=False)[somas].sum().reset_index()
+        for dimensao in DIMENSOES_CUBO if dimensao in tabela.columns
+    }
+
+
+def _base(df, linhas=None):
+    # Linhas (ou só as posições `linhas`) nas colunas do cubo, com 'linhas' = 1 e o mês
+    dimensoes = [col for col in DIMENSOES_CUBO if col in df.columns]
+    medidas = [col for col in MEDIDAS_CUBO if col in df.columns]
+    base = df[[*dimensoes, *medidas]]
+    if linhas is not None:
+        base = base.take(linhas)
+    # Medidas em float32 no dataset: as somas do cubo são feitas em float64
+    base = base.astype({col: 'float64' for col in medidas if df[col].dtype == np.float32}).assign(linhas=1)
+    chaves = list(dimensoes)
+    if 'data' in df.columns:
+        datas = df['data'].to_numpy() if linhas is None else df['data'].to_numpy()[linhas]
+        base['mes'] = datas.astype('datetime64[M]').astype('datetime64[ns]')
+        chaves.append('mes')
+    return base, chaves
+
+
+def construir_cubo(df):
+    """
+    Pré-agrega as linhas de NF no grão (tp_mov, representante, cliente, descricao, mês) e
+    tira desse grão as marginais por dimensão. KPIs e gráficos passam a ser somas sobre o
+    cubo, sem reler as linhas.
+    """
+    base, chaves = _base(df)
+    if not chaves:
+        return Cubo(base.sum().to_frame().T)
+    tabela = base.groupby(chaves, observed=True, dropna=False, sort=False).sum().reset_index()
+    return Cubo(tabela, _marginais(tabela))
+
+
+def cubo_linhas(df, linhas=None, sinal=1):
+    """
+    Cubo cujas células são as próprias linhas (ou só as das posições `linhas`), sem
+    agregar, com as somas multiplicadas por `sinal` (-1 para descontar). Para poucas linhas
+    (os dias dos meses que o período corta, um extrato diário) somar direto sai mais barato
+    que agrupá-las.
+    """
+    base, chaves = _base(df, linhas)
+    if sinal != 1:
+        somas = _somas(base)
+        base[somas] = base[somas] * sinal
+    tempo = ['mes'] if 'mes' in chaves else []
+    return Cubo(base, {
+        dimensao: base[[dimensao, *tempo, *_somas(base)]] for dimensao in DIMENSOES_CUBO if dimensao in chaves
+    })
+
+
+def juntar_cubos(cubos):
+    """
+    Cubo com as células de todos, sem reagregar (as consultas somam por dimensão de todo jeito).
+    """
+    celulas = None if any(cubo.celulas is None for cubo in cubos) else concatenar([cubo.celulas for cubo in cubos])
+    return Cubo(celulas, {
+        dimensao: concatenar([cubo.marginais[dimensao] for cubo in cubos])
+        for dimensao in cubos[0].marginais if all(dimensao in cubo.marginais for cubo in cubos)
+    })
+
+
+def atualizar_cubo(cubo, adicionadas=None, removidas=None):
+    """
+    Cubo depois de acrescentar e/ou remover linhas de NF, sem reagregar o dataset:
+    as medidas são aditivas, então soma as linhas novas e subtrai as removidas.
+    Só as células (e linhas das marginais) que podem coincidir com essas linhas são reagregadas.
+    """
+    deltas = []
+    if adicionadas is not None and len(adicionadas):
+        deltas.append(cubo_linhas(adicionadas))
+    if removidas is not None and len(removidas):
+        deltas.append(cubo_linhas(removidas, sinal=-1))
+    if not deltas:
+        return cubo
+    delta = juntar_cubos(deltas)
+    return Cubo(
+        _somar_delta(cubo.celulas, delta.celulas),
+        {dimensao: _somar_delta(tabela, delta.marginais[dimensao]) for dimensao, tabela in cubo.marginais.items()},
+    )
+
+
+def _somar_delta(tabela, delta):
+    dimensoes = [col for col in tabela.columns if col in DIMENSOES_CUBO or col == 'mes']
+    somas = [col for col in tabela.columns if col not in dimensoes]
+    if not dimensoes:
+        return concatenar([tabela, delta])[somas].sum().to_frame().T
+
+    # Cada dimensão só é testada nas células que passaram nas anteriores (o mês corta mais)
+    tocadas = None
+    for col in sorted(dimensoes, key=lambda c: c != 'mes'):
+        valores = tabela[col] if tocadas is None else tabela[col].take(tocadas)
+        achou = valores.isin(delta[col].unique()).to_numpy()
+        tocadas = np.flatnonzero(achou) if tocadas is None else tocadas[achou]
+    # _posicao leva cada célula reagregada de volta à sua linha na tabela (-1 = célula nova)
+    juntas = concatenar([tabela.take(tocadas).assign(_posicao=tocadas), delta.assign(_posicao=-1)])
+    reagregadas = juntas.groupby(dimensoes, observed=True, dropna=False, sort=False).agg(
+        {**{col: 'sum' for col in somas}, '_posicao': 'max'}
+    ).reset_index()
+    existentes = reagregadas[reagregadas['_posicao'] >= 0]
+    novas = reagregadas[(reagregadas['_posicao'] < 0) & (reagregadas['linhas'] != 0)]
+
+    # Uma única cópia da tabela, com as células novas no fim; as existentes recebem as somas novas
+    resultado = concatenar([tabela, novas[list(tabela.columns)]])
+    posicoes = existentes['_posicao'].to_numpy()
+    for col in somas:
+        resultado.loc[posicoes, col] = existentes[col].to_numpy()
+
+    # Células que ficaram sem nenhuma linha de NF saem: as últimas linhas ocupam o lugar
+    # delas e a tabela é encurtada (a ordem das células não importa para as somas)
+    vazias = np.sort(posicoes[existentes['linhas'].to_numpy() == 0])
+    if not len(vazias):
+        return resultado
+    restantes = len(resultado) - len(vazias)
+    buracos = vazias[vazias < restantes]
+    ultimas = np.setdiff1d(np.arange(restantes, len(resultado)), vazias, assume_unique=True)
+    for j in range(resultado.shape[1]):
+        resultado.iloc[buracos, j] = resultado.iloc[ultimas, j].to_numpy()
+    return resultado.iloc[:restantes]
+
+
+def dividir_periodo(periodo, primeira, ultima):
+    """
+    Separa o período (dias, inclusivo) nos meses inteiros, respondidos pelo cubo, e nos
+    trechos dos meses que ele corta (no máximo dois), somados a partir das linhas. "Inteiro"
+    é em relação aos dados: começar antes da `primeira` data ou terminar depois da `ultima`
+    não corta o mês. Retorna ((primeiro_mes, ultimo_mes), [(inicio, fim), ...]); sem meses
+    inteiros, primeiro_mes > ultimo_mes.
+    """
+    primeira, ultima = pd.Timestamp(primeira).normalize(), pd.Timestamp(ultima).normalize()
+    inicio = max(pd.Timestamp(periodo[0]).normalize(), primeira)
+    fim = min(pd.Timestamp(periodo[1]).normalize(), ultima)
+    primeiro_mes, ultimo_mes = inicio.replace(day=1), fim.replace(day=1)
+    if inicio > fim:
+        return (ultimo_mes + pd.offsets.MonthBegin(1), ultimo_mes), []
+    bordas = []
+    fim_mes = min(primeiro_mes + pd.offsets.MonthEnd(0), ultima)
+    if inicio > max(primeiro_mes, primeira) or fim < fim_mes:
+        bordas.append((inicio, min(fim, fim_mes)))
+        primeiro_mes += pd.offsets.MonthBegin(1)
+    if primeiro_mes <= ultimo_mes and fim < min(ultimo_mes + pd.offsets.MonthEnd(0), ultima):
+        bordas.append((ultimo_mes, fim))
+        ultimo_mes -= pd.offsets.MonthBegin(1)
+    return (primeiro_mes, ultimo_mes), bordas
+
+
+def _filtrar_tabela(tabela, meses, selecoes):
+    mascara = np.ones(len(tabela), dtype=bool)
+    if meses is not None and 'mes' in tabela.columns:
+        primeiro, ultimo = meses
+        mascara &= ((tabela['mes'] >= primeiro) & (tabela['mes'] <= ultimo)).to_numpy()
+    for col, valores in selecoes.items():
+        mascara &= tabela[col].isin(valores).to_numpy()
+    return tabela[mascara]
+
+
+def filtrar_cubo(cubo, meses=None, selecoes=None):
+    """
+    Aplica os filtros da sidebar ao cubo com uma única máscara por tabela.
+    `meses` é (primeiro_mes, ultimo_mes) inclusivo (ver dividir_periodo); `selecoes` mapeia
+    coluna -> valores aceitos. Sem seleções, só as marginais são filtradas.
+    """
+    selecoes = {
+        col: valores for col, valores in (selecoes or {}).items()
+        if valores and cubo.celulas is not None and col in cubo.celulas.columns
+    }
+    if selecoes or not cubo.marginais:
+        return Cubo(_filtrar_tabela(cubo.celulas, meses, selecoes))
+    if meses is None:
+        return Cubo(None, cubo.marginais)
+    return Cubo(None, {dimensao: _filtrar_tabela(tabela, meses, {}) for dimensao, tabela in cubo.marginais.items()})
+
+
+def totais_cubo(cubo):
+    """
+    Totais das medidas do cubo (base dos KPIs de Métricas Chave).
+    """
+    tabela = cubo.tabela()
+    return {col: float(tabela[col].sum()) for col in MEDIDAS_CUBO if col in tabela.columns}
+
+
+def agregar_cubo(cubo, dimensao):
+    """
+    Rollup do cubo para uma dimensão ('mes_ano' = "AAAA-MM", em ordem cronológica).
+    Retorna valor_net, custo_total e margem_em_valor por valor da dimensão (só os valores
+    com alguma linha de NF: células descontadas podem zerar um valor).
+    """
+    tabela = cubo.tabela(None if dimensao == 'mes_ano' else dimensao)
+    medidas = [col for col in ('valor_net', 'custo_total', 'margem_em_valor') if col in tabela.columns]
+    if dimensao == 'mes_ano':
+        if 'mes' not in tabela.columns:
+            return pd.DataFrame({'mes_ano': pd.Series([], dtype='str'), **{col: [] for col in medidas}})
+        rollup = tabela.groupby('mes')[[*medidas, 'linhas']].sum()
+        rollup = rollup.set_axis(rollup.index.strftime('%Y-%m').rename('mes_ano'))
+    else:
+        rollup = tabela.groupby(tabela[dimensao], observed=True)[[*medidas, 'linhas']].sum()
+    return rollup[rollup['linhas'] != 0][medidas].reset_index()
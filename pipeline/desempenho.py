@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .armazenamento import DIRETORIO_DADOS
+
+# Log JSON-lines com uma linha por rerun do dashboard
+ARQUIVO_LOG = os.environ.get('DASHBOARD_PERF_LOG', os.path.join(DIRETORIO_DADOS, 'desempenho.jsonl'))
+# Modos de captura aceitos em ?perf=... (combináveis com vírgula)
+MODOS_CAPTURA = ('cprofile', 'tracemalloc')
+
+_trava_log = threading.Lock()
+
+
+def pico_rss_mb():
+    """
+    Pico de memória residente do processo até agora (MB), ou None sem o módulo resource.
+    """
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024
+
+
+@dataclass
+class Etapa:
+    """
+    Medição de uma etapa: tempo de parede, linhas que entraram/saíram e memória.
+    `pico_mb` é o pico alocado na etapa quando o tracemalloc está ligado; sem ele,
+    é o pico de RSS do processo ao fim da etapa (um salto indica a etapa que o elevou).
+    """
+    nome: str
+    segundos: float = 0.0
+    linhas_entrada: int | None = None
+    linhas_saida: int | None = None
+    pico_mb: float | None = None
+    fonte_memoria: str = 'rss'
+
+
+class Medidor:
+    """
+    Coleta as etapas de um rerun. Uso:
+
+        with medidor.etapa('filtros', linhas_entrada=len(df)) as etapa:
+            filtrado = ...
+            etapa.linhas_saida = len(filtrado)
+
+    ou, para blocos longos do script, etapa = medidor.iniciar(...) / medidor.concluir(etapa, ...).
+    `encerrado` marca que o rerun já foi registrado: etapas medidas depois disso
+    (um fragmento reexecutando sozinho) pertencem a outro registro.
+    """
+
+    def __init__(self):
+        self.etapas = []
+        self.inicio = time.perf_counter()
+        self.encerrado = False
+
+    def iniciar(self, nome, linhas_entrada=None):
+        etapa = Etapa(nome=nome, linhas_entrada=linhas_entrada)
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        etapa.inicio = time.perf_counter()
+        return etapa
+
+    def concluir(self, etapa, linhas_saida=None):
+        etapa.segundos = time.perf_counter() - etapa.inicio
+        if linhas_saida is not None:
+            etapa.linhas_saida = linhas_saida
+        if tracemalloc.is_tracing():
+            etapa.pico_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            etapa.fonte_memoria = 'tracemalloc'
+        else:
+            etapa.pico_mb = pico_rss_mb()
+        self.etapas.append(etapa)
+        return etapa
+
+    @contextmanager
+    def etapa(self, nome, linhas_entrada=None):
+        etapa = self.iniciar(nome, linhas_entrada)
+        try:
+            yield etapa
+        finally:
+            self.concluir(etapa)
+
+    def tabela(self):
+        """
+        Linhas do painel de Performance.
+        """
+        return [
+            {
+                'Etapa': e.nome,
+                'Tempo (ms)': round(e.segundos * 1000, 1),
+                'Linhas entrada': e.linhas_entrada,
+                'Linhas saída': e.linhas_saida,
+                'Memória pico (MB)': None if e.pico_mb is None else round(e.pico_mb, 1),
+            }
+            for e in self.etapas
+        ]
+
+    def total_segundos(self):
+        return time.perf_counter() - self.inicio
+
+    def registro(self, **extras):
+        """
+        Dicionário serializável do rerun (uma linha do log).
+        """
+        return {
+            'momento': datetime.now().isoformat(timespec='milliseconds'),
+            **extras,
+            'total_segundos': round(self.total_segundos(), 6),
+            'etapas': [asdict(e) for e in self.etapas],
+        }
+
+
+def registrar(registro, caminho=ARQUIVO_LOG):
+    """
+    Acrescenta o registro ao log JSON-lines (uma linha por rerun).
+    """
+    linha = json.dumps(registro, ensure_ascii=False, default=str)
+    with _trava_log:
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        with open(caminho, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(linha + '\n')
+
+
+def modos_captura(valor):
+    """
+    Modos pedidos em ?perf=cprofile,tracemalloc (ou ?perf=tudo).
+    """
+    pedidos = {p.strip().lower() for p in (valor or '').split(',') if p.strip()}
+    if 'tudo' in pedidos:
+        return set(MODOS_CAPTURA)
+    return pedidos & set(MODOS_CAPTURA)
+
+
+class Captura:
+    """
+    Captura opcional de um rerun inteiro com cProfile e/ou tracemalloc.
+    """
+
+    def __init__(self, modos):
+        self.modos = set(modos)
+        self.perfil = cProfile.Profile() if 'cprofile' in self.modos else None
+        self._iniciou_tracemalloc = False
+
+    def iniciar(self):
+        if 'tracemalloc' in self.modos and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._iniciou_tracemalloc = True
+        if self.perfil is not None:
+            try:
+                self.perfil.enable()
+            except ValueError:  # outro perfilador ativo (ex.: outra sessão capturando ao mesmo tempo)
+                self.perfil = None
+        return self
+
+    def finalizar(self, linhas=25):
+        """
+        Encerra a captura e devolve os relatórios em texto ({'cprofile': ..., 'tracemalloc': ...}).
+        """
+        relatorios = {}
+        if self.perfil is not None:
+            self.perfil.disable()
+            saida = io.StringIO()
+            pstats.Stats(self.perfil, stream=saida).sort_stats('cumulative').print_stats(linhas)
+            relatorios['cprofile'] = saida.getvalue()
+        if 'tracemalloc' in self.modos and tracemalloc.is_tracing():
+            atual, pico = tracemalloc.get_traced_memory()
+            estatisticas = tracemalloc.take_snapshot().statistics('lineno')[:linhas]
+            relatorios['tracemalloc'] = "\n".join(
+                [f"atual: {atual / 1024 ** 2:.1f} MB   pico: {pico / 1024 ** 2:.1f} MB"]
+                + [str(e) for e in estatisticas]
+            )
+            if self._iniciou_tracemalloc:
+                tracemalloc.stop()
+        return relatorios
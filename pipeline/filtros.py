@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+# Colunas filtradas pelos multiselects da sidebar, na ordem em que são aplicadas
+COLUNAS_FILTRO = ['tp_mov', 'representante', 'cliente', 'descricao']
+
+
+class IndiceFiltros:
+    """
+    Índice montado uma vez por dataset para os filtros da sidebar.
+
+    - cada coluna de filtro vira códigos int32 na ordem alfabética dos valores;
+      selecionar valores é uma tabela booleana indexada pelos códigos (sem isin/cópias);
+    - as datas ficam ordenadas (argsort estável), e o período sai de dois searchsorted.
+
+    As máscaras são combinadas com & e o DataFrame só é fatiado uma vez, no final.
+    """
+
+    def __init__(self, df, colunas=COLUNAS_FILTRO):
+        self.linhas = len(df)
+        self.codigos = {}
+        self.valores = {}
+        for col in colunas:
+            if col in df.columns:
+                self.codigos[col], self.valores[col] = self._codificar(df[col])
+        self.ordem_datas = None
+        if 'data' in df.columns:
+            datas = df['data'].to_numpy(dtype='datetime64[ns]')
+            self.ordem_datas = np.argsort(datas, kind='stable')
+            self.datas_ordenadas = datas[self.ordem_datas]
+
+    def atualizado(self, manter, novas):
+        """
+        Índice do dataset depois de descartar as linhas fora de `manter` (máscara sobre as
+        linhas atuais; None mantém todas) e acrescentar o DataFrame `novas` no fim.
+        Só as linhas novas são fatoradas; as demais têm os códigos remapeados e as datas
+        novas entram por searchsorted no vetor já ordenado. Resultado igual a IndiceFiltros(df).
+        """
+        manter = self.tudo() if manter is None else np.asarray(manter, dtype=bool)
+        mantidas = int(manter.sum())
+        novo = IndiceFiltros.__new__(IndiceFiltros)
+        novo.linhas = mantidas + len(novas)
+        novo.codigos = {}
+        novo.valores = {}
+        for col, codigos in self.codigos.items():
+            serie = novas[col] if col in novas.columns else pd.Series(np.nan, index=novas.index, dtype=object)
+            locais, unicos = pd.factorize(serie)
+            unicos = list(unicos)
+            valores = self.valores[col]
+            faltantes = [v for v, p in zip(unicos, pd.Index(valores, dtype=object).get_indexer(unicos)) if p < 0]
+            if faltantes:
+                valores = sorted(valores + faltantes)
+            indice_valores = pd.Index(valores, dtype=object)
+            antigos = codigos[manter]
+            if faltantes:
+                # Valores novos deslocam a ordem alfabética: traduz os códigos antigos
+                posicao = np.append(indice_valores.get_indexer(self.valores[col]), -1).astype(np.int32)
+                antigos = posicao[antigos]
+            traducao = np.append(indice_valores.get_indexer(unicos), -1).astype(np.int32)
+            novo.codigos[col] = np.concatenate([antigos, traducao[locais]])
+            novo.valores[col] = valores
+        novo.ordem_datas = None
+        if self.ordem_datas is not None:
+            # Posição de cada linha mantida no dataset novo (as novas vêm depois delas)
+            nova_posicao = np.cumsum(manter) - 1
+            ficam = manter[self.ordem_datas]
+            ordem = nova_posicao[self.ordem_datas[ficam]]
+            datas = self.datas_ordenadas[ficam]
+            datas_novas = novas['data'].to_numpy(dtype='datetime64[ns]')
+            ordem_novas = np.argsort(datas_novas, kind='stable')
+            datas_novas = datas_novas[ordem_novas]
+            # side='right': empates ficam depois das linhas antigas, como no argsort estável
+            onde = np.searchsorted(datas, datas_novas, side='right')
+            novo.ordem_datas = np.insert(ordem, onde, ordem_novas + mantidas)
+            novo.datas_ordenadas = np.insert(datas, onde, datas_novas)
+        return novo
+
+    @staticmethod
+    def _codificar(serie):
+        codigos, unicos = pd.factorize(serie)
+        unicos = list(unicos)
+        ordem = sorted(range(len(unicos)), key=lambda i: unicos[i])
+        posicao = np.empty(len(unicos) + 1, dtype=np.int32)
+        posicao[ordem] = np.arange(len(unicos), dtype=np.int32)
+        posicao[-1] = -1  # valores ausentes (código -1 do factorize)
+        return posicao[codigos], [unicos[i] for i in ordem]
+
+    def memoria_bytes(self):
+        total = sum(c.nbytes for c in self.codigos.values())
+        if self.ordem_datas is not None:
+            total += self.ordem_datas.nbytes + self.datas_ordenadas.nbytes
+        return total
+
+    def tudo(self):
+        return np.ones(self.linhas, dtype=bool)
+
+    def posicoes_periodo(self, inicio, fim):
+        """
+        Posições (em ordem de data) das linhas com data (dia) entre `inicio` e `fim`, inclusive.
+        """
+        inicio = np.datetime64(pd.Timestamp(inicio).normalize(), 'ns')
+        fim = np.datetime64(pd.Timestamp(fim).normalize() + pd.Timedelta(days=1), 'ns')
+        lo, hi = np.searchsorted(self.datas_ordenadas, [inicio, fim], side='left')
+        return self.ordem_datas[lo:hi]
+
+    def mascara_periodo(self, inicio, fim):
+        """
+        Linhas com data (dia) entre `inicio` e `fim`, inclusive.
+        """
+        if self.ordem_datas is None:
+            return self.tudo()
+        mascara = np.zeros(self.linhas, dtype=bool)
+        mascara[self.posicoes_periodo(inicio, fim)] = True
+        return mascara
+
+    def mascara_valores(self, col, selecionados, posicoes=None):
+        """
+        Linhas cujo valor em `col` está entre os `selecionados` (só as `posicoes`, se informadas).
+        """
+        tabela = np.zeros(len(self.valores[col]) + 1, dtype=bool)  # última posição = ausente
+        indices = pd.Index(self.valores[col], dtype=object).get_indexer(list(selecionados))
+        tabela[indices[indices >= 0]] = True
+        return tabela[self.codigos[col] if posicoes is None else self.codigos[col][posicoes]]
+
+    def opcoes(self, col, mascara):
+        """
+        Valores de `col` presentes nas linhas da máscara, em ordem alfabética.
+        """
+        codigos = self.codigos[col][mascara]
+        contagem = np.bincount(codigos[codigos >= 0], minlength=len(self.valores[col]))
+        return [self.valores[col][i] for i in np.flatnonzero(contagem)]
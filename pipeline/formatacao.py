@@ -0,0 +1,105 @@
+import numpy as np
+
+# Grupos de milhar pré-formatados: o grupo da esquerda sem zeros ("7"), os demais com ("007")
+_GRUPO_INICIAL = np.array([str(i) for i in range(1000)])
+_GRUPO = np.array([f".{i:03d}" for i in range(1000)])
+_CENTAVOS = np.array([f",{i:02d}" for i in range(100)])
+# Até 999.999.999.999,99; acima disso (e nos empates de meio centavo) usa a formatação escalar
+_MAX_GRUPOS = 4
+_LIMITE_VETORIZADO = 1000.0 ** _MAX_GRUPOS
+
+
+def formatar_escalar_br(valor, prefixo="", sufixo=""):
+    """
+    Formatação de referência (f-string + troca de separadores), um valor por vez.
+    """
+    texto = f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"{prefixo}{texto}{sufixo}"
+
+
+def formatar_br(valores, prefixo="", sufixo="", vazio=""):
+    """
+    Formata uma coluna inteira de números no padrão pt-BR ("-5.920,70") de uma vez:
+    arredonda para centavos, separa os grupos de milhar com aritmética inteira e monta
+    o texto concatenando tabelas pré-formatadas. O resultado é idêntico ao da versão
+    escalar; NaN vira `vazio`. Retorna um array de objetos (str).
+    """
+    x = np.asarray(valores, dtype='float64')
+    nulo = np.isnan(x)
+    absoluto = np.where(nulo, 0.0, np.abs(x))
+    escalado = absoluto * 100
+    # Empates de meio centavo dependem da representação binária exata: ficam com a f-string
+    escalar = ~nulo & ((absoluto >= _LIMITE_VETORIZADO - 1) | (np.abs(escalado - np.floor(escalado) - 0.5) < 1e-6))
+    centavos_total = np.where(escalar, 0.0, np.round(escalado)).astype(np.int64)
+
+    inteiro, centavos = np.divmod(centavos_total, 100)
+    texto = np.where(np.signbit(x), prefixo + "-", prefixo)  # como a f-string: -0.001 -> "-0,00"
+    for j in reversed(range(_MAX_GRUPOS)):
+        grupo = (inteiro // 1000 ** j) % 1000
+        if j == 0:
+            texto = np.char.add(texto, np.where(inteiro >= 1000, _GRUPO[grupo], _GRUPO_INICIAL[grupo]))
+            continue
+        acima = inteiro >= 1000 ** (j + 1)
+        presente = inteiro >= 1000 ** j
+        if not presente.any():
+            continue
+        parte = np.where(acima, _GRUPO[grupo], np.where(presente, _GRUPO_INICIAL[grupo], ""))
+        texto = np.char.add(texto, parte)
+    texto = np.char.add(texto, _CENTAVOS[centavos])
+    if sufixo:
+        texto = np.char.add(texto, sufixo)
+
+    resultado = texto.astype(object)
+    for i in np.flatnonzero(escalar):
+        resultado[i] = formatar_escalar_br(x[i], prefixo, sufixo)
+    resultado[nulo] = vazio
+    return resultado
+
+
+def formatar_moeda_br(valores):
+    """
+    "R$ 1.234,56" para a coluna inteira (NaN vira "R$ 0,00").
+    """
+    return formatar_br(valores, prefixo="R$ ", vazio="R$ 0,00")
+
+
+def formatar_porcentagem_br(valores):
+    """
+    "12,34%" para a coluna inteira (NaN vira "0,00%").
+    """
+    return formatar_br(valores, sufixo="%", vazio="0,00%")
+
+
+def formatar_tooltip_br(valores, tipo="R$"):
+    """
+    Texto dos tooltips: "R$ 1.234,56", "12,34%" ou "1.234,56"; NaN vira texto vazio.
+    """
+    if tipo == "R$":
+        return formatar_br(valores, prefixo="R$ ")
+    elif tipo == "%":
+        return formatar_br(valores, sufixo="%")
+    return formatar_br(valores)
+
+
+def adicionar_tooltips(df):
+    """
+    Acrescenta as colunas *_fmt do custom_data dos gráficos de margem a um agregado.
+    """
+    df['valor_net_fmt'] = formatar_tooltip_br(df['valor_net'].to_numpy())
+    df['custo_total_fmt'] = formatar_tooltip_br(df['custo_total'].to_numpy())
+    df['margem_valor_fmt'] = formatar_tooltip_br(df['margem_em_valor'].to_numpy())
+    df['margem_perc_fmt'] = formatar_tooltip_br(df['margem_em_porcentagem'].to_numpy(), tipo="%")
+    return df
+
+
+def formatar_colunas(df, moeda=(), porcentagem=()):
+    """
+    Cópia de `df` com as colunas de `moeda` e `porcentagem` já convertidas em texto pt-BR,
+    uma passada vetorizada por coluna (substitui os formatadores por célula do Styler).
+    """
+    df = df.copy()
+    for colunas, formatar in ((moeda, formatar_moeda_br), (porcentagem, formatar_porcentagem_br)):
+        for col in colunas:
+            if col in df.columns:
+                df[col] = formatar(df[col].to_numpy(dtype='float64', na_value=np.nan))
+    return df
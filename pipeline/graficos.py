@@ -0,0 +1,189 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from .temporal import FREQUENCIAS, NOMES_COMPARACAO
+
+# Colunas *_fmt (pipeline.formatacao.adicionar_tooltips) usadas nos tooltips
+CUSTOM_DATA = ['valor_net_fmt', 'custo_total_fmt', 'margem_valor_fmt', 'margem_perc_fmt']
+
+FONTE = 'Segoe UI, sans-serif'
+ROTULO_MARGEM = 'Margem em Valor (R$)'
+
+
+def _eixo(gridcolor, **extras):
+    return dict(
+        title_font=dict(size=20, color='#ADD8E6', family=FONTE),
+        tickfont=dict(size=16, color='#E0E0E0'),
+        gridcolor=gridcolor,
+        showgrid=True,
+        zeroline=False,
+        automargin=True,
+        **extras
+    )
+
+
+_TRACO = dict(
+    hoverlabel=dict(font_size=18, font_family=FONTE, bgcolor='#6C5B7B', font_color='#E0E0E0', align='left'),
+    textfont=dict(color='#ADD8E6', size=16),
+)
+_MARCADOR = dict(color='#6C5B7B', line=dict(width=0), opacity=0.96)
+
+# Visual integrado do dashboard (fundo escuro, fontes, eixos e cor das barras) definido uma
+# vez: as figuras só trazem os dados, o título e o que muda de um gráfico para outro, em vez
+# de um update_layout/update_traces completo por figura
+TEMPLATE = go.layout.Template(
+    layout=dict(
+        title=dict(y=0.93, x=0.5, xanchor='center', yanchor='top', font=dict(size=30, color='#ADD8E6', family=FONTE)),
+        font=dict(family=FONTE, size=18, color='#E0E0E0'),
+        plot_bgcolor='#22232B',
+        paper_bgcolor='#22232B',
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, font=dict(size=18, color='#ADD8E6')),
+        margin=dict(l=40, r=40, t=70, b=40),
+        xaxis=_eixo('rgba(160, 160, 160, 0.15)', tickangle=-25),
+        yaxis=_eixo('rgba(160, 160, 160, 0.12)'),
+        # Códigos numéricos no eixo x (ex.: representante "012") continuam categorias
+        autotypenumbers='strict',
+        hovermode='closest',
+        showlegend=False,
+        width=1400,
+        height=500,
+    ),
+    data=dict(
+        bar=[go.Bar(marker=_MARCADOR, texttemplate='%{y:.2s}', textposition='auto', **_TRACO)],
+        scatter=[go.Scatter(
+            mode='lines+markers', line=dict(color='#636EFA', width=3), marker=dict(_MARCADOR, size=8), **_TRACO
+        )],
+    ),
+)
+
+
+def tooltip_margem(rotulo):
+    """
+    Template do tooltip dos gráficos de margem (customdata = CUSTOM_DATA).
+    """
+    return (
+        f"<b>{rotulo}:</b> %{{x}}<br>" +
+        "<b>Valor NET Total (R$):</b> %{customdata[0]}<br>" +
+        "<b>Custo Total (R$):</b> %{customdata[1]}<br>" +
+        "<b>Margem em Valor (R$):</b> %{customdata[2]}<br>" +
+        "<b>Margem (%):</b> %{customdata[3]}<extra></extra>"
+    )
+
+
+def _traco(classe, df, coluna_x, rotulo, x=None):
+    """
+    Traço com os arrays já prontos: y em float64 (vai como array tipado no JSON), x e
+    tooltips como listas de texto.
+    """
+    return classe(
+        x=(df[coluna_x].astype(str) if x is None else x).tolist(),
+        y=df['margem_em_valor'].to_numpy(dtype=np.float64),
+        customdata=df[CUSTOM_DATA].to_numpy(dtype=object),
+        hovertemplate=tooltip_margem(rotulo),
+    )
+
+
+def _figura(traco, titulo, rotulo_x, **layout):
+    return go.Figure(
+        data=[traco],
+        layout=go.Layout(
+            template=TEMPLATE, title_text=titulo, xaxis_title_text=rotulo_x, yaxis_title_text=ROTULO_MARGEM, **layout
+        ),
+    )
+
+
+def figura_representantes(df_rep_margem):
+    return _figura(_traco(go.Bar, df_rep_margem, 'representante', "Representante"),
+                   'Margem por Representante', 'Representante')
+
+
+def figura_clientes(df_cliente_margem):
+    # Nomes de clientes truncados para caber no eixo
+    nomes = [x[:50] + '...' if len(x) > 50 else x for x in df_cliente_margem['cliente'].astype(str)]
+    # Altura e margem inferior maiores por causa dos nomes longos
+    return _figura(
+        _traco(go.Bar, df_cliente_margem, 'cliente', "Cliente", x=pd.Series(nomes, dtype=object)),
+        'Top 10 Clientes por Margem Total', 'Cliente',
+        height=600, margin=dict(l=80, r=50, t=80, b=150), xaxis_tickangle=-45,
+    )
+
+
+def figura_mensal(df_mensal_margem):
+    return _figura(_traco(go.Scatter, df_mensal_margem, 'mes_ano', "Mês/Ano"),
+                   'Evolução da Margem Total Mensal', 'Mês/Ano', xaxis_tickangle=-45)
+
+
+TITULOS_TENDENCIA = {'D': "Diária", 'W': "Semanal", 'M': "Mensal", 'Q': "Trimestral"}
+# Acima disso a linha da tendência vai sem marcadores (séries diárias de vários anos)
+MAX_MARCADORES = 120
+
+
+def figura_tendencia(df_tendencia, frequencia='M', comparacao=None):
+    """
+    Evolução da margem (analise.tendencia_margem) e, com `comparacao`, a linha do período
+    de comparação tracejada, com a variação no tooltip.
+    """
+    rotulo = FREQUENCIAS[frequencia]
+    modo = dict(mode='lines') if len(df_tendencia) > MAX_MARCADORES else {}
+    traco = _traco(go.Scatter, df_tendencia, 'periodo', rotulo).update(name="Período", **modo)
+    layout = dict(xaxis_tickangle=-45)
+    tracos = [traco]
+    if comparacao is not None:
+        tracos.append(go.Scatter(
+            x=traco.x,
+            y=df_tendencia['margem_anterior'].to_numpy(dtype=np.float64),
+            customdata=df_tendencia[['margem_anterior_fmt', 'variacao_fmt', 'variacao_perc_fmt']].to_numpy(dtype=object),
+            name=NOMES_COMPARACAO[comparacao][frequencia],
+            line=dict(color='#ADD8E6', width=2, dash='dash'),
+            marker=dict(color='#ADD8E6'),
+            hovertemplate=(
+                f"<b>{rotulo}:</b> %{{x}}<br>"
+                "<b>Margem na comparação (R$):</b> %{customdata[0]}<br>"
+                "<b>Variação (R$):</b> %{customdata[1]}<br>"
+                "<b>Variação (%):</b> %{customdata[2]}<extra></extra>"
+            ),
+            **modo,
+        ))
+        layout['showlegend'] = True
+    figura = _figura(traco, f'Evolução da Margem Total {TITULOS_TENDENCIA[frequencia]}', rotulo, **layout)
+    figura.add_traces(tracos[1:])
+    return figura
+
+
+def figura_produtos(df_prod_margem, num_products=10, menores=False):
+    eixo = dict(xaxis_tickangle=-35, xaxis_rangeslider_visible=True) if num_products > 15 else {}
+    titulo = f'{num_products} Produtos com Menor Margem' if menores else f'Top {num_products} Produtos por Margem Total'
+    return _figura(_traco(go.Bar, df_prod_margem, 'descricao', "Produto"), titulo, 'Produto', **eixo)
+
+
+# Gráfico de cada agregado de pipeline.analise.GRAFICOS
+FIGURAS = {
+    'representante': figura_representantes,
+    'cliente': figura_clientes,
+    'mes_ano': figura_mensal,
+    'descricao': figura_produtos,
+}
+
+
+def assinatura_agregado(df):
+    """
+    Hash do conteúdo do agregado (colunas e valores, sem o índice).
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr([(col, str(df[col].dtype)) for col in df.columns]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def figura_em_cache(cache, construtor, agregado, *parametros):
+    """
+    Figura de `construtor(agregado, *parametros)` reaproveitada do `cache` enquanto o
+    agregado tiver o mesmo conteúdo e os parâmetros de layout forem os mesmos (vale entre
+    filtros e sessões diferentes que chegam ao mesmo agregado). A figura devolvida é
+    compartilhada: não deve ser alterada.
+    """
+    chave = ('figura', construtor.__name__, assinatura_agregado(agregado), parametros)
+    return cache.obter_ou_calcular(chave, lambda: construtor(agregado, *parametros))
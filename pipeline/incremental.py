@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, replace
+
+import numpy as np
+import pandas as pd
+
+from .consolidacao import CHAVE_LINHA, concatenar, texto_chave
+from .cubo import Cubo, atualizar_cubo
+from .filtros import IndiceFiltros
+from .ingestao import Dataset, carregar_dataset, chave_dataset, somar_contagens
+from .qualidade import avaliar_qualidade, juntar_falhas
+
+
+@dataclass
+class Anexacao:
+    """
+    Resultado de anexar um extrato diário a um relatório: dataset novo, linhas do extrato,
+    linhas do relatório substituídas e, quando o cubo/índice do relatório foram informados,
+    as versões atualizadas deles.
+    """
+    dataset: Dataset
+    linhas_extrato: int
+    substituidas: int
+    cubo: Cubo | None = None
+    indice: IndiceFiltros | None = None
+
+
+def chave_incremental(chave_base: str, chave_extrato: str) -> str:
+    """
+    Chave do dataset resultante: depende só do relatório base e do conteúdo do extrato.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    h.update(chave_base.encode())
+    h.update(chave_extrato.encode())
+    return 'incremental-' + h.hexdigest()
+
+
+def chave_extrato(conteudo: bytes, nome_arquivo: str) -> str:
+    # Mesma chave que carregar_dataset daria ao extrato
+    return chave_dataset(conteudo, nome_arquivo)
+
+
+def _contem(serie, textos):
+    """
+    Máscara das linhas de `serie` cuja chave canônica está em `textos`; colunas
+    categóricas e numéricas são resolvidas sem converter a coluna inteira para texto.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        achou = texto_chave(pd.Series(serie.cat.categories)).isin(textos).to_numpy()
+        return np.append(achou, False)[serie.cat.codes.to_numpy()]
+    if pd.api.types.is_numeric_dtype(serie):
+        numeros = pd.to_numeric(pd.Series(textos), errors='coerce').dropna()
+        return serie.isin(numeros).to_numpy()
+    return texto_chave(serie).isin(textos).to_numpy()
+
+
+def alinhar_tipos(extrato, df):
+    """
+    Converte as colunas do extrato para o tipo que a mesma coluna tem no relatório
+    (ex.: NF numérica no extrato e texto no histórico), para a junção não virar object misto.
+    """
+    convertidas = {}
+    for col in extrato.columns.intersection(df.columns):
+        destino, origem = df[col], extrato[col]
+        texto_destino = isinstance(destino.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(destino)
+        if pd.api.types.is_numeric_dtype(destino) and not pd.api.types.is_numeric_dtype(origem):
+            convertidas[col] = pd.to_numeric(origem, errors='coerce').astype(destino.dtype, errors='ignore')
+        elif texto_destino and pd.api.types.is_numeric_dtype(origem):
+            convertidas[col] = texto_chave(origem)
+    return extrato.assign(**convertidas) if convertidas else extrato
+
+
+def linhas_substituidas(df: pd.DataFrame, extrato: pd.DataFrame) -> np.ndarray:
+    """
+    Máscara das linhas de `df` cuja chave (NF, COD PRODUTO) aparece no extrato.
+    Só as linhas com uma NF do extrato têm a chave completa comparada.
+    """
+    chave = [col for col in CHAVE_LINHA if col in df.columns and col in extrato.columns]
+    mascara = np.zeros(len(df), dtype=bool)
+    if not chave or df.empty or extrato.empty:
+        return mascara
+    candidatas = np.flatnonzero(_contem(df[chave[0]], pd.unique(texto_chave(extrato[chave[0]]))))
+    if not len(candidatas):
+        return mascara
+    trecho = df.iloc[candidatas]
+    chaves_extrato = pd.MultiIndex.from_arrays([texto_chave(extrato[col]) for col in chave])
+    achou = pd.MultiIndex.from_arrays([texto_chave(trecho[col]) for col in chave]).isin(chaves_extrato)
+    mascara[candidatas[achou]] = True
+    return mascara
+
+
+def aplicar_extrato(base: Dataset, extrato: Dataset, cubo: Cubo | None = None,
+                    indice: IndiceFiltros | None = None) -> Anexacao:
+    """
+    Upsert do extrato no relatório: linhas (NF, COD PRODUTO) já existentes são trocadas
+    pelas do extrato e as demais são acrescentadas no fim. Repetições dentro do próprio
+    extrato são lançamentos legítimos e ficam todas.
+    `cubo` e `indice` do relatório base, se informados, são atualizados em vez de refeitos.
+    """
+    extrato = replace(extrato, df=alinhar_tipos(extrato.df, base.df))
+    substituir = linhas_substituidas(base.df, extrato.df)
+    removidas = int(substituir.sum())
+    manter = ~substituir
+    mantidas = base.df[manter] if removidas else base.df
+    df = concatenar([mantidas, extrato.df])
+
+    # O nome mostra o relatório de origem e o último extrato anexado
+    nome = f"{base.nome.split(' + ')[0]} + {extrato.nome}"
+    dataset = Dataset(
+        chave=chave_incremental(base.chave, extrato.chave),
+        nome=nome,
+        df=df,
+        problemas=somar_contagens([base.problemas, extrato.problemas]),
+        avisos=[*base.avisos, *(f"{extrato.nome}: {aviso}" for aviso in extrato.avisos)],
+        descartadas=somar_contagens([base.descartadas, extrato.descartadas]),
+        qualidade=avaliar_qualidade(df, *juntar_falhas([base, extrato])),
+    )
+
+    cubo_novo = indice_novo = None
+    if cubo is not None:
+        cubo_novo = atualizar_cubo(cubo, extrato.df, base.df[substituir] if removidas else None)
+    if indice is not None:
+        # Extrato sem alguma coluna indexada (ou com datas a mais): o índice é refeito do zero
+        compativel = set(indice.codigos) <= set(extrato.df.columns) and \
+            (indice.ordem_datas is not None) == ('data' in extrato.df.columns)
+        indice_novo = indice.atualizado(manter, extrato.df) if compativel else IndiceFiltros(df)
+    return Anexacao(dataset, linhas_extrato=len(extrato.df), substituidas=removidas, cubo=cubo_novo, indice=indice_novo)
+
+
+def anexar_extrato(base: Dataset, conteudo: bytes, nome_arquivo: str, cubo: Cubo | None = None,
+                   indice: IndiceFiltros | None = None, armazem=None) -> Anexacao:
+    """
+    Lê e limpa só o extrato diário, aplica o upsert sobre o relatório `base` e,
+    com `armazem`, persiste o resultado como um novo relatório salvo (e poda os
+    incrementais que ele supera, ver ArmazemDatasets.podar).
+    """
+    extrato = carregar_dataset(conteudo, nome_arquivo)
+    anexacao = aplicar_extrato(base, extrato, cubo=cubo, indice=indice)
+    if armazem is not None:
+        armazem.salvar(anexacao.dataset, base=base.chave)
+        armazem.podar()
+    return anexacao
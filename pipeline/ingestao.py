@@ -0,0 +1,700 @@
+import hashlib
+import io
+import os
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .margem import margem_em_valor
+from .numeros import parse_numero_br
+from .qualidade import ColetorFalhas, Qualidade, avaliar_qualidade
+from .xlsx import PlanilhaXlsx
+
+# Opções padrão dos relatórios de margem exportados pelo ERP
+# (thousands='.' deixa o parser C converter "6.273,60" direto para float64)
+OPCOES_CSV = {'sep': ';', 'decimal': ',', 'thousands': '.', 'encoding': 'latin1'}
+
+NUMERIC_COLUMNS = [
+    'valor_bruto',
+    'custo_total',
+    'margem_em_valor',
+    'margem_em_porcentagem',
+    'valor_net',
+    'qtd',
+    'quantidade',
+    'custo_unitario'
+]
+
+# Ingestão em blocos: linhas por bloco e tamanho de arquivo a partir do qual é usada
+TAMANHO_BLOCO = 200_000
+LIMITE_STREAMING = 64 * 1024 ** 2
+
+# Dimensões sempre lidas como texto (evita "003249" virar 3249 em parte dos blocos)
+COLUNAS_TEXTO = ['cliente', 'representante', 'cod_produto', 'descricao', 'tp_mov', 'segmentacao']
+
+# Linhas sem valor nessas colunas são descartadas
+COLUNAS_NUMERICAS = [
+    'valor_bruto', 'custo_total', 'valor_net',
+    'margem_em_valor', 'margem_em_porcentagem', 'qtd', 'quantidade'
+]
+
+# Esquema do dataset limpo: dimensões categóricas, NF inteira, datas datetime64 e medidas
+# em float64 (float32 opcional: metade da memória, ~7 dígitos significativos por célula;
+# o cubo soma sempre em float64)
+COLUNAS_CATEGORICAS = COLUNAS_TEXTO
+MEDIDAS_FLOAT32 = os.environ.get('DASHBOARD_MEDIDAS_FLOAT32', '') == '1'
+
+# Colunas (já normalizadas) que o dashboard usa; o leitor de xlsx ignora as demais
+COLUNAS_USADAS = {'nf', 'data', *NUMERIC_COLUMNS, *COLUNAS_TEXTO}
+
+# Linhas do topo da aba examinadas em busca do cabeçalho (abaixo de um eventual preâmbulo)
+LINHAS_CABECALHO = 30
+
+COLUMN_MAPPING = {
+    'data_venda': 'data', 'data_do_pedido': 'data', 'data_da_venda': 'data',
+    'valor_bruto_da_venda': 'valor_bruto', 'valor_bruto': 'valor_bruto',
+    'custo_total_da_venda': 'custo_total', 'custo_total': 'custo_total',
+    'margem_em_valor': 'margem_em_valor', 'margem_em_porcentagem': 'margem_em_porcentagem',
+    'representante_de_vendas': 'representante', 'nome_do_representante': 'representante',
+    'nome_do_cliente': 'cliente', 'produto': 'descricao', 'descricao_do_produto': 'descricao'
+}
+
+
+@dataclass
+class Dataset:
+    """
+    Resultado da ingestão: DataFrame limpo e o que foi encontrado durante a limpeza.
+    """
+    chave: str
+    nome: str
+    df: pd.DataFrame
+    problemas: dict = field(default_factory=dict)
+    avisos: list = field(default_factory=list)
+    # Linhas descartadas na limpeza por regra (vazias, totais, sem_valor, sem_data)
+    descartadas: dict = field(default_factory=dict)
+    # Relatório de qualidade (pipeline.qualidade), calculado na ingestão
+    qualidade: Qualidade | None = None
+
+    def memoria_bytes(self):
+        extra = self.qualidade.memoria_bytes() if self.qualidade is not None else 0
+        return int(self.df.memory_usage(deep=True).sum()) + extra
+
+    def pegada_memoria(self):
+        """
+        Memória por coluna (tipo, bytes e bytes por linha), da maior para a menor.
+        """
+        linhas = max(len(self.df), 1)
+        bytes_coluna = self.df.memory_usage(deep=True, index=False)
+        return pd.DataFrame({
+            'coluna': bytes_coluna.index,
+            'tipo': [str(self.df[col].dtype) for col in bytes_coluna.index],
+            'bytes': bytes_coluna.to_numpy(),
+            'bytes_por_linha': (bytes_coluna.to_numpy() / linhas).round(1),
+        }).sort_values('bytes', ascending=False, ignore_index=True)
+
+
+def informar(progresso, **campos):
+    """
+    Atualiza o andamento da ingestão (pipeline.segundo_plano.Progresso), se houver um.
+    """
+    if progresso is not None:
+        progresso.atualizar(**campos)
+
+
+class _LeituraContada(io.BytesIO):
+    """
+    BytesIO que informa ao progresso quantos bytes o parser do CSV já consumiu.
+    """
+
+    def __init__(self, conteudo, progresso):
+        super().__init__(conteudo)
+        self._progresso = progresso
+
+    def read(self, tamanho=-1):
+        dados = super().read(tamanho)
+        self._progresso.atualizar(bytes_lidos=self.tell())
+        return dados
+
+    def read1(self, tamanho=-1):
+        dados = super().read1(tamanho)
+        self._progresso.atualizar(bytes_lidos=self.tell())
+        return dados
+
+
+def _fonte_csv(conteudo, progresso=None):
+    return io.BytesIO(conteudo) if progresso is None else _LeituraContada(conteudo, progresso)
+
+
+def hash_conteudo(conteudo, **opcoes):
+    """
+    Chave do cache: hash do conteúdo enviado + opções do parser.
+    """
+    h = hashlib.blake2b(conteudo, digest_size=20)
+    h.update(repr(sorted(opcoes.items())).encode())
+    return h.hexdigest()
+
+
+def extensao(nome_arquivo):
+    return nome_arquivo.split('.')[-1]
+
+
+def chave_dataset(conteudo, nome_arquivo, medidas_float32=None, **opcoes):
+    """
+    Chave do Dataset que carregar_dataset dá a um arquivo (conteúdo, extensão, opções e
+    precisão das medidas); o modo de leitura (streaming ou inteiro) não entra.
+    """
+    if medidas_float32 is None:
+        medidas_float32 = MEDIDAS_FLOAT32
+    return hash_conteudo(conteudo, nome=extensao(nome_arquivo), **opcoes,
+                         **({'medidas': 'float32'} if medidas_float32 else {}))
+
+
+def opcoes_csv(conteudo, **opcoes):
+    """
+    Opções finais do read_csv, com dtype=str para as colunas de dimensão do cabeçalho
+    e para a NF (a linha "PDF:" deixaria a coluna com tipos mistos; aplicar_esquema a
+    converte para inteiro depois).
+    """
+    opcoes = {**OPCOES_CSV, **opcoes}
+    cabecalho = pd.read_csv(io.BytesIO(conteudo), nrows=0, **opcoes).columns
+    texto = {
+        original: str for original, normalizada in zip(cabecalho, normalizar_colunas(cabecalho))
+        if COLUMN_MAPPING.get(normalizada, normalizada) in [*COLUNAS_TEXTO, 'nf']
+    }
+    return {**opcoes, 'dtype': {**texto, **opcoes.get('dtype', {})}}
+
+
+def ler_arquivo(conteudo, nome_arquivo, progresso=None, **opcoes):
+    """
+    Lê os bytes de um CSV ou Excel para um DataFrame bruto (sem limpeza).
+    """
+    file_extension = extensao(nome_arquivo)
+    informar(progresso, etapa='leitura')
+    if file_extension == 'csv':
+        return pd.read_csv(_fonte_csv(conteudo, progresso), **opcoes_csv(conteudo, **opcoes))
+    elif file_extension == 'xlsx':
+        return ler_xlsx(conteudo, progresso=progresso, **opcoes)
+    raise ValueError("Formato de arquivo não suportado. Por favor, faça o upload de um arquivo CSV ou Excel.")
+
+
+def _destino(cabecalho):
+    """
+    Nome final (após normalização e COLUMN_MAPPING) de cada célula do cabeçalho; None se vazia.
+    """
+    nomes = normalizar_colunas(pd.Index(['' if c is None else str(c) for c in cabecalho], dtype=object))
+    return [COLUMN_MAPPING.get(n, n) or None for n in nomes]
+
+
+def localizar_cabecalho(linhas):
+    """
+    Posição (base 0) da linha de cabeçalho entre as primeiras `linhas`: a que tem mais
+    colunas conhecidas pelo dashboard. O preâmbulo acima dela (ex.: "PDF:") é ignorado.
+    Retorna None se nenhuma linha tiver ao menos duas colunas conhecidas.
+    """
+    melhor, acertos = None, 1
+    for posicao, linha in enumerate(linhas):
+        conhecidas = sum(nome in COLUNAS_USADAS for nome in _destino(linha))
+        if conhecidas > acertos:
+            melhor, acertos = posicao, conhecidas
+    return melhor
+
+
+def _celula_pdf(valor):
+    return isinstance(valor, str) and valor.strip().startswith('PDF:')
+
+
+def _texto_celula(valor):
+    """
+    Célula de dimensão como texto: 3249.0 vira "3249" e datas viram dd/mm/aaaa.
+    """
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    if isinstance(valor, datetime):
+        return valor.strftime('%d/%m/%Y')
+    return str(valor)
+
+
+def _numero_texto(valor):
+    # Número da célula como texto BR sem milhar, para passar pelo mesmo parse das células de texto
+    return np.format_float_positional(valor, trim='-').replace('.', ',')
+
+
+def _tipar_coluna(valores, nome):
+    """
+    Converte a coluna lida (array object, None = célula vazia) para o tipo final:
+    medidas numéricas em float64, datas em datetime64, dimensões em texto.
+    Células de texto em colunas numéricas/de data seguem como texto para limpar_bloco.
+    """
+    tipo = pd.api.types.infer_dtype(valores, skipna=True)
+    serie = pd.Series(valores, dtype=object, copy=False)
+    if nome in NUMERIC_COLUMNS:
+        if tipo in ('integer', 'floating', 'mixed-integer-float', 'empty'):
+            return serie.astype('float64')
+        return serie.map(lambda v: _numero_texto(v) if isinstance(v, (int, float)) else v)
+    if nome == 'data':
+        if tipo in ('datetime', 'datetime64', 'date'):
+            return pd.to_datetime(serie)
+        if tipo in ('integer', 'floating', 'mixed-integer-float'):
+            # Data serial do Excel sem formato de data na célula
+            return pd.to_datetime(serie.astype('float64'), unit='D', origin='1899-12-30')
+        return serie.map(lambda v: v.strftime('%d/%m/%Y') if isinstance(v, datetime) else v)
+    if nome in COLUNAS_TEXTO:
+        if tipo in ('string', 'empty'):
+            return serie
+        return serie.map(lambda v: v if v is None or isinstance(v, str) else _texto_celula(v))
+    return serie.infer_objects()
+
+
+def escolher_aba(planilha, aba=None):
+    """
+    Aba a ler: pelo nome ou posição em `aba`; sem `aba`, a primeira com um cabeçalho reconhecível.
+    Retorna (nome da aba, número da linha do cabeçalho, cabeçalho).
+    """
+    nomes = planilha.abas
+    if aba is not None:
+        if isinstance(aba, int) and 0 <= aba < len(nomes):
+            aba = nomes[aba]
+        if aba not in nomes:
+            raise ValueError(f"Aba '{aba}' não encontrada. Abas disponíveis: {', '.join(map(str, nomes))}")
+        candidatas = [aba]
+    else:
+        candidatas = nomes
+    primeira = None
+    for nome in candidatas:
+        linhas = planilha.linhas(nome, ate_linha=LINHAS_CABECALHO)
+        posicao = localizar_cabecalho(valores for _, valores in linhas)
+        if posicao is not None:
+            return (nome, *linhas[posicao])
+        if primeira is None and linhas:
+            primeira = (nome, *linhas[0])
+    if primeira is None:
+        raise ValueError("A planilha não tem dados")
+    # Nada reconhecível: mantém o comportamento antigo (primeira linha preenchida é o cabeçalho)
+    return primeira
+
+
+def ler_xlsx(conteudo, aba=None, progresso=None):
+    """
+    Leitura rápida do relatório em Excel: percorre a aba em streaming (sem montar a planilha),
+    acha o cabeçalho abaixo de um eventual preâmbulo "PDF:", lê só as colunas que o dashboard
+    usa e já devolve medidas em float64 e datas em datetime64.
+    Com `progresso`, os bytes contados são os do XML da aba (descomprimido).
+    """
+    def ao_ler(lidos, total):
+        informar(progresso, bytes_lidos=lidos, bytes_total=total)
+
+    with PlanilhaXlsx(conteudo) as planilha:
+        nome, numero, cabecalho = escolher_aba(planilha, aba)
+        # Só a primeira coluna de cada nome final é lida (as demais seriam duplicatas)
+        usadas = {}
+        for indice, destino in enumerate(_destino(cabecalho)):
+            if destino in COLUNAS_USADAS and destino not in usadas.values():
+                usadas[indice] = destino
+        if not usadas:
+            raise ValueError(f"Nenhuma coluna do relatório de margem encontrada na aba '{nome}'")
+        valores = planilha.colunas(nome, list(usadas), apos_linha=numero, ao_ler=ao_ler)
+
+    # Linha "PDF:" logo abaixo do cabeçalho (formato exportado pelo ERP)
+    inicio = 0
+    while any(inicio < len(lista) and _celula_pdf(lista[inicio]) for lista in valores.values()):
+        inicio += 1
+    colunas = {
+        str(cabecalho[indice]).strip(): _tipar_coluna(np.array(valores[indice][inicio:], dtype=object), destino)
+        for indice, destino in usadas.items()
+    }
+    return pd.DataFrame(colunas, copy=False)
+
+
+def _tabela_cabecalho():
+    """
+    Tabela do str.translate dos cabeçalhos: letras acentuadas (Latin-1 e Latin Extended-A)
+    viram a letra sem acento e espaço vira "_".
+    """
+    tabela = {' ': '_'}
+    for codigo in range(0xC0, 0x180):
+        letra = chr(codigo).lower()
+        base = unicodedata.normalize('NFD', letra)[0]
+        if len(letra) == 1 and base != letra and base.isascii():
+            tabela[letra] = base
+    return str.maketrans(tabela)
+
+
+TABELA_CABECALHO = _tabela_cabecalho()
+_FORA_DO_CABECALHO = re.compile('[^a-z0-9_]')
+
+
+def normalizar_colunas(colunas):
+    """
+    "Descrição do Produto" -> "descricao_do_produto": uma passada por nome com a tabela
+    pré-compilada (sem acento, minúsculas, "_" no lugar de espaço, só [a-z0-9_]).
+    """
+    return pd.Index(
+        [_FORA_DO_CABECALHO.sub('', str(nome).strip().lower().translate(TABELA_CABECALHO)) for nome in colunas],
+        dtype=object,
+    )
+
+
+@dataclass(frozen=True)
+class RegraDescarte:
+    """
+    Linhas que a limpeza descarta: as que têm `padrao` (regex, sem diferenciar maiúsculas)
+    em alguma das `colunas`.
+    """
+    nome: str
+    colunas: tuple
+    padrao: str
+
+
+# Linhas de totalização do relatório (subtotais por representante/cliente e o total geral).
+# Outras regras entram aqui; cada uma tem a própria contagem em Dataset.descartadas
+REGRAS_DESCARTE = (
+    RegraDescarte('totais', ('representante', 'cliente', 'descricao'), 'total|geral|totais'),
+)
+
+
+def classificar_linhas(df, regras=REGRAS_DESCARTE):
+    """
+    Avalia todas as `regras` de uma vez: cada coluna de dimensão é fatorada uma só vez e
+    os padrões rodam sobre os valores distintos, voltando para as linhas pelos códigos.
+    Retorna {nome da regra: máscara das linhas}.
+    """
+    mascaras = {regra.nome: np.zeros(len(df), dtype=bool) for regra in regras}
+    for col in dict.fromkeys(col for regra in regras for col in regra.colunas):
+        if col not in df.columns:
+            continue
+        codigos, unicos = pd.factorize(df[col].astype(str))
+        unicos = pd.Index(unicos, dtype=object)
+        for regra in regras:
+            if col in regra.colunas:
+                achou = np.asarray(unicos.str.contains(regra.padrao, case=False, regex=True), dtype=bool)
+                mascaras[regra.nome] |= achou[codigos]
+    return mascaras
+
+
+def somar_contagens(contagens):
+    """
+    Soma dicionários {nome: quantidade} (células não convertidas, linhas descartadas).
+    """
+    total = {}
+    for contagem in contagens:
+        for nome, qtd in contagem.items():
+            total[nome] = total.get(nome, 0) + qtd
+    return total
+
+
+def preenchidas(serie):
+    """
+    Máscara das células com algum conteúdo (vazio e 'nan' contam como ausentes).
+    """
+    return ~serie.fillna('').astype(str).str.strip().isin(['', 'nan'])
+
+
+def limpar_bloco(df, primeiro=True, regras=REGRAS_DESCARTE, falhas=None):
+    """
+    Limpeza linha a linha do relatório (vale para o arquivo inteiro ou para um bloco dele).
+    As regras de descarte (linhas vazias, `regras` de totais, sem valor numérico, sem data)
+    são avaliadas juntas e o df é filtrado uma única vez; cada linha descartada conta na
+    primeira regra em que cai. `falhas` (pipeline.qualidade.ColetorFalhas) recebe as
+    linhas das células não convertidas.
+    Retorna (df limpo, nº de células não convertidas por coluna, nº de linhas descartadas por regra).
+    """
+    # 🔧 CORREÇÃO: Remove linhas que começam com "PDF:" (só existe no início do arquivo)
+    if primeiro and len(df.columns) > 0 and not df.empty:
+        # Remove a primeira linha se for header incorreto
+        first_col = df.columns[0]
+        if 'PDF:' in str(first_col) or df.iloc[0, 0] == 'PDF:':
+            df = df.iloc[1:].reset_index(drop=True)
+            if falhas is not None:
+                falhas.avancar(1)
+
+    # 🔧 CORREÇÃO: Linhas vazias ou problemáticas
+    mascaras = {'vazias': df.isna().all(axis=1).to_numpy()}
+
+    # 🔧 CORREÇÃO: Garante que todas as colunas de texto sejam tratadas como string
+    for col in df.columns:
+        if df[col].dtype == 'object' or pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].fillna('').astype(str).replace('nan', '')
+
+    # Normalização dos nomes ANTES da conversão numérica (senão as colunas
+    # em maiúsculas do relatório nunca eram convertidas)
+    df.columns = normalizar_colunas(df.columns)
+    df = df.rename(columns=COLUMN_MAPPING)
+
+    # ======= Conversão numérica vetorizada (uma passada por coluna) =========
+    problemas = {}
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            valores, invalidas = parse_numero_br(df[col], mascara=True)
+            if invalidas.any():
+                problemas[col] = int(invalidas.sum())
+                if falhas is not None:
+                    falhas.registrar(col, invalidas, df[col])
+            df[col] = valores
+
+    # ELIMINA LINHAS DE TOTAIS (não só em 'representante', mas em todas relevantes)
+    mascaras.update(classificar_linhas(df, regras))
+
+    # Linhas sem valor em alguma coluna numérica
+    presentes = [col for col in COLUNAS_NUMERICAS if col in df.columns]
+    if presentes:
+        mascaras['sem_valor'] = df[presentes].isna().any(axis=1).to_numpy()
+
+    if 'data' in df.columns:
+        if not pd.api.types.is_datetime64_any_dtype(df['data']):
+            datas = pd.to_datetime(df['data'], dayfirst=True, errors='coerce')
+            # Datas inválidas só contam como problema nas linhas que as outras regras mantêm
+            mantidas = ~np.logical_or.reduce(list(mascaras.values()))
+            invalidas = datas.isna().to_numpy() & preenchidas(df['data']).to_numpy() & mantidas
+            if invalidas.any():
+                problemas['data'] = int(invalidas.sum())
+                if falhas is not None:
+                    falhas.registrar('data', invalidas, df['data'])
+            df['data'] = datas
+        mascaras['sem_data'] = df['data'].isna().to_numpy()
+
+    if falhas is not None:
+        falhas.avancar(len(df))
+    descartar = np.zeros(len(df), dtype=bool)
+    descartadas = {}
+    for nome, mascara in mascaras.items():
+        novas = mascara & ~descartar
+        if novas.any():
+            descartadas[nome] = int(novas.sum())
+            descartar |= novas
+    if descartar.any():
+        df = df[~descartar]
+    return df, problemas, descartadas
+
+
+def inteiros(serie):
+    """
+    Coluna como inteiros (int32 quando cabe), aceitando "0011466", "39151.0" e 39151.0.
+    Retorna None se houver célula vazia ou algum valor que não seja um inteiro.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos = serie.cat.codes.to_numpy()
+        categorias = inteiros(pd.Series(serie.cat.categories))
+        if categorias is None or (codigos < 0).any():
+            return None
+        return categorias[codigos]
+    if pd.api.types.is_numeric_dtype(serie):
+        numeros = serie.to_numpy(dtype='float64', na_value=np.nan)
+    else:
+        # Conversão do Arrow (C, ~10x o to_numeric); texto que não é número aborta a conversão
+        try:
+            numeros = pc.cast(pc.utf8_trim_whitespace(pa.array(serie.astype(str))), pa.float64())
+        except pa.ArrowInvalid:
+            return None
+        numeros = numeros.to_numpy(zero_copy_only=False)
+    if np.isnan(numeros).any() or (numeros != np.round(numeros)).any():
+        return None
+    limites = np.iinfo(np.int32)
+    cabe = not len(numeros) or (numeros.min() >= limites.min and numeros.max() <= limites.max)
+    return numeros.astype(np.int32 if cabe else np.int64)
+
+
+def aplicar_esquema(df, medidas_float32=False):
+    """
+    Tipos finais do dataset limpo: dimensões de texto como categorias (uma cópia de cada
+    valor + códigos inteiros), NF inteira quando todas as NFs são números e medidas em
+    float32 se `medidas_float32`. Células de dimensão vazias continuam como a categoria ''
+    (os filtros da sidebar tratam '' como um valor selecionável).
+    """
+    for col in COLUNAS_CATEGORICAS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    if 'nf' in df.columns:
+        nf = inteiros(df['nf'])
+        if nf is not None:
+            df['nf'] = nf
+    if medidas_float32:
+        for col in NUMERIC_COLUMNS:
+            if col in df.columns and df[col].dtype == np.float64:
+                df[col] = df[col].astype(np.float32)
+    return df
+
+
+def finalizar_dataframe(df, medidas_float32=False):
+    """
+    Ajustes que dependem do arquivo inteiro (escala dos percentuais, colunas obrigatórias)
+    e o esquema final de tipos. Retorna (df, avisos).
+    """
+    avisos = []
+
+    # Margem em valor ausente no relatório: deriva de valor_net - custo_total
+    if 'margem_em_valor' not in df.columns and 'valor_net' in df.columns and 'custo_total' in df.columns:
+        df['margem_em_valor'] = margem_em_valor(df['valor_net'], df['custo_total'])
+
+    # Mapeia percentuais
+    if 'margem_em_porcentagem' in df.columns:
+        # Somente faz ajuste se for realmente float
+        try:
+            if (df['margem_em_porcentagem'].dropna().astype(float) < 2).all() and (df['valor_bruto'].mean() > 1000):
+                df['margem_em_porcentagem'] *= 100
+        except Exception as err:
+            avisos.append(f"Erro ao ajustar margem_em_porcentagem: {err}")
+    else:
+        if 'margem_em_valor' in df.columns and 'valor_bruto' in df.columns:
+            df['margem_em_porcentagem'] = (df['margem_em_valor'] / df['valor_bruto'] * 100).replace([np.inf, -np.inf], np.nan).fillna(0)
+        else:
+            df['margem_em_porcentagem'] = 0
+
+    required_cols = ['valor_bruto', 'custo_total', 'margem_em_valor', 'margem_em_porcentagem']
+    for col in required_cols:
+        if col not in df.columns:
+            df[col] = 0
+
+    return aplicar_esquema(df, medidas_float32), avisos
+
+
+def limpar_dataframe(df, medidas_float32=False, progresso=None, falhas=None):
+    """
+    Pipeline completo de limpeza do relatório de margem.
+    Retorna (df limpo, nº de células não convertidas por coluna, avisos, nº de linhas descartadas por regra).
+    """
+    informar(progresso, etapa='limpeza')
+    df, problemas, descartadas = limpar_bloco(df, falhas=falhas)
+    informar(progresso, etapa='tipos', linhas_limpas=len(df), linhas_descartadas=sum(descartadas.values()))
+    df, avisos = finalizar_dataframe(df, medidas_float32)
+    return df, problemas, avisos, descartadas
+
+
+def _concatenar(partes):
+    try:
+        return np.concatenate(partes)
+    except (TypeError, ValueError):
+        # dtypes incompatíveis entre blocos (ex.: int em um, texto em outro)
+        return pd.concat([pd.Series(p) for p in partes], ignore_index=True).to_numpy()
+
+
+class ColunasTipadas:
+    """
+    Acumula blocos já limpos em colunas tipadas: medidas em float64, datas em datetime64
+    e texto como códigos int32 sobre um dicionário único de categorias por coluna.
+    A memória cresce com o dado tipado, não com o texto bruto.
+    """
+
+    def __init__(self):
+        self._partes = {}
+        self._categorias = {}
+        self.linhas = 0
+
+    def adicionar(self, bloco):
+        for col in bloco.columns:
+            serie = bloco[col]
+            texto = serie.dtype == 'object' or pd.api.types.is_string_dtype(serie)
+            if col not in self._partes:
+                self._partes[col] = []
+                if texto:
+                    self._categorias[col] = pd.Index([], dtype=object)
+            if col in self._categorias:
+                self._partes[col].append(self._codificar(col, serie.astype(str)))
+            else:
+                self._partes[col].append(serie.to_numpy())
+        self.linhas += len(bloco)
+
+    def _codificar(self, col, serie):
+        # Fatora o bloco e traduz os códigos locais para o dicionário global da coluna
+        codigos, unicos = pd.factorize(serie)
+        unicos = np.asarray(unicos, dtype=object)
+        categorias = self._categorias[col]
+        posicoes = categorias.get_indexer(unicos)
+        novos = posicoes == -1
+        if novos.any():
+            posicoes[novos] = np.arange(len(categorias), len(categorias) + novos.sum())
+            self._categorias[col] = categorias.append(pd.Index(unicos[novos], dtype=object))
+        return posicoes.astype(np.int32)[codigos]
+
+    def montar(self):
+        """
+        Monta o DataFrame final liberando os pedaços coluna a coluna.
+        """
+        colunas = {}
+        for col in list(self._partes):
+            partes = self._partes.pop(col)
+            if col in self._categorias:
+                colunas[col] = pd.Categorical.from_codes(np.concatenate(partes), self._categorias.pop(col))
+            else:
+                colunas[col] = _concatenar(partes)
+            del partes
+        # copy=False evita a consolidação (e a cópia) dos blocos de mesmo dtype
+        return pd.DataFrame(colunas, copy=False)
+
+
+def ler_csv_em_blocos(conteudo, tamanho_bloco=TAMANHO_BLOCO, medidas_float32=False, progresso=None, falhas=None,
+                      **opcoes):
+    """
+    Ingestão em streaming do CSV: lê, limpa e converte bloco a bloco.
+    O pico de memória acompanha o tamanho do bloco, não o do arquivo.
+    Retorna (df limpo, nº de células não convertidas por coluna, avisos, nº de linhas descartadas por regra).
+    """
+    colunas = ColunasTipadas()
+    problemas = {}
+    descartadas = {}
+    informar(progresso, etapa='leitura')
+    leitor = pd.read_csv(_fonte_csv(conteudo, progresso), chunksize=tamanho_bloco, **opcoes_csv(conteudo, **opcoes))
+    for i, bloco in enumerate(leitor):
+        bloco, problemas_bloco, descartadas_bloco = limpar_bloco(bloco, primeiro=(i == 0), falhas=falhas)
+        problemas = somar_contagens([problemas, problemas_bloco])
+        descartadas = somar_contagens([descartadas, descartadas_bloco])
+        colunas.adicionar(bloco)
+        informar(progresso, linhas_limpas=colunas.linhas, linhas_descartadas=sum(descartadas.values()))
+    informar(progresso, etapa='tipos')
+    df, avisos = finalizar_dataframe(colunas.montar(), medidas_float32)
+    return df, problemas, avisos, descartadas
+
+
+def carregar_dataset(conteudo, nome_arquivo, cache=None, armazem=None, streaming=None,
+                     tamanho_bloco=TAMANHO_BLOCO, medidas_float32=None, progresso=None, **opcoes):
+    """
+    Ponto único de ingestão: lê e limpa o arquivo uma vez por conteúdo+opções.
+    Com `cache`, reruns do Streamlit devolvem o DataFrame já limpo; com `armazem`,
+    um arquivo já visto é reaberto do disco em vez de ser reprocessado.
+    CSVs maiores que `LIMITE_STREAMING` (ou com `streaming=True`) são lidos em blocos;
+    xlsx passam por ler_xlsx (`aba=` escolhe a aba) e, salvos no armazém, não são relidos.
+    `medidas_float32` (padrão: DASHBOARD_MEDIDAS_FLOAT32=1) guarda as medidas em float32.
+    `progresso` (pipeline.segundo_plano.Progresso) recebe etapa, bytes lidos e linhas
+    limpas/descartadas, para a página acompanhar uma ingestão em segundo plano.
+    O relatório de qualidade (células não convertidas, margens negativas e divergências
+    entre as medidas) é montado na mesma ingestão e vai junto com o Dataset.
+    O Dataset devolvido é compartilhado entre as sessões via `cache`: não deve ser alterado.
+    """
+    if streaming is None:
+        streaming = len(conteudo) > LIMITE_STREAMING
+    streaming = streaming and extensao(nome_arquivo) == 'csv'
+    if medidas_float32 is None:
+        medidas_float32 = MEDIDAS_FLOAT32
+    chave = chave_dataset(conteudo, nome_arquivo, medidas_float32, **opcoes)
+
+    def _processar():
+        if armazem is not None and armazem.existe(chave):
+            informar(progresso, etapa='armazem')
+            return armazem.carregar(chave)
+        falhas = ColetorFalhas()
+        if streaming:
+            df, problemas, avisos, descartadas = ler_csv_em_blocos(
+                conteudo, tamanho_bloco=tamanho_bloco, medidas_float32=medidas_float32, progresso=progresso,
+                falhas=falhas, **opcoes
+            )
+        else:
+            bruto = ler_arquivo(conteudo, nome_arquivo, progresso=progresso, **opcoes)
+            df, problemas, avisos, descartadas = limpar_dataframe(bruto, medidas_float32, progresso=progresso, falhas=falhas)
+            del bruto
+        dataset = Dataset(
+            chave=chave, nome=nome_arquivo, df=df, problemas=problemas, avisos=avisos, descartadas=descartadas,
+            qualidade=avaliar_qualidade(df, falhas.concluir(), falhas.exemplos),
+        )
+        if armazem is not None:
+            informar(progresso, etapa='armazem')
+            armazem.salvar(dataset)
+        return dataset
+
+    if cache is None:
+        return _processar()
+    return cache.obter_ou_calcular(chave, _processar)
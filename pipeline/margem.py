@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+
+def calcular_margem_percentual(valor_net, custo_total):
+    """
+    Calcula margem percentual usando a fórmula: (1 - Custo Total/Valor NET) * 100
+    Versão escalar, mantida como referência da versão vetorizada.
+    """
+    if valor_net == 0 or pd.isna(valor_net) or pd.isna(custo_total) or custo_total == 0:
+        return 0
+
+    # ✅ FÓRMULA EXATA: 1 - (Custo Total / Valor NET Total)
+    margem = (1 - (custo_total / valor_net)) * 100
+    return margem  # Sem limitação artificial de min/max
+
+
+def margem_percentual(valor_net, custo_total):
+    """
+    (1 - custo_total/valor_net) * 100 sobre arrays inteiros, com as mesmas regras da
+    versão escalar: valor_net zero/NaN ou custo_total zero/NaN dão margem 0.
+    """
+    valor_net = np.asarray(valor_net, dtype='float64')
+    custo_total = np.asarray(custo_total, dtype='float64')
+    invalida = (valor_net == 0) | np.isnan(valor_net) | np.isnan(custo_total) | (custo_total == 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margem = (1 - (custo_total / valor_net)) * 100
+    return np.where(invalida, 0.0, margem)
+
+
+def margem_em_valor(valor_net, custo_total):
+    """
+    Margem em valor (R$): valor_net - custo_total.
+    """
+    return np.asarray(valor_net, dtype='float64') - np.asarray(custo_total, dtype='float64')
+
+
+def margem_media(total_valor_net, total_custo_total):
+    """
+    KPI "Margem Média (%)": (valor_net - custo_total) / valor_net * 100, ou 0 sem valor_net positivo.
+    """
+    if total_valor_net > 0:
+        return (total_valor_net - total_custo_total) / total_valor_net * 100
+    return 0
+
+
+def adicionar_margem_percentual(df):
+    """
+    Acrescenta 'margem_em_porcentagem' a um agregado com valor_net e custo_total.
+    """
+    df['margem_em_porcentagem'] = margem_percentual(df['valor_net'].to_numpy(), df['custo_total'].to_numpy())
+    return df
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+# Bytes aceitos em números no formato BR ("6.273,60", "-5.920,70", "82%")
+_VIRGULA, _PONTO, _MENOS, _MAIS = ord(','), ord('.'), ord('-'), ord('+')
+_PORCENTO, _ESPACO, _VAZIO = ord('%'), ord(' '), 0
+
+_POTENCIAS_10 = 10.0 ** np.arange(23)
+
+
+def _matriz_bytes(serie):
+    """
+    Matriz (caracteres x linhas) uint8 com o texto das células; fora do latin1 vira 255.
+    """
+    texto = np.asarray(serie.fillna('').astype(str).to_numpy(dtype=object), dtype='U')
+    largura = texto.dtype.itemsize // 4
+    codigos = texto.view(np.uint32).reshape(len(texto), largura)
+    return texto, np.ascontiguousarray(np.minimum(codigos, 255).astype(np.uint8).T)
+
+
+def parse_numero_br(valores, mascara=False):
+    """
+    Converte uma coluna inteira de números BR para float64 em uma passada vetorizada.
+    '.' é separador de milhar, ',' é decimal; '%' e espaços são ignorados.
+    Retorna (array float64, quantidade de células preenchidas que não são números);
+    com `mascara=True`, a máscara dessas células no lugar da quantidade.
+    """
+    serie = pd.Series(valores, copy=False)
+    if pd.api.types.is_numeric_dtype(serie):
+        numeros = serie.to_numpy(dtype='float64', na_value=np.nan)
+        return numeros, np.zeros(len(numeros), dtype=bool) if mascara else 0
+
+    n = len(serie)
+    texto, m = _matriz_bytes(serie)
+
+    # Acumula os dígitos como inteiro (exato até 2**53) e conta as casas após a vírgula
+    acumulado = np.zeros(n)
+    digitos = np.zeros(n, dtype=np.int16)
+    casas = np.zeros(n, dtype=np.int16)
+    virgulas = np.zeros(n, dtype=np.int16)
+    sinais = np.zeros(n, dtype=np.int16)
+    negativo = np.zeros(n, dtype=bool)
+    invalido = np.zeros(n, dtype=bool)
+    preenchida = np.zeros(n, dtype=bool)
+    for c in m:
+        d = c - np.uint8(ord('0'))
+        e_digito = d <= 9
+        acumulado = np.where(e_digito, acumulado * 10 + d, acumulado)
+        digitos += e_digito
+        casas += e_digito & (virgulas > 0)
+        e_virgula = c == _VIRGULA
+        virgulas += e_virgula
+        e_sinal = (c == _MENOS) | (c == _MAIS)
+        # Sinal só é aceito antes do primeiro dígito
+        invalido |= e_sinal & ((digitos > 0) | (virgulas > 0))
+        sinais += e_sinal
+        negativo |= c == _MENOS
+        ignorado = (c == _PONTO) | (c == _PORCENTO) | (c == _ESPACO) | (c == _VAZIO)
+        invalido |= ~(e_digito | e_virgula | e_sinal | ignorado)
+        preenchida |= ~ignorado
+
+    valido = ~invalido & (virgulas <= 1) & (sinais <= 1) & (digitos > 0) & (digitos < len(_POTENCIAS_10))
+    resultado = acumulado / _POTENCIAS_10[np.minimum(casas, len(_POTENCIAS_10) - 1)]
+    resultado = np.where(negativo, -resultado, resultado)
+    resultado[~valido] = np.nan
+
+    preenchida &= texto != 'nan'
+    invalidas = preenchida & ~valido
+    return resultado, invalidas if mascara else int(invalidas.sum())
@@ -0,0 +1,135 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from .formatacao import formatar_colunas
+
+TAMANHOS_PAGINA = [50, 100, 250, 500, 1000]
+# Colunas de texto em que a busca da tabela procura (além do número da NF)
+COLUNAS_BUSCA = ['tp_mov', 'cliente', 'segmentacao', 'representante', 'cod_produto', 'descricao']
+
+
+def mascara_busca(df, texto, colunas=COLUNAS_BUSCA, linhas=None):
+    """
+    Linhas em que `texto` aparece (sem diferenciar maiúsculas) em alguma coluna de busca.
+    Em colunas categóricas a busca roda só nas categorias e volta para as linhas pelos códigos.
+    Um texto só de dígitos também casa com o número da NF.
+    Com `linhas` (posições em `df`), a máscara cobre só essas linhas, na mesma ordem.
+    """
+    texto = texto.strip()
+    mascara = np.zeros(len(df) if linhas is None else len(linhas), dtype=bool)
+    for col in colunas:
+        if col not in df.columns:
+            continue
+        serie = df[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            achou = serie.cat.categories.astype(str).str.contains(texto, case=False, regex=False)
+            tabela = np.append(np.asarray(achou, dtype=bool), False)  # código -1 (ausente) não casa
+            codigos = serie.cat.codes.to_numpy()
+            mascara |= tabela[codigos if linhas is None else codigos[linhas]]
+        else:
+            if linhas is not None:
+                serie = serie.take(linhas)
+            mascara |= serie.astype(str).str.contains(texto, case=False, regex=False, na=False).to_numpy()
+    if texto.isdigit() and 'nf' in df.columns:
+        nf = df['nf'] if linhas is None else df['nf'].take(linhas)
+        mascara |= (nf == int(texto)).to_numpy()
+    return mascara
+
+
+def posicoes_ordenadas(df, coluna=None, crescente=True, linhas=None):
+    """
+    Posições das linhas de `df` ordenadas por `coluna` (ordenação estável, vazios no fim).
+    Categorias são ordenadas alfabeticamente, não pela ordem do dicionário.
+    Com `linhas`, ordena só essas posições (sem copiar o resto do DataFrame).
+    """
+    base = np.arange(len(df)) if linhas is None else np.asarray(linhas)
+    if coluna is None or coluna not in df.columns:
+        return base
+    serie = (df[coluna] if linhas is None else df[coluna].take(base)).reset_index(drop=True)
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.cat.reorder_categories(serie.cat.categories.sort_values())
+    return base[serie.sort_values(ascending=crescente, kind='stable', na_position='last').index.to_numpy()]
+
+
+def posicoes_tabela(df, busca="", coluna=None, crescente=True, linhas=None):
+    """
+    Posições (em `df`) das linhas que passam na busca, na ordem pedida. Com `linhas`, só
+    essas posições entram (a seleção dos filtros sobre o DataFrame compartilhado).
+    """
+    posicoes = posicoes_ordenadas(df, coluna, crescente, linhas)
+    if busca and busca.strip():
+        posicoes = posicoes[mascara_busca(df, busca, linhas=posicoes)]
+    return posicoes
+
+
+def total_paginas(linhas, tamanho):
+    return max(1, math.ceil(linhas / tamanho))
+
+
+def fatiar_pagina(df, posicoes, pagina, tamanho):
+    """
+    Linhas da página `pagina` (começando em 1) de `tamanho` linhas.
+    """
+    inicio = (pagina - 1) * tamanho
+    return df.iloc[posicoes[inicio:inicio + tamanho]]
+
+
+# Nomes amigáveis das colunas na tabela "Dados Filtrados"
+NOMES_COLUNAS_TABELA = {
+    'tp_mov': 'TP Mov',
+    'nf': 'NF',
+    'data': 'Data da Venda',
+    'cliente': 'Cliente',
+    'segmentacao': 'Segmentação',
+    'representante': 'Representante',
+    'cod_produto': 'Cód. Produto',
+    'descricao': 'Descrição do Produto',
+    'valor_bruto': 'Faturamento Bruto',
+    'valor_net': 'Valor Net',
+    'qtd': 'Quantidade',
+    'custo_unitario': 'Custo Unitário',
+    'custo_total': 'Custo Total',
+    'margem_em_valor': 'Margem em Valor',
+    'margem_em_porcentagem': 'Margem (%)'
+}
+
+
+def montar_tabela(df):
+    """
+    DataFrame da tabela "Dados Filtrados": nomes amigáveis e valores já formatados em pt-BR.
+    """
+    df_display = df.copy()
+    # Renomeia apenas colunas existentes no DataFrame
+    df_display = df_display.rename(columns={k: v for k, v in NOMES_COLUNAS_TABELA.items() if k in df_display.columns})
+
+    # Alinha Quantidade para inteiro à direita
+    if 'Quantidade' in df_display.columns:
+        df_display['Quantidade'] = (
+            df_display['Quantidade']
+            .fillna(0)
+            .astype(float)
+            .round(0)
+            .astype(int)
+        )
+
+    # Moeda/porcentagem viram texto pt-BR numa passada por coluna (sem formatador por célula)
+    df_display = formatar_colunas(
+        df_display,
+        moeda=['Faturamento Bruto', 'Valor Net', 'Custo Total', 'Custo Unitário', 'Margem em Valor'],
+        porcentagem=['Margem (%)']
+    )
+
+    # Ajustes NF e Data
+    if 'NF' in df_display.columns:
+        try:
+            df_display['NF'] = df_display['NF'].astype(float).astype(pd.Int64Dtype()).astype(str)
+        except (TypeError, ValueError):
+            pass
+    if 'Data da Venda' in df_display.columns:
+        try:
+            df_display['Data da Venda'] = pd.to_datetime(df_display['Data da Venda'], errors='coerce').dt.strftime('%d/%m/%Y')
+        except (TypeError, ValueError):
+            pass
+    return df_display
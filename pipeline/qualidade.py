@@ -0,0 +1,161 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+# Verificações de consistência sobre o dataset limpo
+VERIFICACOES = {
+    'margem_negativa': "Margem em valor negativa",
+    'custo_divergente': "Custo total diferente de quantidade × custo unitário",
+    'margem_divergente': "Margem em valor diferente de valor NET − custo total",
+}
+
+# Custo unitário vem arredondado em centavos: qtd × custo_unitario pode se afastar do custo
+# total em até meio centavo por unidade (mais um centavo do arredondamento do próprio total)
+TOLERANCIA_CENTAVOS = 0.01
+TOLERANCIA_POR_UNIDADE = 0.005
+# Margem: um centavo e meio, mais a precisão das medidas em float32 (~7 dígitos)
+TOLERANCIA_MARGEM = 0.015
+TOLERANCIA_RELATIVA = 1e-6
+
+# Textos não convertidos guardados por coluna, para exemplo (as linhas são guardadas todas)
+AMOSTRA_EXEMPLOS = 100
+
+
+def compactar(posicoes):
+    """
+    Posições de linha como uint32 (4 bytes por linha; int64 só acima de 4 bilhões).
+    """
+    posicoes = np.asarray(posicoes)
+    if not len(posicoes) or posicoes.max() <= np.iinfo(np.uint32).max:
+        return posicoes.astype(np.uint32)
+    return posicoes.astype(np.int64)
+
+
+class ColetorFalhas:
+    """
+    Células que a limpeza não conseguiu converter (números e datas), bloco a bloco.
+    As linhas são contadas como linhas de dados do arquivo (a primeira abaixo do cabeçalho
+    é a 1) e valem mesmo para as linhas que a limpeza depois descarta.
+    """
+
+    def __init__(self, amostra=AMOSTRA_EXEMPLOS):
+        self.amostra = amostra
+        self.linhas_lidas = 0
+        self.exemplos = {}
+        self._partes = {}
+
+    def registrar(self, coluna, mascara, textos):
+        """
+        `mascara` marca as células do bloco atual não convertidas; `textos`, o conteúdo original.
+        """
+        posicoes = np.flatnonzero(mascara)
+        if not len(posicoes):
+            return
+        self._partes.setdefault(coluna, []).append(compactar(posicoes + self.linhas_lidas + 1))
+        exemplos = self.exemplos.setdefault(coluna, [])
+        faltam = self.amostra - len(exemplos)
+        if faltam > 0:
+            amostra = posicoes[:faltam]
+            exemplos.extend(zip((amostra + self.linhas_lidas + 1).tolist(), map(str, np.asarray(textos)[amostra])))
+
+    def avancar(self, linhas):
+        self.linhas_lidas += linhas
+
+    def concluir(self):
+        return {coluna: compactar(np.concatenate(partes)) for coluna, partes in self._partes.items()}
+
+
+@dataclass
+class Qualidade:
+    """
+    Relatório de qualidade de um dataset: posições das linhas que caem em cada verificação
+    (no DataFrame limpo) e das células não convertidas (nas linhas de dados do arquivo),
+    com alguns textos originais de exemplo.
+    """
+    linhas: int
+    inconsistencias: dict = field(default_factory=dict)
+    falhas: dict = field(default_factory=dict)
+    exemplos: dict = field(default_factory=dict)
+
+    def memoria_bytes(self):
+        return sum(p.nbytes for p in [*self.inconsistencias.values(), *self.falhas.values()])
+
+    def vazio(self):
+        return not any(len(p) for p in [*self.inconsistencias.values(), *self.falhas.values()])
+
+    def resumo(self):
+        """
+        Uma linha por verificação com ocorrência: nome, quantidade e % das linhas.
+        """
+        itens = [(VERIFICACOES.get(nome, nome), 'inconsistencia', nome, len(posicoes))
+                 for nome, posicoes in self.inconsistencias.items() if len(posicoes)]
+        itens += [(_rotulo_falha(coluna), 'falha', coluna, len(posicoes))
+                  for coluna, posicoes in self.falhas.items() if len(posicoes)]
+        resumo = pd.DataFrame(itens, columns=['verificacao', 'tipo', 'nome', 'linhas'])
+        resumo['percentual'] = resumo['linhas'] / max(self.linhas, 1) * 100
+        return resumo
+
+
+def _rotulo_falha(nome):
+    # "coluna (arquivo)" nos datasets derivados: ver juntar_falhas
+    coluna, _, arquivo = nome.partition(' (')
+    return f"Célula não convertida em '{coluna}'" + (f" ({arquivo}" if arquivo else "")
+
+
+def _coluna(df, *nomes):
+    for nome in nomes:
+        if nome in df.columns:
+            return df[nome].to_numpy(dtype='float64', na_value=np.nan)
+    return None
+
+
+def verificar_consistencia(df):
+    """
+    Máscaras das verificações de consistência, numa passada vetorizada pelas medidas
+    (verificação sem as colunas necessárias fica de fora). NaN nunca conta como divergência.
+    """
+    mascaras = {}
+    margem = _coluna(df, 'margem_em_valor')
+    valor_net = _coluna(df, 'valor_net')
+    custo_total = _coluna(df, 'custo_total')
+    qtd = _coluna(df, 'qtd', 'quantidade')
+    custo_unitario = _coluna(df, 'custo_unitario')
+    with np.errstate(invalid='ignore'):
+        if margem is not None:
+            mascaras['margem_negativa'] = margem < 0
+        if custo_total is not None and qtd is not None and custo_unitario is not None:
+            tolerancia = TOLERANCIA_POR_UNIDADE * np.abs(qtd) + TOLERANCIA_CENTAVOS
+            mascaras['custo_divergente'] = np.abs(custo_total - qtd * custo_unitario) > tolerancia
+        if margem is not None and valor_net is not None and custo_total is not None:
+            tolerancia = TOLERANCIA_MARGEM + TOLERANCIA_RELATIVA * np.abs(valor_net)
+            mascaras['margem_divergente'] = np.abs(margem - (valor_net - custo_total)) > tolerancia
+    return mascaras
+
+
+def avaliar_qualidade(df, falhas=None, exemplos=None):
+    """
+    Qualidade do dataset limpo `df`, com as células não convertidas coletadas na limpeza.
+    """
+    return Qualidade(
+        linhas=len(df),
+        inconsistencias={nome: compactar(np.flatnonzero(m)) for nome, m in verificar_consistencia(df).items()},
+        falhas=falhas or {},
+        exemplos=exemplos or {},
+    )
+
+
+def juntar_falhas(datasets):
+    """
+    Falhas de conversão de vários arquivos num dataset derivado (consolidação, extrato),
+    identificadas por "coluna (arquivo)": as linhas continuam sendo as de cada arquivo.
+    """
+    falhas, exemplos = {}, {}
+    for dataset in datasets:
+        if dataset.qualidade is None:
+            continue
+        for coluna, posicoes in dataset.qualidade.falhas.items():
+            nome = coluna if '(' in coluna else f"{coluna} ({dataset.nome})"
+            falhas[nome] = posicoes
+            exemplos[nome] = dataset.qualidade.exemplos.get(coluna, [])
+    return falhas, exemplos
@@ -0,0 +1,186 @@
+import threading
+import time
+from dataclasses import dataclass, field
+
+from .cache import CalculosEmAndamento, estimar_bytes
+
+# Dataset sem nenhuma sessão é despejado depois deste tempo ocioso
+OCIOSO_SEGUNDOS = 15 * 60
+# Sessão que não aparece há este tempo (aba fechada, navegador encerrado) solta o dataset
+SESSAO_SEGUNDOS = 30 * 60
+# Memória máxima dos datasets ociosos (os que estão em uso nunca são despejados)
+MAX_BYTES_OCIOSOS = 1024 ** 3
+# Dataset registrado ou pedido fica este tempo à espera do `usar` da sessão, fora do limite
+# de bytes: um dataset maior que o limite não pode sair entre o guardar/obter e o usar
+RESERVA_SEGUNDOS = 2 * 60
+
+
+@dataclass
+class _Entrada:
+    dataset: object
+    bytes: int
+    sessoes: set = field(default_factory=set)
+    ocioso_desde: float | None = None
+    reservado_em: float | None = None
+
+
+class RegistroDatasets:
+    """
+    Registro do processo com os datasets abertos, um por chave de conteúdo, lidos por
+    todas as sessões do servidor (nenhuma sessão guarda uma cópia própria do DataFrame).
+
+    - `usar(sessao, chave)` conta a sessão como referência do dataset (uma sessão usa um
+      dataset por vez: trocar de arquivo solta o anterior);
+    - dataset sem referências fica ocioso e é despejado depois de `ocioso_segundos`, ou
+      antes, do mais antigo para o mais novo, se os ociosos passarem de `max_bytes_ociosos`
+      (o recém-registrado ou recém-pedido fica fora desse limite por `reserva_segundos`, à
+      espera do `usar`);
+    - sessões sem uso há `sessao_segundos` são dadas como encerradas.
+
+    Implementa obter/guardar/obter_ou_calcular como o CacheLRU, então pode ser passado como
+    `cache` para carregar_dataset e consolidar_datasets. Seguro entre threads.
+    """
+
+    def __init__(self, ocioso_segundos=OCIOSO_SEGUNDOS, sessao_segundos=SESSAO_SEGUNDOS,
+                 max_bytes_ociosos=MAX_BYTES_OCIOSOS, reserva_segundos=RESERVA_SEGUNDOS, ao_despejar=None,
+                 relogio=time.monotonic):
+        self.ocioso_segundos = ocioso_segundos
+        self.sessao_segundos = sessao_segundos
+        self.max_bytes_ociosos = max_bytes_ociosos
+        self.reserva_segundos = reserva_segundos
+        self._ao_despejar = ao_despejar
+        self._relogio = relogio
+        self._entradas = {}
+        self._sessoes = {}  # sessão -> (chave em uso, visto por último em)
+        self._lock = threading.RLock()
+        self._calculos = CalculosEmAndamento()
+
+    def __contains__(self, chave):
+        with self._lock:
+            return chave in self._entradas
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entradas)
+
+    def obter(self, chave, padrao=None):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return padrao
+            self._reservar(entrada)
+            return entrada.dataset
+
+    def guardar(self, chave, dataset):
+        """
+        Registra o dataset e devolve o registrado: se outra sessão registrou a mesma chave
+        nesse meio-tempo (mesmo conteúdo), fica o primeiro e esta cópia é descartada.
+        """
+        tamanho = estimar_bytes(dataset)
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                entrada = self._entradas[chave] = _Entrada(dataset, tamanho, ocioso_desde=self._relogio())
+            self._reservar(entrada)
+            self.expirar()
+            return entrada.dataset
+
+    def obter_ou_calcular(self, chave, calcular):
+        """
+        Devolve o dataset registrado ou calcula, registra e devolve (um único cálculo por
+        chave, mesmo com várias sessões pedindo ao mesmo tempo).
+        """
+        dataset = self.obter(chave)
+        if dataset is not None:
+            return dataset
+
+        def _calcular():
+            dataset = self.obter(chave)
+            return self.guardar(chave, calcular()) if dataset is None else dataset
+
+        return self._calculos.calcular(chave, _calcular)
+
+    def usar(self, sessao, chave):
+        """
+        Marca `sessao` como usuária do dataset `chave` (já registrado) e o devolve.
+        """
+        with self._lock:
+            agora = self._relogio()
+            anterior = self._sessoes.get(sessao, (None, None))[0]
+            if anterior != chave:
+                self._soltar(sessao, anterior, agora)
+            entrada = self._entradas[chave]
+            entrada.sessoes.add(sessao)
+            entrada.ocioso_desde = None
+            entrada.reservado_em = None
+            self._sessoes[sessao] = (chave, agora)
+            self.expirar()
+            return entrada.dataset
+
+    def liberar(self, sessao):
+        """
+        A sessão deixou de usar dataset (ex.: removeu o arquivo enviado).
+        """
+        with self._lock:
+            chave, _ = self._sessoes.pop(sessao, (None, None))
+            self._soltar(sessao, chave, self._relogio())
+            self.expirar()
+
+    def referencias(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            return 0 if entrada is None else len(entrada.sessoes)
+
+    def _reservar(self, entrada):
+        if not entrada.sessoes:
+            entrada.reservado_em = self._relogio()
+
+    def _soltar(self, sessao, chave, agora):
+        entrada = self._entradas.get(chave)
+        if entrada is not None:
+            entrada.sessoes.discard(sessao)
+            if not entrada.sessoes and entrada.ocioso_desde is None:
+                entrada.ocioso_desde = agora
+
+    def expirar(self):
+        """
+        Solta as sessões sumidas e despeja os datasets ociosos vencidos ou acima do limite.
+        Retorna as chaves despejadas.
+        """
+        with self._lock:
+            agora = self._relogio()
+            for sessao, (chave, visto_em) in list(self._sessoes.items()):
+                if agora - visto_em > self.sessao_segundos:
+                    del self._sessoes[sessao]
+                    self._soltar(sessao, chave, agora)
+
+            ociosas = sorted(
+                (entrada.ocioso_desde, chave) for chave, entrada in self._entradas.items() if not entrada.sessoes
+            )
+            bytes_ociosos = sum(self._entradas[chave].bytes for _, chave in ociosas)
+            despejadas = []
+            for desde, chave in ociosas:
+                vencida = agora - desde > self.ocioso_segundos
+                if not vencida and bytes_ociosos <= self.max_bytes_ociosos:
+                    break
+                reservado_em = self._entradas[chave].reservado_em
+                if not vencida and reservado_em is not None and agora - reservado_em <= self.reserva_segundos:
+                    continue
+                bytes_ociosos -= self._entradas.pop(chave).bytes
+                despejadas.append(chave)
+        for chave in despejadas:
+            if self._ao_despejar is not None:
+                self._ao_despejar(chave)
+        return despejadas
+
+    def resumo(self):
+        """
+        Datasets registrados, quantos estão em uso, sessões ativas e memória total.
+        """
+        with self._lock:
+            return {
+                'datasets': len(self._entradas),
+                'em_uso': sum(1 for entrada in self._entradas.values() if entrada.sessoes),
+                'sessoes': len(self._sessoes),
+                'bytes': sum(entrada.bytes for entrada in self._entradas.values()),
+            }
@@ -0,0 +1,256 @@
+"""
+Relatórios de fechamento por representante, sem navegador.
+
+Lê todos os relatórios de margem (CSV/XLSX) de um diretório, consolida, e grava para
+cada representante as Métricas Chave e os quatro gráficos de margem do dashboard em
+HTML, PNG e/ou XLSX, além de um resumo com os KPIs de todos. O dataset é lido uma vez
+e publicado em memória compartilhada; um pool de processos gera os representantes.
+
+PNG é opcional e depende do pacote 'kaleido' (pip install kaleido), que não faz parte do
+requirements.txt porque o app não precisa dele. Sem kaleido, o PNG é ignorado com aviso
+quando pedido junto de outros formatos e o comando termina com erro quando era o único.
+
+Uso: python -m pipeline.relatorios DIRETORIO [--destino DIR] [--formatos html,png,xlsx]
+                                   [--representantes NOME ...] [--max-workers N]
+                                   [--produtos N] [--detalhe]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import html
+import importlib.util
+import multiprocessing
+import os
+import re
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+
+import pandas as pd
+
+from .analise import GRAFICOS, Analise, analisar
+from .compartilhado import DataFrameCompartilhado, anexar
+from .consolidacao import consolidar_datasets
+from .formatacao import formatar_moeda_br, formatar_porcentagem_br
+from .graficos import FIGURAS
+from .ingestao import Dataset, carregar_dataset, extensao
+
+FORMATOS = ('html', 'png', 'xlsx')
+EXTENSOES = ('csv', 'xlsx')
+ABAS_XLSX = {'representante': 'Representante', 'cliente': 'Clientes', 'mes_ano': 'Mensal', 'descricao': 'Produtos'}
+ROTULOS_KPIS = {
+    'valor_bruto': 'Faturamento Bruto',
+    'custo_total': 'Custo Total',
+    'valor_net': 'Valor NET Total',
+    'margem_em_valor': 'Margem em Valor',
+    'margem_media': 'Margem Média (%)',
+}
+
+# Dataset anexado da memória compartilhada (um por processo do pool)
+_df = None
+_blocos = None
+
+
+def nome_seguro(texto):
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^A-Za-z0-9]+', '_', texto).strip('_') or 'sem_nome'
+
+
+def nomes_arquivo(nomes):
+    """
+    Nome de arquivo único por representante. Nomes que colidem depois do nome_seguro
+    (pontuação, acentos, maiúsculas) ou com o resumo ganham um sufixo com o hash do nome
+    original, estável entre execuções.
+    """
+    grupos = {}
+    for nome in nomes:
+        grupos.setdefault(nome_seguro(nome).lower(), []).append(nome)
+    arquivos = {}
+    for chave, grupo in grupos.items():
+        for nome in grupo:
+            base = nome_seguro(nome)
+            if len(grupo) > 1 or chave == 'resumo':
+                base = f"{base}_{hashlib.sha1(str(nome).encode()).hexdigest()[:6]}"
+            arquivos[nome] = base
+    return arquivos
+
+
+def _inicializar_worker(colunas):
+    global _df, _blocos
+    _df, _blocos = anexar(colunas)
+
+
+def kpis_texto(kpis):
+    valores = formatar_moeda_br([kpis.valor_bruto, kpis.custo_total, kpis.valor_net, kpis.margem_em_valor])
+    return dict(zip(list(ROTULOS_KPIS.values()), [*valores, formatar_porcentagem_br([kpis.margem_media])[0]]))
+
+
+def escrever_html(caminho, analise, figuras):
+    cartoes = "".join(
+        f"<div class='kpi'><span>{html.escape(valor)}</span><small>{html.escape(rotulo)}</small></div>"
+        for rotulo, valor in kpis_texto(analise.kpis).items()
+    )
+    graficos = "".join(
+        fig.to_html(full_html=False, include_plotlyjs='cdn' if i == 0 else False)
+        for i, fig in enumerate(figuras.values())
+    )
+    linhas = f"{analise.linhas:,}".replace(",", ".")
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(f"""<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>{html.escape(analise.nome)}</title>
+<style>
+body {{ background:#22232B; color:#E0E0E0; font-family:'Segoe UI',sans-serif; margin:24px; }}
+h1 {{ color:#ADD8E6; }}
+.kpis {{ display:flex; flex-wrap:wrap; gap:16px; margin-bottom:24px; }}
+.kpi {{ background:#2E2F38; border-radius:12px; padding:16px 24px; min-width:220px; }}
+.kpi span {{ display:block; font-size:1.8em; font-weight:900; color:#FFF; }}
+.kpi small {{ color:#99D0FA; font-weight:700; font-size:1.05em; }}
+</style></head><body>
+<h1>{html.escape(analise.nome)}</h1>
+<p>{linhas} linhas de NF</p>
+<div class="kpis">{cartoes}</div>
+{graficos}
+</body></html>
+""")
+
+
+def escrever_xlsx(caminho, analise, linhas=None):
+    with pd.ExcelWriter(caminho, engine='openpyxl') as escritor:
+        pd.DataFrame(
+            [(ROTULOS_KPIS[campo], valor) for campo, valor in asdict(analise.kpis).items()],
+            columns=['Métrica', 'Valor']
+        ).to_excel(escritor, sheet_name='Métricas Chave', index=False)
+        for dimensao, agregado in analise.agregados.items():
+            colunas = [c for c in agregado.columns if not c.endswith('_fmt')]
+            agregado[colunas].to_excel(escritor, sheet_name=ABAS_XLSX.get(dimensao, dimensao)[:31], index=False)
+        if linhas is not None:
+            linhas.head(1_048_575).to_excel(escritor, sheet_name='Linhas', index=False)
+
+
+def escrever_relatorio(analise: Analise, destino: str, formatos, num_products=10, linhas=None,
+                       nome_arquivo=None) -> list[str]:
+    """
+    Grava os arquivos de um representante e devolve os caminhos gerados.
+    """
+    base = os.path.join(destino, nome_arquivo or nome_seguro(analise.nome))
+    figuras = {}
+    if 'html' in formatos or 'png' in formatos:
+        for dimensao, agregado in analise.agregados.items():
+            construtor = FIGURAS[dimensao]
+            figuras[dimensao] = construtor(agregado, num_products) if dimensao == 'descricao' else construtor(agregado)
+    gerados = []
+    if 'html' in formatos:
+        escrever_html(base + '.html', analise, figuras)
+        gerados.append(base + '.html')
+    if 'png' in formatos:
+        for dimensao, fig in figuras.items():
+            caminho = f"{base}_{ABAS_XLSX.get(dimensao, dimensao).lower()}.png"
+            fig.write_image(caminho)
+            gerados.append(caminho)
+    if 'xlsx' in formatos:
+        escrever_xlsx(base + '.xlsx', analise, linhas)
+        gerados.append(base + '.xlsx')
+    return gerados
+
+
+def gerar_representante(representante, destino, formatos, num_products=10, detalhe=False, nome_arquivo=None):
+    """
+    Tarefa do pool: recorta o dataset compartilhado e gera os relatórios de um representante.
+    """
+    nome_arquivo = nome_arquivo or nome_seguro(representante)
+    df = _df[(_df['representante'] == representante).to_numpy()].reset_index(drop=True)
+    graficos = {**GRAFICOS, 'descricao': num_products}
+    analise = analisar(Dataset(chave=nome_arquivo, nome=str(representante), df=df), graficos=graficos)
+    arquivos = escrever_relatorio(analise, destino, formatos, num_products, linhas=df if detalhe else None,
+                                  nome_arquivo=nome_arquivo)
+    return {'representante': representante, 'linhas': analise.linhas, **asdict(analise.kpis), 'arquivos': arquivos}
+
+
+def ler_diretorio(diretorio, max_workers=None):
+    """
+    Consolida todos os CSV/XLSX do diretório (ordem alfabética define a prioridade nas sobreposições).
+    """
+    nomes = sorted(n for n in os.listdir(diretorio) if extensao(n) in EXTENSOES)
+    if not nomes:
+        raise ValueError(f"Nenhum arquivo CSV/XLSX em {diretorio}")
+    arquivos = []
+    for nome in nomes:
+        with open(os.path.join(diretorio, nome), 'rb') as arquivo:
+            arquivos.append((arquivo.read(), nome))
+    if len(arquivos) == 1:
+        return carregar_dataset(*arquivos[0])
+    return consolidar_datasets(arquivos, max_workers=max_workers)
+
+
+def gerar_relatorios(diretorio, destino, formatos=FORMATOS, representantes=None, max_workers=None,
+                     num_products=10, detalhe=False):
+    """
+    Gera os relatórios de todos os representantes (ou dos escolhidos) e o resumo.
+    Retorna a lista de resumos por representante.
+    """
+    global _df
+    os.makedirs(destino, exist_ok=True)
+    dataset = ler_diretorio(diretorio, max_workers=max_workers)
+    df = dataset.df
+    if 'representante' not in df.columns:
+        raise ValueError("Coluna 'representante' não encontrada nos relatórios.")
+    todos = sorted(str(r) for r in pd.unique(df['representante'].dropna()) if str(r).strip())
+    alvo = [r for r in todos if r in set(representantes)] if representantes else todos
+
+    max_workers = max_workers or min(len(alvo), os.cpu_count() or 1) or 1
+    # Resolvido antes do pool: dois workers nunca gravam no mesmo arquivo
+    arquivos = nomes_arquivo(alvo)
+    tarefas = [(r, destino, formatos, num_products, detalhe, arquivos[r]) for r in alvo]
+    if max_workers > 1 and len(alvo) > 1:
+        contexto = multiprocessing.get_context('spawn')
+        with DataFrameCompartilhado(df) as compartilhado:
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=contexto,
+                                     initializer=_inicializar_worker, initargs=(compartilhado.colunas,)) as executor:
+                resumos = list(executor.map(gerar_representante, *zip(*tarefas)))
+    else:
+        _df = df
+        resumos = [gerar_representante(*tarefa) for tarefa in tarefas]
+
+    resumo = pd.DataFrame([{k: v for k, v in r.items() if k != 'arquivos'} for r in resumos])
+    resumo.rename(columns=ROTULOS_KPIS).to_excel(os.path.join(destino, 'resumo.xlsx'), index=False)
+    return resumos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pipeline.relatorios', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('diretorio', help="diretório com os relatórios de margem (CSV/XLSX)")
+    parser.add_argument('--destino', default='relatorios', help="diretório de saída (padrão: ./relatorios)")
+    parser.add_argument('--formatos', default='html,xlsx', help="lista separada por vírgula entre html, png e xlsx")
+    parser.add_argument('--representantes', nargs='+', help="gera só estes representantes")
+    parser.add_argument('--max-workers', type=int, help="processos do pool (padrão: nº de CPUs)")
+    parser.add_argument('--produtos', type=int, default=10, help="quantidade de produtos no gráfico de produtos")
+    parser.add_argument('--detalhe', action='store_true', help="inclui as linhas de NF do representante no XLSX")
+    args = parser.parse_args(argv)
+
+    formatos = {f.strip().lower() for f in args.formatos.split(',') if f.strip()}
+    invalidos = formatos - set(FORMATOS)
+    if invalidos:
+        parser.error(f"formatos inválidos: {', '.join(sorted(invalidos))}")
+    if 'png' in formatos and importlib.util.find_spec('kaleido') is None:
+        if formatos == {'png'}:
+            parser.error("PNG requer o pacote 'kaleido' (pip install kaleido)")
+        print("Aviso: PNG requer o pacote 'kaleido' (pip install kaleido); PNG ignorado.", file=sys.stderr)
+        formatos.discard('png')
+    if not formatos:
+        parser.error("nenhum formato informado")
+
+    inicio = time.perf_counter()
+    resumos = gerar_relatorios(
+        args.diretorio, args.destino, formatos=formatos, representantes=args.representantes,
+        max_workers=args.max_workers, num_products=args.produtos, detalhe=args.detalhe
+    )
+    for r in resumos:
+        print(f"{r['representante']}: {r['linhas']:,} linhas, {len(r['arquivos'])} arquivos")
+    print(f"{len(resumos)} representantes em {time.perf_counter() - inicio:.1f}s -> {os.path.abspath(args.destino)}")
+
+
+if __name__ == '__main__':
+    main()
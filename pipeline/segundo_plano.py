@@ -0,0 +1,133 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Ingestões simultâneas no processo (arquivos distintos; o mesmo arquivo é lido uma vez só)
+MAX_INGESTOES = 2
+
+ETAPAS = {
+    'fila': "Aguardando na fila",
+    'leitura': "Lendo o arquivo",
+    'limpeza': "Limpando as linhas",
+    'tipos': "Ajustando os tipos das colunas",
+    'consolidacao': "Juntando os arquivos",
+    'armazem': "Salvando para as próximas aberturas",
+    'concluida': "Pronto",
+}
+
+
+def _br(numero, casas=0):
+    return f"{numero:,.{casas}f}".replace(",", "#").replace(".", ",").replace("#", ".")
+
+
+class Progresso:
+    """
+    Andamento de uma ingestão: escrito pela thread que lê o arquivo e lido pela página
+    a cada rerun (atribuições simples, sem lock).
+    """
+
+    def __init__(self, bytes_total=0):
+        self.etapa = 'fila'
+        self.bytes_lidos = 0
+        self.bytes_total = bytes_total
+        self.linhas_limpas = 0
+        self.linhas_descartadas = 0
+        self.iniciado_em = time.monotonic()
+
+    def atualizar(self, **campos):
+        for nome, valor in campos.items():
+            setattr(self, nome, valor)
+
+    @property
+    def fracao(self):
+        if self.etapa == 'concluida':
+            return 1.0
+        if not self.bytes_total:
+            return 0.0
+        # A leitura é a maior parte do trabalho; as etapas seguintes ficam nos últimos 10%
+        lida = min(self.bytes_lidos / self.bytes_total, 1.0) * 0.9
+        return lida if self.etapa in ('fila', 'leitura') else max(lida, 0.9)
+
+    def descricao(self):
+        partes = [ETAPAS.get(self.etapa, self.etapa)]
+        if self.bytes_total:
+            partes.append(f"{_br(self.bytes_lidos / 1024 ** 2, 1)} de {_br(self.bytes_total / 1024 ** 2, 1)} MiB")
+        if self.linhas_limpas or self.linhas_descartadas:
+            partes.append(
+                f"{_br(self.linhas_limpas)} linhas limpas, {_br(self.linhas_descartadas)} descartadas (totais e vazias)"
+            )
+        partes.append(f"{time.monotonic() - self.iniciado_em:.0f}s")
+        return " — ".join(partes)
+
+
+class Tarefa:
+    """
+    Uma ingestão disparada em segundo plano.
+    """
+
+    def __init__(self, chave, progresso):
+        self.chave = chave
+        self.progresso = progresso
+        self.futuro = None
+
+    @property
+    def concluida(self):
+        return self.futuro.done()
+
+    @property
+    def erro(self):
+        return self.futuro.exception() if self.futuro.done() else None
+
+    def aguardar(self, segundos):
+        """
+        Espera até `segundos` pela conclusão; retorna se terminou.
+        """
+        wait([self.futuro], timeout=segundos)
+        return self.futuro.done()
+
+    def resultado(self):
+        return self.futuro.result()
+
+
+class TarefasIngestao:
+    """
+    Ingestões em andamento no processo, uma por chave: a página dispara a leitura numa
+    thread e continua renderizando; sessões que pedem o mesmo arquivo acompanham a mesma
+    tarefa. Tarefas com erro ficam até `descartar` (o erro é mostrado uma vez, e a
+    próxima interação tenta de novo); as concluídas saem sozinhas.
+    """
+
+    def __init__(self, max_ingestoes=MAX_INGESTOES):
+        self._executor = ThreadPoolExecutor(max_workers=max_ingestoes, thread_name_prefix='ingestao')
+        self._tarefas = {}
+        self._lock = threading.Lock()
+
+    def iniciar(self, chave, ler, bytes_total=0):
+        """
+        Tarefa da `chave`, disparando `ler(progresso)` se ainda não houver uma.
+        """
+        with self._lock:
+            tarefa = self._tarefas.get(chave)
+            if tarefa is None:
+                tarefa = self._tarefas[chave] = Tarefa(chave, Progresso(bytes_total))
+                tarefa.futuro = self._executor.submit(self._executar, tarefa, ler)
+            return tarefa
+
+    def _executar(self, tarefa, ler):
+        resultado = ler(tarefa.progresso)
+        tarefa.progresso.atualizar(etapa='concluida')
+        with self._lock:
+            self._tarefas.pop(tarefa.chave, None)
+        return resultado
+
+    def obter(self, chave):
+        with self._lock:
+            return self._tarefas.get(chave)
+
+    def descartar(self, chave):
+        with self._lock:
+            self._tarefas.pop(chave, None)
+
+    def em_andamento(self):
+        with self._lock:
+            return len(self._tarefas)
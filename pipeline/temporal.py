@@ -0,0 +1,182 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Medidas da série (somas por dia); 'linhas' diz se o período teve alguma NF
+MEDIDAS_SERIE = ['valor_bruto', 'valor_net', 'custo_total', 'margem_em_valor', 'linhas']
+
+FREQUENCIAS = {'D': "Dia", 'W': "Semana", 'M': "Mês", 'Q': "Trimestre"}
+
+# Defasagem, em períodos da frequência, de cada comparação. No ano anterior, dia e semana
+# voltam 52 semanas (364 dias) para comparar o mesmo dia da semana
+COMPARACOES = {
+    'anterior': {'D': 1, 'W': 1, 'M': 1, 'Q': 1},
+    'ano_anterior': {'D': 364, 'W': 52, 'M': 12, 'Q': 4},
+}
+NOMES_COMPARACAO = {
+    'anterior': {'D': "Dia anterior", 'W': "Semana anterior", 'M': "Mês anterior", 'Q': "Trimestre anterior"},
+    'ano_anterior': {'D': "Mesmo dia da semana, ano anterior", 'W': "Mesma semana do ano anterior",
+                     'M': "Mesmo mês do ano anterior", 'Q': "Mesmo trimestre do ano anterior"},
+}
+
+
+@dataclass
+class SerieDiaria:
+    """
+    Totais por dia, contíguos do primeiro ao último dia com venda (dias sem NF valem 0):
+    cada medida é um array com um valor por dia. Reamostragens e comparações partem daqui
+    e custam O(dias), não O(linhas).
+    """
+    inicio: np.datetime64
+    medidas: dict
+
+    @property
+    def dias(self):
+        return self.inicio + np.arange(self.num_dias)
+
+    @property
+    def num_dias(self):
+        return len(next(iter(self.medidas.values())))
+
+    def memoria_bytes(self):
+        return sum(valores.nbytes for valores in self.medidas.values())
+
+
+@dataclass
+class SeriePeriodos:
+    """
+    Série reamostrada: um id inteiro por período (períodos vizinhos têm ids consecutivos)
+    e as medidas somadas por período.
+    """
+    frequencia: str
+    ids: np.ndarray
+    medidas: dict
+
+
+def serie_diaria(df, medidas=MEDIDAS_SERIE):
+    """
+    Série diária das linhas de NF: um bincount por medida, sem ordenar as linhas ('linhas'
+    conta as NF se não for coluna). None se não houver datas.
+    """
+    if 'data' not in df.columns:
+        return None
+    datas = df['data'].to_numpy(dtype='datetime64[D]')
+    validas = ~np.isnat(datas)
+    if not validas.any():
+        return None
+    datas = datas[validas]
+    inicio = datas.min()
+    posicoes = (datas - inicio).astype(np.int64)
+    return SerieDiaria(
+        inicio=inicio,
+        medidas={
+            col: np.bincount(
+                posicoes, minlength=int(posicoes.max()) + 1,
+                weights=df[col].to_numpy(dtype='float64', na_value=0.0)[validas] if col in df.columns else None,
+            )
+            for col in medidas if col in df.columns or col == 'linhas'
+        },
+    )
+
+
+def fatiar_serie(serie, inicio, fim):
+    """
+    Série só dos dias de `inicio` a `fim` (inclusivo), aparada para começar e terminar em
+    dias com venda, como se fosse montada só das linhas do período. None se não sobrar dia
+    com venda.
+    """
+    if serie is None:
+        return None
+    primeiro = max(int((np.datetime64(inicio, 'D') - serie.inicio).astype(np.int64)), 0)
+    ultimo = min(int((np.datetime64(fim, 'D') - serie.inicio).astype(np.int64)), serie.num_dias - 1)
+    if primeiro > ultimo:
+        return None
+    com_venda = primeiro + np.flatnonzero(serie.medidas['linhas'][primeiro:ultimo + 1])
+    if not len(com_venda):
+        return None
+    primeiro, ultimo = com_venda[0], com_venda[-1]
+    return SerieDiaria(
+        inicio=serie.inicio + primeiro,
+        medidas={col: valores[primeiro:ultimo + 1] for col, valores in serie.medidas.items()},
+    )
+
+
+def ids_periodo(dias, frequencia):
+    """
+    Id inteiro do período de cada dia (datetime64[D]): dias desde 1970, semanas de segunda a
+    domingo, meses ou trimestres desde 1970.
+    """
+    numeros = dias.astype('datetime64[D]').astype(np.int64)
+    if frequencia == 'D':
+        return numeros
+    if frequencia == 'W':
+        # 01/01/1970 foi uma quinta-feira: +3 faz as semanas começarem na segunda
+        return (numeros + 3) // 7
+    meses = dias.astype('datetime64[M]').astype(np.int64)
+    if frequencia == 'M':
+        return meses
+    if frequencia == 'Q':
+        return meses // 3
+    raise ValueError(f"Frequência desconhecida: {frequencia!r} (use {', '.join(FREQUENCIAS)})")
+
+
+def inicio_periodo(ids, frequencia):
+    """
+    Primeiro dia (datetime64[D]) de cada período.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if frequencia == 'D':
+        return ids.astype('datetime64[D]')
+    if frequencia == 'W':
+        return (ids * 7 - 3).astype('datetime64[D]')
+    meses = ids if frequencia == 'M' else ids * 3
+    return meses.astype('datetime64[M]').astype('datetime64[D]')
+
+
+def rotulos_periodo(ids, frequencia):
+    """
+    "2025-06-02" (dia e semana, pelo primeiro dia), "2025-06" (mês) e "2025-T2" (trimestre).
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if frequencia == 'Q':
+        return [f"{1970 + i // 4}-T{i % 4 + 1}" for i in ids.tolist()]
+    if frequencia == 'M':
+        return np.datetime_as_string(ids.astype('datetime64[M]'), unit='M').tolist()
+    return np.datetime_as_string(inicio_periodo(ids, frequencia), unit='D').tolist()
+
+
+def reamostrar(serie, frequencia):
+    """
+    Soma a série diária por semana, mês ou trimestre: como os dias são contíguos e
+    ordenados, cada período é uma fatia e um reduceat resolve todas de uma vez.
+    """
+    ids = ids_periodo(serie.dias, frequencia)
+    inicios = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    return SeriePeriodos(
+        frequencia=frequencia,
+        ids=ids[inicios],
+        medidas={col: np.add.reduceat(valores, inicios) for col, valores in serie.medidas.items()},
+    )
+
+
+def defasar(valores, defasagem):
+    """
+    Valor `defasagem` períodos antes de cada período (NaN quando a série ainda não cobre).
+    """
+    anteriores = np.full(len(valores), np.nan)
+    if 0 < defasagem < len(valores):
+        anteriores[defasagem:] = valores[:-defasagem]
+    return anteriores
+
+
+def tabela_periodos(periodos):
+    """
+    DataFrame da série reamostrada: periodo (rótulo), inicio e as medidas.
+    """
+    return pd.DataFrame({
+        'periodo': rotulos_periodo(periodos.ids, periodos.frequencia),
+        'inicio': pd.to_datetime(inicio_periodo(periodos.ids, periodos.frequencia)),
+        **periodos.medidas,
+    })
+
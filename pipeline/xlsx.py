@@ -0,0 +1,319 @@
+import io
+import posixpath
+import zipfile
+from datetime import datetime, timedelta
+from xml.etree import ElementTree
+from xml.parsers import expat
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+
+# Leitura do xlsx direto do XML das abas, em streaming. O openpyxl (mesmo em read_only)
+# cria um objeto por célula e, sem a tag <dimension>, percorre a aba inteira só para
+# medi-la; aqui o expat entrega os eventos e só as colunas pedidas viram valores.
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_NS_PACOTE = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# Bytes descomprimidos por chamada ao expat (a busca do cabeçalho usa pedaços menores)
+TAMANHO_LEITURA = 1024 ** 2
+TAMANHO_CABECALHO = 64 * 1024
+
+_EPOCAS = {False: datetime(1899, 12, 30), True: datetime(1904, 1, 1)}
+
+
+def indice_coluna(letras):
+    """
+    "A" -> 0, "Z" -> 25, "AA" -> 26.
+    """
+    indice = 0
+    for letra in letras:
+        indice = indice * 26 + ord(letra) - 64
+    return indice - 1
+
+
+class _Leitor:
+    """
+    Base dos handlers do expat. Os nomes dos elementos são comparados já com o prefixo
+    de namespace da parte (normalmente nenhum; "x:" em alguns geradores), descoberto
+    no elemento raiz.
+    """
+    parar = False
+
+    def prefixar(self, raiz):
+        prefixo = raiz[:raiz.index(':') + 1] if ':' in raiz else ''
+        self._row, self._c, self._v, self._t, self._rph, self._si = (
+            prefixo + nome for nome in ('row', 'c', 'v', 't', 'rPh', 'si')
+        )
+
+
+class _LeitorTextos(_Leitor):
+    """
+    Tabela de textos compartilhados (sharedStrings.xml); texto fonético (rPh) é ignorado.
+    """
+
+    def __init__(self):
+        self.textos = []
+        self._partes = []
+        self._capturar = False
+        self._fonetica = False
+
+    def iniciar(self, nome, atributos):
+        if nome == self._t:
+            self._capturar = not self._fonetica
+        elif nome == self._si:
+            self._partes = []
+        elif nome == self._rph:
+            self._fonetica = True
+
+    def texto(self, dados):
+        if self._capturar:
+            self._partes.append(dados)
+
+    def encerrar(self, nome):
+        if nome == self._t:
+            self._capturar = False
+        elif nome == self._si:
+            self.textos.append(''.join(self._partes))
+        elif nome == self._rph:
+            self._fonetica = False
+
+
+class _LeitorAba(_Leitor):
+    """
+    Handlers de uma aba. Com `colunas`, acumula só essas colunas (uma lista por coluna,
+    alinhadas por linha); sem elas, guarda as linhas inteiras até `ate_linha`.
+    """
+
+    def __init__(self, textos, estilos_data, epoca, colunas=None, apos_linha=0, ate_linha=None):
+        self._textos = textos
+        self._estilos_data = estilos_data
+        self._epoca = epoca
+        self._apos_linha = apos_linha
+        self._ate_linha = ate_linha
+        self.listas = {col: [] for col in colunas} if colunas is not None else None
+        self.linhas = []
+        self._letras = {}
+        self._numero = 0
+        self._coluna = -1
+        self._atual = {}
+        self._celula = None
+        self._tipo = self._estilo = self._conteudo = None
+        self._capturar = False
+        self._fonetica = False
+
+    def iniciar(self, nome, atributos):
+        if nome == self._c:
+            ref = atributos.get('r')
+            if ref:
+                letras = ref.rstrip('0123456789')
+                coluna = self._letras.get(letras)
+                if coluna is None:
+                    coluna = self._letras[letras] = indice_coluna(letras)
+            else:
+                coluna = self._coluna + 1
+            self._coluna = coluna
+            if self.listas is None or coluna in self.listas:
+                self._celula = coluna
+                self._tipo = atributos.get('t', 'n')
+                self._estilo = atributos.get('s')
+                self._conteudo = None
+            else:
+                self._celula = None
+        elif nome == self._v or nome == self._t:
+            self._capturar = self._celula is not None and not self._fonetica
+        elif nome == self._row:
+            numero = atributos.get('r')
+            self._numero = int(numero) if numero else self._numero + 1
+            self._coluna = -1
+            self._atual = {}
+        elif nome == self._rph:
+            self._fonetica = True
+
+    def texto(self, dados):
+        # Com buffer_text o conteúdo de <v> chega de uma vez; <is> com vários <r><t> se concatena
+        if self._capturar:
+            self._conteudo = dados if self._conteudo is None else self._conteudo + dados
+
+    def encerrar(self, nome):
+        if nome == self._v or nome == self._t:
+            self._capturar = False
+        elif nome == self._c:
+            if self._celula is not None:
+                self._atual[self._celula] = self._valor()
+                self._celula = None
+        elif nome == self._row:
+            if self._ate_linha is not None and self._numero > self._ate_linha:
+                self.parar = True
+            elif self._numero <= self._apos_linha:
+                pass
+            elif self.listas is None:
+                self.linhas.append((self._numero, self._atual))
+            else:
+                atual = self._atual
+                for coluna, lista in self.listas.items():
+                    lista.append(atual.get(coluna))
+        elif nome == self._rph:
+            self._fonetica = False
+
+    def _valor(self):
+        """
+        Valor da célula: float para números, datetime para números com formato de data,
+        str para textos (compartilhados ou não) e erros ("#N/D"), bool para booleanos.
+        """
+        texto = self._conteudo
+        tipo = self._tipo
+        if tipo == 'n':
+            if not texto:
+                return None
+            numero = float(texto)
+            if self._estilo in self._estilos_data:
+                return self._epoca + timedelta(days=numero)
+            return numero
+        if tipo == 's':
+            return self._textos[int(texto)] if texto else None
+        if tipo == 'b':
+            return texto == '1'
+        if tipo == 'd':
+            return datetime.fromisoformat(texto) if texto else None
+        # inlineStr, str (resultado de fórmula) e e (erro)
+        return texto or ''
+
+
+class PlanilhaXlsx:
+    """
+    Leitor em streaming de um xlsx em memória: as abas são lidas do zip em pedaços e
+    só as colunas pedidas são convertidas.
+    """
+
+    def __init__(self, conteudo):
+        try:
+            self._pacote = zipfile.ZipFile(io.BytesIO(conteudo))
+            livro = ElementTree.fromstring(self._pacote.read('xl/workbook.xml'))
+            relacoes = ElementTree.fromstring(self._pacote.read('xl/_rels/workbook.xml.rels'))
+        except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as err:
+            raise ValueError(f"Arquivo Excel inválido: {err}") from err
+
+        alvos, self._partes = {}, {}
+        for relacao in relacoes.iter(f'{_NS_PACOTE}Relationship'):
+            caminho = self._caminho(relacao.get('Target', ''))
+            alvos[relacao.get('Id')] = caminho
+            self._partes[relacao.get('Type', '').rsplit('/', 1)[-1]] = caminho
+        self._abas = {aba.get('name'): alvos.get(aba.get(f'{_NS_REL}id')) for aba in livro.iter(f'{_NS}sheet')}
+        propriedades = livro.find(f'{_NS}workbookPr')
+        data1904 = propriedades is not None and propriedades.get('date1904', '0').lower() in ('1', 'true')
+        self._epoca = _EPOCAS[data1904]
+        self._textos = None
+        self._estilos_data = None
+
+    @staticmethod
+    def _caminho(alvo):
+        # Alvos das relações são relativos a xl/ (ou absolutos no pacote)
+        return alvo.lstrip('/') if alvo.startswith('/') else posixpath.normpath(posixpath.join('xl', alvo))
+
+    @property
+    def abas(self):
+        return list(self._abas)
+
+    def close(self):
+        self._pacote.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        self.close()
+
+    def _ler_textos(self):
+        caminho = self._partes.get('sharedStrings')
+        if caminho is None or caminho not in self._pacote.namelist():
+            return []
+        leitor = _LeitorTextos()
+        self._percorrer(caminho, leitor)
+        return leitor.textos
+
+    def _ler_estilos_data(self):
+        """
+        Índices (como texto, igual ao atributo s da célula) dos estilos com formato de data.
+        """
+        caminho = self._partes.get('styles')
+        if caminho is None or caminho not in self._pacote.namelist():
+            return set()
+        raiz = ElementTree.fromstring(self._pacote.read(caminho))
+        formatos = dict(BUILTIN_FORMATS)
+        for formato in raiz.iter(f'{_NS}numFmt'):
+            formatos[int(formato.get('numFmtId'))] = formato.get('formatCode', '')
+        estilos = raiz.find(f'{_NS}cellXfs')
+        if estilos is None:
+            return set()
+        return {
+            str(i) for i, estilo in enumerate(estilos.iter(f'{_NS}xf'))
+            if is_date_format(formatos.get(int(estilo.get('numFmtId', 0)), ''))
+        }
+
+    def _percorrer(self, caminho, leitor, tamanho=TAMANHO_LEITURA, ao_ler=None):
+        """
+        Alimenta o expat com a parte `caminho` do zip, descomprimida em pedaços de `tamanho`
+        bytes, até o fim ou até o leitor pedir para parar. `ao_ler(lidos, total)` é chamado
+        a cada pedaço (bytes descomprimidos).
+        """
+        total = self._pacote.getinfo(caminho).file_size
+        lidos = 0
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+
+        def raiz(nome, atributos):
+            leitor.prefixar(nome)
+            parser.StartElementHandler = leitor.iniciar
+
+        parser.StartElementHandler = raiz
+        parser.EndElementHandler = leitor.encerrar
+        parser.CharacterDataHandler = leitor.texto
+        try:
+            with self._pacote.open(caminho) as arquivo:
+                while not leitor.parar:
+                    pedaco = arquivo.read(tamanho)
+                    parser.Parse(pedaco, not pedaco)
+                    if not pedaco:
+                        break
+                    lidos += len(pedaco)
+                    if ao_ler is not None:
+                        ao_ler(lidos, total)
+        except expat.ExpatError as err:
+            raise ValueError(f"Arquivo Excel inválido ({caminho}): {err}") from err
+
+    def _ler_aba(self, aba, tamanho=TAMANHO_LEITURA, ao_ler=None, **opcoes):
+        if self._abas.get(aba) is None:
+            raise ValueError(f"Aba '{aba}' não encontrada. Abas disponíveis: {', '.join(self._abas)}")
+        if self._textos is None:
+            self._textos = self._ler_textos()
+            self._estilos_data = self._ler_estilos_data()
+        leitor = _LeitorAba(self._textos, self._estilos_data, self._epoca, **opcoes)
+        self._percorrer(self._abas[aba], leitor, tamanho=tamanho, ao_ler=ao_ler)
+        return leitor
+
+    def linhas(self, aba, ate_linha):
+        """
+        Primeiras linhas da aba como listas de valores (linhas vazias são omitidas).
+        Retorna [(número da linha, valores)].
+        """
+        leitor = self._ler_aba(aba, tamanho=TAMANHO_CABECALHO, ate_linha=ate_linha)
+        return [
+            (numero, [celulas.get(i) for i in range(max(celulas, default=-1) + 1)])
+            for numero, celulas in leitor.linhas
+        ]
+
+    def colunas(self, aba, colunas, apos_linha=0, ao_ler=None):
+        """
+        Valores das `colunas` (índices base 0) em todas as linhas abaixo de `apos_linha`.
+        Retorna {índice: lista de valores}, com None nas células vazias.
+        """
+        return self._ler_aba(aba, colunas=colunas, apos_linha=apos_linha, ao_ler=ao_ler).listas
+
+
+def listar_abas(conteudo):
+    """
+    Nomes das abas do xlsx, sem ler as abas.
+    """
+    with PlanilhaXlsx(conteudo) as planilha:
+        return planilha.abas